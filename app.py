@@ -5,6 +5,7 @@ from models.contacto import Contacto
 from models.configuracion import configuracion_global
 import logging
 import os
+import threading
 
 # Configurar logging
 logging.basicConfig(
@@ -15,11 +16,12 @@ logger = logging.getLogger(__name__)
 
 # Importar blueprints
 from routes.principales import principales_bp
-from routes.campanas import campanas_bp
+from routes.campanas import campanas_bp, restaurar_campanas_interrumpidas
 from routes.contactos import contactos_bp
 from routes.plantillas import plantillas_bp
 from routes.analiticas import analiticas_bp
 from routes.configuraciones import configuracion_bp
+from utils.pool_sesiones import pool_sesiones
 
 def crear_app():
     """Factory function para crear la aplicación Flask"""
@@ -45,6 +47,12 @@ def crear_app():
     app.register_blueprint(analiticas_bp, url_prefix='/analiticas')
     app.register_blueprint(configuracion_bp, url_prefix='/configuracion')
     
+    # Campañas cortadas por un reinicio: se reanudan desde su bandeja de salida
+    restaurar_campanas_interrumpidas()
+    
+    # Navegadores separados que siguieron abiertos: reconectar sin bloquear el arranque
+    threading.Thread(target=pool_sesiones.reanudar, daemon=True).start()
+    
     return app, socketio
 
 # Inicializar la aplicación Flask
@@ -82,8 +90,7 @@ class ContactosService:
     def obtener_activos():
         """Obtener solo contactos activos"""
         try:
-            contactos = Contacto.obtener_todos()
-            return [c for c in contactos if c.estado == 'activo']
+            return Contacto.obtener_activos()
         except Exception as e:
             logger.error(f"Error obteniendo contactos activos: {e}")
             return []
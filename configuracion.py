@@ -15,6 +15,12 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///whatsapp_sender.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Motor de almacenamiento de los modelos: 'json' (por defecto) o 'sqlite'
+    # Migración única: python -m models.base_datos
+    ALMACENAMIENTO = os.environ.get('ALMACENAMIENTO') or 'json'
+    # Formato de los archivos JSON: 'compacto' (por defecto) o 'legible' (con sangría)
+    FORMATO_JSON = os.environ.get('FORMATO_JSON') or 'compacto'
+    
     # Configuración de archivos
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB máximo
     UPLOAD_FOLDER = 'static/uploads'
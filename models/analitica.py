@@ -2,13 +2,12 @@
 Modelo para analíticas de WhatsApp - Sin base de datos
 """
 from datetime import datetime, timedelta
-import json
-import os
+from models.base_datos import db
 
 class Analitica:
     """Modelo para gestionar analíticas y métricas"""
     
-    ARCHIVO_DATOS = 'data/analiticas.json'
+    COLECCION = 'analiticas'
     
     def __init__(self):
         self.id = None
@@ -22,30 +21,13 @@ class Analitica:
     
     @staticmethod
     def _cargar_datos():
-        """Carga analíticas desde archivo JSON"""
-        os.makedirs('data', exist_ok=True)
-        
-        if not os.path.exists(Analitica.ARCHIVO_DATOS):
-            return []
-        
-        try:
-            with open(Analitica.ARCHIVO_DATOS, 'r', encoding='utf-8') as f:
-                datos = json.load(f)
-                return datos if isinstance(datos, list) else []
-        except (json.JSONDecodeError, IOError):
-            return []
+        """Carga analíticas desde el almacenamiento"""
+        return db.cargar_datos(Analitica.COLECCION)
     
     @staticmethod
     def _guardar_datos(datos):
-        """Guarda analíticas en archivo JSON"""
-        os.makedirs('data', exist_ok=True)
-        
-        try:
-            with open(Analitica.ARCHIVO_DATOS, 'w', encoding='utf-8') as f:
-                json.dump(datos, f, ensure_ascii=False, indent=2)
-            return True
-        except IOError:
-            return False
+        """Guarda todas las analíticas en el almacenamiento"""
+        return db.guardar_datos(Analitica.COLECCION, datos)
     
     def to_dict(self):
         """Convierte la analítica a diccionario"""
@@ -81,18 +63,11 @@ class Analitica:
     
     def save(self):
         """Guarda la analítica"""
-        analiticas = self._cargar_datos()
+        if not self.id:
+            total = db.contar(Analitica.COLECCION)
+            self.id = f"analitica_{total + 1}_{int(datetime.now().timestamp())}"
         
-        if self.id:
-            for i, analitica_data in enumerate(analiticas):
-                if analitica_data.get('id') == self.id:
-                    analiticas[i] = self.to_dict()
-                    break
-        else:
-            self.id = f"analitica_{len(analiticas) + 1}_{int(datetime.now().timestamp())}"
-            analiticas.append(self.to_dict())
-        
-        return self._guardar_datos(analiticas)
+        return db.guardar_registro(Analitica.COLECCION, self.to_dict())
     
     @staticmethod
     def get_all():
@@ -117,11 +92,9 @@ class Analitica:
     @staticmethod
     def get_by_campana(campana_id):
         """Obtiene analíticas por campaña"""
-        analiticas = Analitica.get_all()
         return [
-            Analitica.from_dict(data) 
-            for data in analiticas 
-            if data.get('campana_id') == campana_id
+            Analitica.from_dict(data)
+            for data in db.buscar_por_campo(Analitica.COLECCION, 'campana_id', campana_id)
         ]
     
     @staticmethod
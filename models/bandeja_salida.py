@@ -0,0 +1,218 @@
+"""
+Bandeja de salida persistente de las campañas (un registro por destinatario)
+
+Cada campaña tiene un diario data/bandeja_salida/<campana_id>.jsonl: una línea
+JSON por cambio de estado de un destinatario, agregada y sincronizada a disco
+antes de continuar. Al abrir la bandeja se reproduce el diario (la última línea
+de cada destinatario manda), así que un reinicio retoma exactamente donde se
+quedó el envío.
+
+Abrir la bandeja solo lee el diario: mientras la campaña se envía, su único
+escritor es la instancia del planificador. Los envíos cortados por un reinicio
+se cierran con recuperar_interrumpidos(), al arrancar, antes de que haya
+escritor.
+"""
+from collections import deque
+from datetime import datetime
+import json
+import logging
+import os
+import threading
+
+from utils.escritura_atomica import escribir_atomico, serializar_json
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_BANDEJAS = os.path.join('data', 'bandeja_salida')
+
+ESTADOS = ('pendiente', 'enviando', 'enviado', 'fallido')
+
+# Error que se registra para los envíos cortados por un reinicio
+ERROR_INTERRUMPIDO = 'Envío interrumpido por un reinicio; no se reintenta para evitar duplicados'
+
+
+class BandejaSalida:
+    """Destinatarios de una campaña con su estado de envío"""
+
+    def __init__(self, campana_id, directorio=DIRECTORIO_BANDEJAS):
+        self.campana_id = campana_id
+        self.ruta = os.path.join(directorio, f'{campana_id}.jsonl') if directorio else None
+        self._lock = threading.RLock()
+        self._entradas = {}
+        self._pendientes = deque()
+        self._conteo = {estado: 0 for estado in ESTADOS}
+        self._lineas = 0
+        self._archivo = None
+
+        if self.ruta and os.path.exists(self.ruta):
+            self._cargar()
+
+    @staticmethod
+    def existe(campana_id, directorio=DIRECTORIO_BANDEJAS):
+        """Indica si la campaña ya tiene bandeja de salida en disco"""
+        return os.path.exists(os.path.join(directorio, f'{campana_id}.jsonl'))
+
+    @classmethod
+    def abrir_o_crear(cls, campana_id, contactos, directorio=DIRECTORIO_BANDEJAS):
+        """
+        Abre la bandeja de la campaña o la crea con los contactos indicados.
+        Si ya existía, los contactos se ignoran y se conserva el estado guardado.
+        """
+        bandeja = cls(campana_id, directorio)
+        if not bandeja._entradas:
+            bandeja._crear(contactos)
+            bandeja._indexar()
+        return bandeja
+
+    @staticmethod
+    def eliminar(campana_id, directorio=DIRECTORIO_BANDEJAS):
+        """Borra la bandeja de salida de una campaña"""
+        ruta = os.path.join(directorio, f'{campana_id}.jsonl')
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+    # ===== Persistencia =====
+
+    def _crear(self, contactos):
+        ahora = datetime.now().isoformat()
+        with self._lock:
+            for contacto in contactos:
+                telefono = contacto.get('telefono') or contacto.get('Telefono')
+                contacto_id = str(contacto.get('id') or telefono or len(self._entradas))
+                if contacto_id in self._entradas:
+                    continue
+                self._entradas[contacto_id] = {
+                    'campana_id': self.campana_id,
+                    'contacto_id': contacto_id,
+                    'nombre': contacto.get('nombre') or contacto.get('Nombre', 'Contacto'),
+                    'telefono': telefono,
+                    'estado': 'pendiente',
+                    'intentos': 0,
+                    'ultimo_error': None,
+                    'creado_en': ahora,
+                    'actualizado_en': ahora
+                }
+            self._compactar()
+
+    def _cargar(self):
+        """Reproducir el diario; una última línea a medio escribir se descarta"""
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            for numero, linea in enumerate(f, 1):
+                linea = linea.strip()
+                if not linea:
+                    continue
+                try:
+                    entrada = json.loads(linea)
+                except ValueError:
+                    logger.warning(f"Bandeja {self.campana_id}: línea {numero} dañada, se omite")
+                    continue
+                self._entradas[entrada['contacto_id']] = entrada
+                self._lineas += 1
+
+        self._indexar()
+
+    def recuperar_interrumpidos(self):
+        """
+        Marca como fallidos los envíos que quedaron 'enviando' y compacta el diario.
+        Solo cuando nadie está enviando la campaña (al arrancar o al programarla):
+        el reemplazo del archivo dejaría huérfano el diario de otro escritor.
+        """
+        with self._lock:
+            # Un envío que quedó 'enviando' pudo llegar al destinatario: no se repite
+            interrumpidos = [e for e in self._entradas.values() if e['estado'] == 'enviando']
+            for entrada in interrumpidos:
+                self._actualizar(entrada, 'fallido', ERROR_INTERRUMPIDO)
+            if interrumpidos or self._lineas > len(self._entradas):
+                self._compactar()
+            return len(interrumpidos)
+
+    def _indexar(self):
+        """Cola de pendientes en orden y conteo por estado"""
+        self._pendientes = deque(
+            contacto_id for contacto_id, e in self._entradas.items() if e['estado'] == 'pendiente'
+        )
+        self._conteo = {estado: 0 for estado in ESTADOS}
+        for entrada in self._entradas.values():
+            self._conteo[entrada['estado']] += 1
+
+    def _compactar(self):
+        """Reescribir el diario con una línea por destinatario"""
+        if not self.ruta:
+            return
+        self._cerrar_archivo()
+        contenido = b''.join(serializar_json(e, indent=None) + b'\n' for e in self._entradas.values())
+        escribir_atomico(self.ruta, contenido)
+        self._lineas = len(self._entradas)
+
+    def _anotar(self, entrada):
+        """Agregar el nuevo estado al diario y sincronizarlo a disco"""
+        if not self.ruta:
+            return
+        if self._archivo is None:
+            self._archivo = open(self.ruta, 'ab')
+        self._archivo.write(serializar_json(entrada, indent=None) + b'\n')
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+        self._lineas += 1
+
+        # Evitar que el diario crezca sin límite en campañas con reintentos
+        if self._lineas > 3 * len(self._entradas) + 1000:
+            self._compactar()
+
+    def _cerrar_archivo(self):
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+    def cerrar(self):
+        with self._lock:
+            self._cerrar_archivo()
+
+    def _actualizar(self, entrada, estado, error=None):
+        self._conteo[entrada['estado']] -= 1
+        self._conteo[estado] += 1
+        entrada['estado'] = estado
+        entrada['actualizado_en'] = datetime.now().isoformat()
+        if estado == 'enviando':
+            entrada['intentos'] += 1
+        if estado == 'enviado':
+            entrada['enviado_en'] = entrada['actualizado_en']
+        if error is not None:
+            entrada['ultimo_error'] = error
+        self._anotar(entrada)
+        return dict(entrada)
+
+    # ===== Operaciones del enviador =====
+
+    def reclamar_siguiente(self):
+        """Toma el siguiente destinatario pendiente y lo marca 'enviando'; None si no quedan"""
+        with self._lock:
+            while self._pendientes:
+                entrada = self._entradas[self._pendientes.popleft()]
+                if entrada['estado'] == 'pendiente':
+                    return self._actualizar(entrada, 'enviando')
+            return None
+
+    def marcar_enviado(self, contacto_id):
+        with self._lock:
+            return self._actualizar(self._entradas[contacto_id], 'enviado')
+
+    def marcar_fallido(self, contacto_id, error):
+        with self._lock:
+            return self._actualizar(self._entradas[contacto_id], 'fallido', error)
+
+    def hay_pendientes(self):
+        with self._lock:
+            return self._conteo['pendiente'] > 0
+
+    def resumen(self):
+        """Cantidad de destinatarios por estado y total"""
+        with self._lock:
+            resumen = dict(self._conteo)
+            resumen['total'] = len(self._entradas)
+            return resumen
+
+    def entradas(self):
+        """Copia de todos los registros de la bandeja"""
+        with self._lock:
+            return [dict(e) for e in self._entradas.values()]
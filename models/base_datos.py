@@ -0,0 +1,505 @@
+"""
+Motor de almacenamiento local para los modelos (JSON o SQLite)
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import uuid
+
+from utils.bloqueos import BloqueosColecciones
+from utils.escritura_atomica import escribir_json_atomico, cargar_respaldo_json, leer_json
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_DATOS = 'data'
+
+# Colecciones conocidas (nombre de archivo JSON / tabla SQLite)
+COLECCIONES = [
+    'contactos',
+    'listas_contactos',
+    'campanas',
+    'analiticas',
+    'plantillas',
+    'categorias'
+]
+
+# Campos que se extraen a columnas indexadas en SQLite
+CAMPOS_INDEXADOS = ('telefono', 'estado', 'creado_en')
+
+
+def _validar_coleccion(coleccion):
+    """Evitar nombres de colección que no sean identificadores simples"""
+    if not re.match(r'^[A-Za-z_][A-Za-z0-9_]*$', coleccion or ''):
+        raise ValueError(f"Nombre de colección inválido: {coleccion}")
+    return coleccion
+
+
+class AlmacenamientoBase:
+    """Interfaz común de los motores de almacenamiento"""
+
+    def cargar_datos(self, coleccion):
+        """Cargar todos los registros de la colección"""
+        raise NotImplementedError
+
+    def guardar_datos(self, coleccion, datos):
+        """Reemplazar todos los registros de la colección"""
+        raise NotImplementedError
+
+    def obtener_registro(self, coleccion, registro_id):
+        """Obtener un registro por su id"""
+        raise NotImplementedError
+
+    def guardar_registro(self, coleccion, registro):
+        """Insertar o actualizar un registro (por id)"""
+        return self.guardar_registros(coleccion, [registro])
+
+    def guardar_registros(self, coleccion, registros):
+        """Insertar o actualizar varios registros en una sola escritura"""
+        raise NotImplementedError
+
+    def eliminar_registro(self, coleccion, registro_id):
+        """Eliminar un registro por su id"""
+        raise NotImplementedError
+
+    def actualizar_registro(self, coleccion, registro_id, cambios):
+        """Actualizar solo algunos campos de un registro; retorna el registro o None"""
+        raise NotImplementedError
+
+    def buscar_por_campo(self, coleccion, campo, valor):
+        """Obtener los registros cuyo campo sea igual al valor"""
+        return [r for r in self.cargar_datos(coleccion) if r.get(campo) == valor]
+
+    def contar(self, coleccion):
+        """Cantidad de registros de la colección"""
+        return len(self.cargar_datos(coleccion))
+
+    def existe(self, coleccion):
+        """Indica si la colección ya fue creada alguna vez"""
+        raise NotImplementedError
+
+    def firma(self, coleccion):
+        """Marca de modificación del almacenamiento (cambia cuando cambian los datos en disco)"""
+        return None
+
+    @staticmethod
+    def _firma_archivos(*rutas):
+        """Tupla (mtime_ns, tamaño) de los archivos indicados; None si no existen"""
+        firma = []
+        for ruta in rutas:
+            try:
+                stat = os.stat(ruta)
+                firma.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                firma.append(None)
+        return tuple(firma)
+
+
+class AlmacenamientoJSON(AlmacenamientoBase):
+    """
+    Almacenamiento en archivos JSON (un archivo por colección).
+    Con compacto=True (por defecto, FORMATO_JSON=compacto) los archivos se
+    escriben sin sangría; siempre se leen ambos formatos.
+    """
+
+    def __init__(self, data_dir=DIRECTORIO_DATOS, compacto=None):
+        self.data_dir = data_dir
+        if compacto is None:
+            compacto = os.environ.get('FORMATO_JSON', 'compacto').lower() != 'legible'
+        self.compacto = compacto
+        self.directorio_respaldos = os.path.join(data_dir, 'backups')
+        self.bloqueos = BloqueosColecciones(os.path.join(data_dir, '.locks'))
+
+    def ruta_archivo(self, coleccion):
+        """Ruta del archivo JSON de la colección"""
+        return os.path.join(self.data_dir, f'{_validar_coleccion(coleccion)}.json')
+
+    def existe(self, coleccion):
+        """Indica si existe el archivo JSON de la colección"""
+        return os.path.exists(self.ruta_archivo(coleccion))
+
+    def firma(self, coleccion):
+        """mtime y tamaño del archivo JSON de la colección"""
+        return self._firma_archivos(self.ruta_archivo(coleccion))
+
+    def cargar_datos(self, coleccion):
+        """Cargar datos desde archivo JSON"""
+        filepath = self.ruta_archivo(coleccion)
+
+        if not os.path.exists(filepath):
+            return []
+
+        try:
+            with self.bloqueos.lectura(coleccion):
+                datos = leer_json(filepath)
+                return datos if isinstance(datos, list) else []
+        except (ValueError, IOError) as e:
+            logger.error(f"Error cargando {filepath}: {e}")
+            # Archivo dañado: recurrir al respaldo más reciente antes que devolver vacío
+            datos = cargar_respaldo_json(filepath, self.directorio_respaldos)
+            return datos if isinstance(datos, list) else []
+
+    def guardar_datos(self, coleccion, datos):
+        """Guardar datos en archivo JSON"""
+        filepath = self.ruta_archivo(coleccion)
+
+        try:
+            with self.bloqueos.escritura(coleccion):
+                escribir_json_atomico(filepath, datos, respaldo=True,
+                                      indent=None if self.compacto else 2,
+                                      directorio_respaldos=self.directorio_respaldos)
+            return True
+        except (IOError, OSError) as e:
+            logger.error(f"Error guardando {filepath}: {e}")
+            return False
+
+    def obtener_registro(self, coleccion, registro_id):
+        """Obtener un registro por su id"""
+        for registro in self.cargar_datos(coleccion):
+            if registro.get('id') == registro_id:
+                return registro
+        return None
+
+    def guardar_registros(self, coleccion, registros):
+        """Insertar o actualizar varios registros con una sola reescritura del archivo"""
+        # Leer-modificar-escribir bajo el bloqueo exclusivo para no perder escrituras concurrentes
+        with self.bloqueos.escritura(coleccion):
+            datos = self.cargar_datos(coleccion)
+            posiciones = {r.get('id'): i for i, r in enumerate(datos)}
+
+            for registro in registros:
+                posicion = posiciones.get(registro.get('id'))
+                if posicion is None:
+                    posiciones[registro.get('id')] = len(datos)
+                    datos.append(registro)
+                else:
+                    datos[posicion] = registro
+
+            return self.guardar_datos(coleccion, datos)
+
+    def eliminar_registro(self, coleccion, registro_id):
+        """Eliminar un registro por su id"""
+        with self.bloqueos.escritura(coleccion):
+            datos = self.cargar_datos(coleccion)
+            filtrados = [r for r in datos if r.get('id') != registro_id]
+            if len(filtrados) == len(datos):
+                return False
+            return self.guardar_datos(coleccion, filtrados)
+
+    def actualizar_registro(self, coleccion, registro_id, cambios):
+        """Actualizar campos de un registro sin pisar cambios concurrentes en otros campos"""
+        with self.bloqueos.escritura(coleccion):
+            datos = self.cargar_datos(coleccion)
+            for registro in datos:
+                if registro.get('id') == registro_id:
+                    registro.update(cambios)
+                    return registro if self.guardar_datos(coleccion, datos) else None
+            return None
+
+
+class AlmacenamientoSQLite(AlmacenamientoBase):
+    """
+    Almacenamiento en SQLite (modo WAL).
+    Cada colección es una tabla con el registro completo en JSON y columnas
+    indexadas para id, telefono, estado y creado_en.
+    """
+
+    def __init__(self, ruta_db=None, data_dir=DIRECTORIO_DATOS):
+        self.data_dir = data_dir
+        self.ruta_db = ruta_db or os.path.join(data_dir, 'whatsapp_sender.db')
+        self._local = threading.local()
+        self._tablas = set()
+        self._lock_tablas = threading.Lock()
+
+    def _conexion(self):
+        """Conexión SQLite propia de cada hilo"""
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.ruta_db)), exist_ok=True)
+            conexion = sqlite3.connect(self.ruta_db, timeout=30)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute('PRAGMA synchronous=NORMAL')
+            self._local.conexion = conexion
+        return conexion
+
+    def _tabla(self, coleccion):
+        """Crear (una sola vez) la tabla e índices de la colección"""
+        tabla = _validar_coleccion(coleccion)
+        if tabla in self._tablas:
+            return tabla
+
+        with self._lock_tablas:
+            conexion = self._conexion()
+            with conexion:
+                conexion.execute(
+                    f'CREATE TABLE IF NOT EXISTS "{tabla}" ('
+                    'id TEXT PRIMARY KEY, '
+                    'telefono TEXT, '
+                    'estado TEXT, '
+                    'creado_en TEXT, '
+                    'datos TEXT NOT NULL)'
+                )
+                for campo in CAMPOS_INDEXADOS:
+                    conexion.execute(
+                        f'CREATE INDEX IF NOT EXISTS "idx_{tabla}_{campo}" ON "{tabla}" ({campo})'
+                    )
+            self._tablas.add(tabla)
+        return tabla
+
+    @staticmethod
+    def _fila(registro):
+        """Convertir un registro a la tupla de columnas de la tabla"""
+        registro_id = registro.get('id')
+        clave = str(registro_id) if registro_id is not None else uuid.uuid4().hex
+        return (
+            clave,
+            registro.get('telefono'),
+            registro.get('estado'),
+            registro.get('creado_en'),
+            json.dumps(registro, ensure_ascii=False)
+        )
+
+    def existe(self, coleccion):
+        """Indica si la tabla de la colección existe"""
+        fila = self._conexion().execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (_validar_coleccion(coleccion),)
+        ).fetchone()
+        return fila is not None
+
+    def firma(self, coleccion):
+        """mtime y tamaño del archivo de base de datos y de su WAL"""
+        return self._firma_archivos(self.ruta_db, f'{self.ruta_db}-wal')
+
+    def cargar_datos(self, coleccion):
+        """Cargar todos los registros en orden de inserción"""
+        tabla = self._tabla(coleccion)
+        try:
+            filas = self._conexion().execute(f'SELECT datos FROM "{tabla}" ORDER BY rowid').fetchall()
+            return [json.loads(fila[0]) for fila in filas]
+        except sqlite3.Error as e:
+            logger.error(f"Error cargando {tabla} desde SQLite: {e}")
+            return []
+
+    def guardar_datos(self, coleccion, datos):
+        """Reemplazar todos los registros de la colección en una transacción"""
+        tabla = self._tabla(coleccion)
+        try:
+            conexion = self._conexion()
+            with conexion:
+                conexion.execute(f'DELETE FROM "{tabla}"')
+                conexion.executemany(
+                    f'INSERT OR REPLACE INTO "{tabla}" (id, telefono, estado, creado_en, datos) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    [self._fila(r) for r in datos]
+                )
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error guardando {tabla} en SQLite: {e}")
+            return False
+
+    def obtener_registro(self, coleccion, registro_id):
+        """Obtener un registro por su id (búsqueda por clave primaria)"""
+        if registro_id is None:
+            return None
+        tabla = self._tabla(coleccion)
+        try:
+            fila = self._conexion().execute(
+                f'SELECT datos FROM "{tabla}" WHERE id = ?', (str(registro_id),)
+            ).fetchone()
+            return json.loads(fila[0]) if fila else None
+        except sqlite3.Error as e:
+            logger.error(f"Error obteniendo registro de {tabla}: {e}")
+            return None
+
+    def guardar_registros(self, coleccion, registros):
+        """Upsert de varios registros en una sola transacción"""
+        tabla = self._tabla(coleccion)
+        try:
+            conexion = self._conexion()
+            with conexion:
+                conexion.executemany(
+                    f'INSERT INTO "{tabla}" (id, telefono, estado, creado_en, datos) '
+                    'VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT(id) DO UPDATE SET '
+                    'telefono = excluded.telefono, '
+                    'estado = excluded.estado, '
+                    'creado_en = excluded.creado_en, '
+                    'datos = excluded.datos',
+                    [self._fila(r) for r in registros]
+                )
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error guardando registros en {tabla}: {e}")
+            return False
+
+    def eliminar_registro(self, coleccion, registro_id):
+        """Eliminar un registro por su id"""
+        tabla = self._tabla(coleccion)
+        try:
+            conexion = self._conexion()
+            with conexion:
+                cursor = conexion.execute(f'DELETE FROM "{tabla}" WHERE id = ?', (str(registro_id),))
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            logger.error(f"Error eliminando registro de {tabla}: {e}")
+            return False
+
+    def actualizar_registro(self, coleccion, registro_id, cambios):
+        """Actualizar campos de un registro dentro de una transacción de escritura"""
+        tabla = self._tabla(coleccion)
+        try:
+            conexion = self._conexion()
+            with conexion:
+                # BEGIN IMMEDIATE toma el bloqueo de escritura antes de leer
+                conexion.execute('BEGIN IMMEDIATE')
+                fila = conexion.execute(
+                    f'SELECT datos FROM "{tabla}" WHERE id = ?', (str(registro_id),)
+                ).fetchone()
+                if not fila:
+                    return None
+                registro = json.loads(fila[0])
+                registro.update(cambios)
+                conexion.execute(
+                    f'UPDATE "{tabla}" SET telefono = ?, estado = ?, creado_en = ?, datos = ? WHERE id = ?',
+                    self._fila(registro)[1:] + (str(registro_id),)
+                )
+            return registro
+        except sqlite3.Error as e:
+            logger.error(f"Error actualizando registro de {tabla}: {e}")
+            return None
+
+    def buscar_por_campo(self, coleccion, campo, valor):
+        """Buscar por campo; usa el índice si el campo es una columna indexada"""
+        tabla = self._tabla(coleccion)
+        try:
+            if campo in CAMPOS_INDEXADOS:
+                consulta = f'SELECT datos FROM "{tabla}" WHERE {campo} = ? ORDER BY rowid'
+                filas = self._conexion().execute(consulta, (valor,)).fetchall()
+            else:
+                _validar_coleccion(campo)
+                consulta = f'SELECT datos FROM "{tabla}" WHERE json_extract(datos, \'$.{campo}\') = ? ORDER BY rowid'
+                filas = self._conexion().execute(consulta, (valor,)).fetchall()
+            return [json.loads(fila[0]) for fila in filas]
+        except sqlite3.Error as e:
+            logger.error(f"Error buscando en {tabla}: {e}")
+            return []
+
+    def contar(self, coleccion):
+        """Cantidad de registros de la colección"""
+        tabla = self._tabla(coleccion)
+        try:
+            return self._conexion().execute(f'SELECT COUNT(*) FROM "{tabla}"').fetchone()[0]
+        except sqlite3.Error as e:
+            logger.error(f"Error contando registros de {tabla}: {e}")
+            return 0
+
+
+class BaseDatos:
+    """Punto de acceso único al almacenamiento local usado por todos los modelos"""
+
+    def __init__(self, motor=None, data_dir=DIRECTORIO_DATOS):
+        self.data_dir = data_dir
+        self._inicializar_directorio()
+
+        motor = (motor or os.environ.get('ALMACENAMIENTO', 'json')).lower()
+        if motor == 'sqlite':
+            self.almacenamiento = AlmacenamientoSQLite(data_dir=data_dir)
+        else:
+            self.almacenamiento = AlmacenamientoJSON(data_dir=data_dir)
+        self.motor = motor if motor == 'sqlite' else 'json'
+
+    def _inicializar_directorio(self):
+        """Crear directorio de datos si no existe"""
+        if not os.path.exists(self.data_dir):
+            try:
+                os.makedirs(self.data_dir)
+                logger.info(f"Directorio {self.data_dir} creado exitosamente")
+            except OSError as e:
+                logger.error(f"Error creando directorio {self.data_dir}: {e}")
+
+    def cargar_datos(self, coleccion):
+        """Cargar todos los registros de una colección"""
+        return self.almacenamiento.cargar_datos(coleccion)
+
+    def guardar_datos(self, coleccion, datos):
+        """Reemplazar todos los registros de una colección"""
+        return self.almacenamiento.guardar_datos(coleccion, datos)
+
+    def obtener_registro(self, coleccion, registro_id):
+        """Obtener un registro por id"""
+        return self.almacenamiento.obtener_registro(coleccion, registro_id)
+
+    def guardar_registro(self, coleccion, registro):
+        """Insertar o actualizar un registro"""
+        return self.almacenamiento.guardar_registro(coleccion, registro)
+
+    def guardar_registros(self, coleccion, registros):
+        """Insertar o actualizar varios registros en una sola escritura"""
+        return self.almacenamiento.guardar_registros(coleccion, registros)
+
+    def eliminar_registro(self, coleccion, registro_id):
+        """Eliminar un registro por id"""
+        return self.almacenamiento.eliminar_registro(coleccion, registro_id)
+
+    def actualizar_registro(self, coleccion, registro_id, cambios):
+        """Actualizar algunos campos de un registro"""
+        return self.almacenamiento.actualizar_registro(coleccion, registro_id, cambios)
+
+    def buscar_por_campo(self, coleccion, campo, valor):
+        """Buscar registros por igualdad de campo"""
+        return self.almacenamiento.buscar_por_campo(coleccion, campo, valor)
+
+    def contar(self, coleccion):
+        """Cantidad de registros de una colección"""
+        return self.almacenamiento.contar(coleccion)
+
+    def existe(self, coleccion):
+        """Indica si la colección ya fue creada"""
+        return self.almacenamiento.existe(coleccion)
+
+    def firma(self, coleccion):
+        """Marca de modificación en disco de una colección"""
+        return self.almacenamiento.firma(coleccion)
+
+
+def migrar_json_a_sqlite(data_dir=DIRECTORIO_DATOS, ruta_db=None, forzar=False):
+    """
+    Migración única de los archivos JSON existentes a SQLite.
+    Las colecciones que ya tienen registros en SQLite se omiten salvo con forzar=True.
+    """
+    origen = AlmacenamientoJSON(data_dir=data_dir)
+    destino = AlmacenamientoSQLite(ruta_db=ruta_db, data_dir=data_dir)
+    resumen = {}
+
+    for coleccion in COLECCIONES:
+        if not os.path.exists(origen.ruta_archivo(coleccion)):
+            continue
+
+        if destino.contar(coleccion) > 0 and not forzar:
+            logger.info(f"{coleccion}: ya migrada, se omite")
+            resumen[coleccion] = 0
+            continue
+
+        registros = origen.cargar_datos(coleccion)
+        if destino.guardar_datos(coleccion, registros):
+            resumen[coleccion] = len(registros)
+            logger.info(f"{coleccion}: {len(registros)} registros migrados")
+        else:
+            resumen[coleccion] = 0
+
+    return resumen
+
+
+# Instancia global de la base de datos
+db = BaseDatos()
+
+
+if __name__ == '__main__':
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    resultado = migrar_json_a_sqlite(forzar='--forzar' in sys.argv)
+    print(f"Migración completada: {resultado}")
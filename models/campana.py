@@ -3,13 +3,12 @@ Modelo para las campañas de WhatsApp - Sin base de datos
 """
 from datetime import datetime
 import uuid
-import json
-import os
+from models.base_datos import db
 
 class Campana:
     """Modelo de campaña de WhatsApp"""
     
-    ARCHIVO_DATOS = 'data/campanas.json'
+    COLECCION = 'campanas'
     
     def __init__(self, contenido, plantilla_id=None, intervalo=5, origen_destinatarios='todos'):
         self.id = str(uuid.uuid4())
@@ -22,35 +21,26 @@ class Campana:
         self.enviados = 0
         self.fallidos = 0
         self.estado = 'creado'
+        self.archivo_path = None
+        self.tipo_archivo = None
+        self.adjunto = None  # Metadatos del adjunto preparado (utils/medios.py)
+        self.reenviar_adjunto = False  # Subir el adjunto una vez y reenviarlo a los demás
+        self.mensajes_por_hora = None  # Presupuesto por número (reemplaza al intervalo)
+        self.prioridad = 0
+        self.programado_para = None  # Hora de inicio programada (ISO)
+        self.tiempos = None  # Percentiles por fase de los envíos (utils/metricas_envio.py)
         self.creado_en = datetime.now()
         self.actualizado_en = datetime.now()
     
     @staticmethod
     def _cargar_datos():
-        """Carga campañas desde archivo JSON"""
-        os.makedirs('data', exist_ok=True)
-        
-        if not os.path.exists(Campana.ARCHIVO_DATOS):
-            return []
-        
-        try:
-            with open(Campana.ARCHIVO_DATOS, 'r', encoding='utf-8') as f:
-                datos = json.load(f)
-                return datos if isinstance(datos, list) else []
-        except (json.JSONDecodeError, IOError):
-            return []
+        """Carga campañas desde el almacenamiento"""
+        return db.cargar_datos(Campana.COLECCION)
     
     @staticmethod
     def _guardar_datos(datos):
-        """Guarda campañas en archivo JSON"""
-        os.makedirs('data', exist_ok=True)
-        
-        try:
-            with open(Campana.ARCHIVO_DATOS, 'w', encoding='utf-8') as f:
-                json.dump(datos, f, ensure_ascii=False, indent=2)
-            return True
-        except IOError:
-            return False
+        """Guarda todas las campañas en el almacenamiento"""
+        return db.guardar_datos(Campana.COLECCION, datos)
     
     def to_dict(self):
         """Convierte la campaña a diccionario"""
@@ -65,6 +55,14 @@ class Campana:
             'enviados': self.enviados,
             'fallidos': self.fallidos,
             'estado': self.estado,
+            'archivo_path': self.archivo_path,
+            'tipo_archivo': self.tipo_archivo,
+            'adjunto': self.adjunto,
+            'reenviar_adjunto': self.reenviar_adjunto,
+            'mensajes_por_hora': self.mensajes_por_hora,
+            'prioridad': self.prioridad,
+            'programado_para': self.programado_para,
+            'tiempos': self.tiempos,
             'creado_en': self.creado_en.isoformat(),
             'actualizado_en': self.actualizado_en.isoformat()
         }
@@ -85,6 +83,14 @@ class Campana:
         campana.enviados = data.get('enviados', 0)
         campana.fallidos = data.get('fallidos', 0)
         campana.estado = data.get('estado', 'creado')
+        campana.archivo_path = data.get('archivo_path')
+        campana.tipo_archivo = data.get('tipo_archivo')
+        campana.adjunto = data.get('adjunto')
+        campana.reenviar_adjunto = data.get('reenviar_adjunto', False)
+        campana.mensajes_por_hora = data.get('mensajes_por_hora')
+        campana.prioridad = data.get('prioridad', 0)
+        campana.programado_para = data.get('programado_para')
+        campana.tiempos = data.get('tiempos')
         
         if 'creado_en' in data:
             campana.creado_en = datetime.fromisoformat(data['creado_en'])
@@ -95,16 +101,17 @@ class Campana:
     
     def save(self):
         """Guarda la campaña"""
-        campanas = self._cargar_datos()
-        
-        for i, campana_data in enumerate(campanas):
-            if campana_data['id'] == self.id:
-                campanas[i] = self.to_dict()
-                break
-        else:
-            campanas.append(self.to_dict())
-        
-        return self._guardar_datos(campanas)
+        return db.guardar_registro(Campana.COLECCION, self.to_dict())
+    
+    @staticmethod
+    def actualizar_campos(campana_id, **campos):
+        """
+        Actualiza solo los campos indicados de una campaña guardada.
+        A diferencia de get_by_id().save(), no pisa los campos que otro hilo
+        haya cambiado entre la lectura y la escritura.
+        """
+        campos['actualizado_en'] = datetime.now().isoformat()
+        return db.actualizar_registro(Campana.COLECCION, campana_id, campos) is not None
     
     def actualizar_estado(self, nuevo_estado):
         """Actualiza el estado de la campaña"""
@@ -132,18 +139,14 @@ class Campana:
     @staticmethod
     def get_by_id(campana_id):
         """Obtiene una campaña por ID"""
-        campanas = Campana.get_all()
-        for campana_data in campanas:
-            if campana_data['id'] == campana_id:
-                return Campana.from_dict(campana_data)
-        return None
+        campana_data = db.obtener_registro(Campana.COLECCION, campana_id)
+        return Campana.from_dict(campana_data) if campana_data else None
     
     @staticmethod
     def get_activas():
         """Obtiene campañas activas"""
-        campanas = Campana.get_all()
         return [
-            Campana.from_dict(data) 
-            for data in campanas 
-            if data['estado'] in ['enviando', 'pausado']
-        ]
\ No newline at end of file
+            Campana.from_dict(data)
+            for estado in ['enviando', 'pausado', 'programado']
+            for data in db.buscar_por_campo(Campana.COLECCION, 'estado', estado)
+        ]
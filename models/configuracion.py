@@ -7,6 +7,8 @@ from datetime import datetime
 from typing import Dict, Any, Optional
 import logging
 
+from utils.escritura_atomica import escribir_json_atomico, cargar_respaldo_json
+
 logger = logging.getLogger(__name__)
 
 class Configuracion:
@@ -26,6 +28,9 @@ class Configuracion:
                     return json.load(f)
         except Exception as e:
             logger.error(f"Error cargando configuración: {e}")
+            respaldo = cargar_respaldo_json(self.archivo_config)
+            if isinstance(respaldo, dict):
+                return respaldo
         
         return {
             'empresa': {
@@ -65,8 +70,7 @@ class Configuracion:
             os.makedirs(os.path.dirname(self.archivo_config), exist_ok=True)
             self._configuracion['actualizado_en'] = datetime.now().isoformat()
             
-            with open(self.archivo_config, 'w', encoding='utf-8') as f:
-                json.dump(self._configuracion, f, indent=2, ensure_ascii=False)
+            escribir_json_atomico(self.archivo_config, self._configuracion, respaldo=True)
             
             logger.info("Configuración guardada exitosamente")
             return True
@@ -79,8 +83,7 @@ class Configuracion:
         try:
             os.makedirs(os.path.dirname(self.archivo_whatsapp), exist_ok=True)
             
-            with open(self.archivo_whatsapp, 'w', encoding='utf-8') as f:
-                json.dump(self._sesion_whatsapp, f, indent=2, ensure_ascii=False)
+            escribir_json_atomico(self.archivo_whatsapp, self._sesion_whatsapp)
             
             return True
         except Exception as e:
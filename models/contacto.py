@@ -1,64 +1,20 @@
 """
-Modelo para los contactos de WhatsApp con almacenamiento local JSON
+Modelo para los contactos de WhatsApp con almacenamiento local (JSON o SQLite)
 """
 from datetime import datetime, timedelta
+import copy
+import threading
 import uuid
-import json
-import os
 import re
-
-
-class BaseDatos:
-    """Manejo de almacenamiento local con archivos JSON"""
-    
-    def __init__(self):
-        self.data_dir = 'data'
-        self._inicializar_directorio()
-    
-    def _inicializar_directorio(self):
-        """Crear directorio de datos si no existe"""
-        if not os.path.exists(self.data_dir):
-            try:
-                os.makedirs(self.data_dir)
-                print(f"Directorio {self.data_dir} creado exitosamente")
-            except OSError as e:
-                print(f"Error creando directorio {self.data_dir}: {e}")
-    
-    def cargar_datos(self, nombre_archivo):
-        """Cargar datos desde archivo JSON"""
-        filepath = os.path.join(self.data_dir, f'{nombre_archivo}.json')
-        
-        if not os.path.exists(filepath):
-            return []
-        
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                datos = json.load(f)
-                return datos if isinstance(datos, list) else []
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"Error cargando {filepath}: {e}")
-            return []
-    
-    def guardar_datos(self, nombre_archivo, datos):
-        """Guardar datos en archivo JSON"""
-        filepath = os.path.join(self.data_dir, f'{nombre_archivo}.json')
-        
-        try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(datos, f, ensure_ascii=False, indent=2)
-            return True
-        except IOError as e:
-            print(f"Error guardando {filepath}: {e}")
-            return False
-
-
-# Instancia global de la base de datos
-db = BaseDatos()
+from models.base_datos import BaseDatos, db  # BaseDatos se mantiene importable desde aquí
 
 
 class Contacto:
     """Modelo de contacto de WhatsApp"""
     
+    # Campos calculados: se incluyen en to_dict() pero no se guardan en disco
+    CAMPOS_DERIVADOS = ('iniciales', 'tasa_entrega', 'tasa_lectura')
+    
     def __init__(self, nombre, telefono, email=None, empresa=None):
         self.id = str(uuid.uuid4())
         self.nombre = self._limpiar_texto(nombre)
@@ -146,9 +102,9 @@ class Contacto:
             return 0
         return round((self.total_mensajes_leidos / self.total_mensajes_entregados) * 100, 1)
     
-    def to_dict(self):
+    def to_dict(self, incluir_derivados=True):
         """Convierte el contacto a diccionario para JSON"""
-        return {
+        datos = {
             'id': self.id,
             'nombre': self.nombre,
             'telefono': self.telefono,
@@ -163,11 +119,17 @@ class Contacto:
             'etiquetas': self.etiquetas,
             'origen': self.origen,
             'creado_en': self.creado_en.isoformat(),
-            'actualizado_en': self.actualizado_en.isoformat(),
-            'iniciales': self.iniciales,
-            'tasa_entrega': self.tasa_entrega,
-            'tasa_lectura': self.tasa_lectura
+            'actualizado_en': self.actualizado_en.isoformat()
         }
+        if incluir_derivados:
+            datos['iniciales'] = self.iniciales
+            datos['tasa_entrega'] = self.tasa_entrega
+            datos['tasa_lectura'] = self.tasa_lectura
+        return datos
+    
+    def to_registro(self):
+        """Diccionario que se guarda en el almacenamiento (sin campos derivados)"""
+        return self.to_dict(incluir_derivados=False)
     
     @classmethod
     def from_dict(cls, data):
@@ -206,18 +168,8 @@ class Contacto:
             return None
     
     def guardar(self):
-        """Guarda el contacto en el sistema"""
-        contactos = self.obtener_todos_dict()
-        
-        # Buscar si ya existe
-        for i, contacto_data in enumerate(contactos):
-            if contacto_data['id'] == self.id:
-                contactos[i] = self.to_dict()
-                break
-        else:
-            contactos.append(self.to_dict())
-        
-        return db.guardar_datos('contactos', contactos)
+        """Guarda el contacto en el sistema (upsert por id, escritura directa)"""
+        return repositorio_contactos.guardar(self)
     
     def actualizar(self, **kwargs):
         """Actualiza los campos del contacto"""
@@ -262,54 +214,23 @@ class Contacto:
     
     def eliminar(self):
         """Eliminar contacto del sistema"""
-        contactos = self.obtener_todos_dict()
-        contactos_filtrados = [c for c in contactos if c['id'] != self.id]
-        return db.guardar_datos('contactos', contactos_filtrados)
+        return repositorio_contactos.eliminar(self.id)
     
     # Métodos estáticos
     @staticmethod
     def obtener_todos_dict():
         """Obtiene todos los contactos como diccionarios"""
-        return db.cargar_datos('contactos')
+        return [contacto.to_dict() for contacto in repositorio_contactos.todos()]
     
     @staticmethod
     def obtener_todos():
         """Obtiene todos los contactos como objetos Contacto válidos"""
-        contactos_data = Contacto.obtener_todos_dict()
-        contactos_validos = []
-        contactos_invalidos = []
-        
-        for data in contactos_data:
-            contacto = Contacto.from_dict(data)
-            if contacto:
-                contactos_validos.append(contacto)
-            else:
-                contactos_invalidos.append(data)
-        
-        # Si hay contactos inválidos, limpiar la base de datos
-        if contactos_invalidos:
-            print(f"Eliminando {len(contactos_invalidos)} contactos inválidos...")
-            for invalid in contactos_invalidos:
-                telefono_invalid = invalid.get('telefono', 'desconocido')
-                nombre_invalid = invalid.get('nombre', 'desconocido')
-                print(f"- Contacto inválido eliminado: {nombre_invalid} ({telefono_invalid})")
-            
-            # Guardar solo los contactos válidos
-            contactos_validos_dict = [c.to_dict() for c in contactos_validos]
-            db.guardar_datos('contactos', contactos_validos_dict)
-        
-        return contactos_validos
+        return repositorio_contactos.todos()
     
     @staticmethod
     def obtener_por_id(contacto_id):
         """Obtiene un contacto por ID"""
-        contactos = Contacto.obtener_todos()
-        
-        for contacto in contactos:
-            if contacto.id == contacto_id:
-                return contacto
-        
-        return None
+        return repositorio_contactos.obtener(contacto_id)
     
     @staticmethod
     def obtener_por_telefono(telefono):
@@ -317,13 +238,7 @@ class Contacto:
         try:
             # Limpiar teléfono para comparación
             telefono_limpio = Contacto._limpiar_telefono_estatico(telefono)
-            contactos = Contacto.obtener_todos()
-            
-            for contacto in contactos:
-                if contacto.telefono == telefono_limpio:
-                    return contacto
-            
-            return None
+            return repositorio_contactos.obtener_por_telefono(telefono_limpio)
         except ValueError:
             return None
     
@@ -350,31 +265,25 @@ class Contacto:
         if not termino or not termino.strip():
             return []
         
-        contactos = Contacto.obtener_todos()
         termino_lower = termino.lower().strip()
-        resultados = []
         
-        for contacto in contactos:
+        def coincide(contacto):
             if contacto.estado == 'inactivo':
-                continue
+                return False
             
             # Buscar en nombre, teléfono y email
-            coincide = (
+            return bool(
                 (contacto.nombre and termino_lower in contacto.nombre.lower()) or
                 (contacto.telefono and termino in contacto.telefono) or
                 (contacto.email and termino_lower in contacto.email.lower())
             )
-            
-            if coincide:
-                resultados.append(contacto)
         
-        return resultados
+        return repositorio_contactos.filtrar(coincide)
     
     @staticmethod
     def obtener_por_estado(estado):
         """Obtener contactos por estado"""
-        contactos = Contacto.obtener_todos()
-        return [c for c in contactos if c.estado == estado]
+        return repositorio_contactos.obtener_por_estado(estado)
     
     @staticmethod
     def obtener_activos():
@@ -384,35 +293,7 @@ class Contacto:
     @staticmethod
     def estadisticas():
         """Obtener estadísticas generales de contactos"""
-        contactos = Contacto.obtener_todos()  # Usa obtener_todos() que ya limpia los inválidos
-        total = len(contactos)
-        
-        if total == 0:
-            return {
-                'total': 0,
-                'activos': 0,
-                'bloqueados': 0,
-                'inactivos': 0,
-                'nuevos_7_dias': 0,
-                'tasa_activos': 0
-            }
-        
-        activos = len([c for c in contactos if c.estado == 'activo'])
-        bloqueados = len([c for c in contactos if c.estado == 'bloqueado'])
-        inactivos = len([c for c in contactos if c.estado == 'inactivo'])
-        
-        # Nuevos en los últimos 7 días
-        hace_7_dias = datetime.now() - timedelta(days=7)
-        nuevos = len([c for c in contactos if c.creado_en >= hace_7_dias])
-        
-        return {
-            'total': total,
-            'activos': activos,
-            'bloqueados': bloqueados,
-            'inactivos': inactivos,
-            'nuevos_7_dias': nuevos,
-            'tasa_activos': round((activos / total * 100), 1) if total > 0 else 0
-        }
+        return repositorio_contactos.estadisticas()
     
     @staticmethod
     def crear(nombre, telefono, email=None, empresa=None, notas=None, origen='manual'):
@@ -436,10 +317,64 @@ class Contacto:
         else:
             raise Exception("Error guardando el contacto")
     
+    @staticmethod
+    def crear_lote(datos_contactos, origen='manual'):
+        """
+        Crear varios contactos con una sola escritura al almacenamiento.
+        
+        Args:
+            datos_contactos: lista de dicts con 'nombre', 'telefono' y opcionalmente
+                'email', 'empresa', 'notas' y 'estado'
+            origen: origen asignado a todos los contactos
+            
+        Returns:
+            tuple: (contactos creados, lista de (índice, mensaje de error))
+        """
+        estados_validos = {'activo', 'bloqueado', 'inactivo'}
+        candidatos = []
+        errores = []
+        
+        for indice, datos in enumerate(datos_contactos):
+            try:
+                contacto = Contacto(
+                    nombre=datos.get('nombre'),
+                    telefono=datos.get('telefono'),
+                    email=datos.get('email'),
+                    empresa=datos.get('empresa')
+                )
+            except ValueError as e:
+                errores.append((indice, str(e)))
+                continue
+            
+            estado = datos.get('estado') or 'activo'
+            if estado not in estados_validos:
+                errores.append((indice, f"Estado inválido. Debe ser uno de: {estados_validos}"))
+                continue
+            
+            contacto.estado = estado
+            contacto.notas = datos.get('notas')
+            contacto.origen = origen
+            candidatos.append((indice, contacto))
+        
+        # La verificación de teléfonos existentes y la escritura ocurren bajo el mismo lock
+        omitidos = repositorio_contactos.guardar_nuevos([c for _, c in candidatos])
+        if omitidos is None:
+            raise Exception("Error guardando el lote de contactos")
+        
+        creados = []
+        for indice, contacto in candidatos:
+            if contacto.id in omitidos:
+                errores.append((indice, f"Ya existe un contacto con el teléfono {contacto.telefono}"))
+            else:
+                creados.append(contacto)
+        errores.sort()
+        
+        return creados, errores
+    
     @staticmethod
     def limpiar_contactos_invalidos():
         """Método para limpiar manualmente contactos inválidos"""
-        contactos_data = Contacto.obtener_todos_dict()
+        contactos_data = db.cargar_datos('contactos')
         contactos_validos = []
         contactos_invalidos = []
         
@@ -462,6 +397,7 @@ class Contacto:
             
             # Guardar solo los válidos
             db.guardar_datos('contactos', contactos_validos)
+            repositorio_contactos.invalidar()
             print(f"Contactos inválidos eliminados. Quedaron {len(contactos_validos)} contactos válidos.")
             
             return len(contactos_invalidos)
@@ -470,6 +406,222 @@ class Contacto:
             return 0
 
 
+class RepositorioContactos:
+    """
+    Caché de contactos compartida por todo el proceso.
+    Carga la colección una sola vez, mantiene índices por id, teléfono y estado,
+    se recarga si el archivo cambia en disco y escribe directamente en cada cambio.
+    """
+    
+    COLECCION = 'contactos'
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._firma = None
+        self._cargado = False
+        self._por_id = {}
+        self._por_telefono = {}
+        self._por_estado = {}
+    
+    @staticmethod
+    def _copiar(contacto):
+        """Copia independiente para que los cambios sin guardar no alteren la caché"""
+        copia = copy.copy(contacto)
+        copia.etiquetas = list(contacto.etiquetas or [])
+        return copia
+    
+    def invalidar(self):
+        """Forzar recarga en el próximo acceso"""
+        with self._lock:
+            self._cargado = False
+    
+    def _asegurar_cargado(self):
+        """Cargar la colección si aún no está en memoria o cambió en disco"""
+        if self._cargado and db.firma(self.COLECCION) == self._firma:
+            return
+        
+        contactos_data = db.cargar_datos(self.COLECCION)
+        contactos_validos = []
+        contactos_invalidos = []
+        
+        for data in contactos_data:
+            contacto = Contacto.from_dict(data)
+            if contacto:
+                contactos_validos.append(contacto)
+            else:
+                contactos_invalidos.append(data)
+        
+        # Si hay contactos inválidos, limpiar la base de datos
+        if contactos_invalidos:
+            print(f"Eliminando {len(contactos_invalidos)} contactos inválidos...")
+            for invalid in contactos_invalidos:
+                telefono_invalid = invalid.get('telefono', 'desconocido')
+                nombre_invalid = invalid.get('nombre', 'desconocido')
+                print(f"- Contacto inválido eliminado: {nombre_invalid} ({telefono_invalid})")
+            
+            # Guardar solo los contactos válidos
+            db.guardar_datos(self.COLECCION, [c.to_registro() for c in contactos_validos])
+        
+        self._por_id = {}
+        self._por_telefono = {}
+        self._por_estado = {}
+        for contacto in contactos_validos:
+            self._indexar(contacto)
+        
+        self._firma = db.firma(self.COLECCION)
+        self._cargado = True
+    
+    def _indexar(self, contacto):
+        """Agregar un contacto a los índices"""
+        self._por_id[contacto.id] = contacto
+        self._por_telefono[contacto.telefono] = contacto.id
+        self._por_estado.setdefault(contacto.estado, set()).add(contacto.id)
+    
+    def _quitar_claves(self, contacto_id):
+        """Quitar las entradas de teléfono y estado de un contacto indexado"""
+        anterior = self._por_id.get(contacto_id)
+        if not anterior:
+            return
+        if self._por_telefono.get(anterior.telefono) == contacto_id:
+            del self._por_telefono[anterior.telefono]
+        ids_estado = self._por_estado.get(anterior.estado)
+        if ids_estado:
+            ids_estado.discard(contacto_id)
+    
+    def todos(self):
+        """Todos los contactos válidos, en orden de creación"""
+        with self._lock:
+            self._asegurar_cargado()
+            return [self._copiar(c) for c in self._por_id.values()]
+    
+    def obtener(self, contacto_id):
+        """Contacto por id"""
+        with self._lock:
+            self._asegurar_cargado()
+            contacto = self._por_id.get(contacto_id)
+            return self._copiar(contacto) if contacto else None
+    
+    def obtener_por_telefono(self, telefono_limpio):
+        """Contacto por teléfono ya normalizado (+5939XXXXXXXX)"""
+        with self._lock:
+            self._asegurar_cargado()
+            contacto_id = self._por_telefono.get(telefono_limpio)
+            return self._copiar(self._por_id[contacto_id]) if contacto_id else None
+    
+    def obtener_por_estado(self, estado):
+        """Contactos con el estado indicado, en orden de creación"""
+        with self._lock:
+            self._asegurar_cargado()
+            ids_estado = self._por_estado.get(estado, set())
+            return [self._copiar(c) for c in self._por_id.values() if c.id in ids_estado]
+    
+    def filtrar(self, condicion):
+        """Contactos que cumplen la condición (sin copiar los que no coinciden)"""
+        with self._lock:
+            self._asegurar_cargado()
+            return [self._copiar(c) for c in self._por_id.values() if condicion(c)]
+    
+    def telefonos_y_nombres(self):
+        """Conjuntos de teléfonos y nombres (en minúsculas) existentes"""
+        with self._lock:
+            self._asegurar_cargado()
+            telefonos = set(self._por_telefono)
+            nombres = {c.nombre.lower() for c in self._por_id.values() if c.nombre}
+            return telefonos, nombres
+    
+    def estadisticas(self):
+        """Estadísticas generales a partir de los índices en memoria"""
+        with self._lock:
+            self._asegurar_cargado()
+            total = len(self._por_id)
+            
+            if total == 0:
+                return {
+                    'total': 0,
+                    'activos': 0,
+                    'bloqueados': 0,
+                    'inactivos': 0,
+                    'nuevos_7_dias': 0,
+                    'tasa_activos': 0
+                }
+            
+            activos = len(self._por_estado.get('activo', ()))
+            bloqueados = len(self._por_estado.get('bloqueado', ()))
+            inactivos = len(self._por_estado.get('inactivo', ()))
+            
+            # Nuevos en los últimos 7 días
+            hace_7_dias = datetime.now() - timedelta(days=7)
+            nuevos = sum(1 for c in self._por_id.values() if c.creado_en >= hace_7_dias)
+            
+            return {
+                'total': total,
+                'activos': activos,
+                'bloqueados': bloqueados,
+                'inactivos': inactivos,
+                'nuevos_7_dias': nuevos,
+                'tasa_activos': round((activos / total * 100), 1) if total > 0 else 0
+            }
+    
+    def guardar(self, contacto):
+        """Escribir el contacto en disco y actualizar los índices"""
+        with self._lock:
+            self._asegurar_cargado()
+            if not db.guardar_registro(self.COLECCION, contacto.to_registro()):
+                return False
+            # Reasignar la clave existente conserva la posición en el orden
+            self._quitar_claves(contacto.id)
+            self._indexar(self._copiar(contacto))
+            self._firma = db.firma(self.COLECCION)
+            return True
+    
+    def guardar_lote(self, contactos):
+        """Escribir varios contactos en una sola operación y actualizar los índices"""
+        with self._lock:
+            self._asegurar_cargado()
+            if not db.guardar_registros(self.COLECCION, [c.to_registro() for c in contactos]):
+                return False
+            for contacto in contactos:
+                self._quitar_claves(contacto.id)
+                self._indexar(self._copiar(contacto))
+            self._firma = db.firma(self.COLECCION)
+            return True
+    
+    def guardar_nuevos(self, contactos):
+        """
+        Guardar en una sola escritura los contactos cuyo teléfono aún no existe.
+        Retorna los ids omitidos por teléfono repetido, o None si falla la escritura.
+        """
+        with self._lock:
+            self._asegurar_cargado()
+            nuevos = []
+            omitidos = set()
+            telefonos = set()
+            for contacto in contactos:
+                if contacto.telefono in self._por_telefono or contacto.telefono in telefonos:
+                    omitidos.add(contacto.id)
+                    continue
+                telefonos.add(contacto.telefono)
+                nuevos.append(contacto)
+            if nuevos and not self.guardar_lote(nuevos):
+                return None
+            return omitidos
+    
+    def eliminar(self, contacto_id):
+        """Eliminar el contacto en disco y de los índices"""
+        with self._lock:
+            self._asegurar_cargado()
+            if not db.eliminar_registro(self.COLECCION, contacto_id):
+                return False
+            self._quitar_claves(contacto_id)
+            self._por_id.pop(contacto_id, None)
+            self._firma = db.firma(self.COLECCION)
+            return True
+
+
+# Instancia global del repositorio de contactos
+repositorio_contactos = RepositorioContactos()
+
+
 class ListaContactos:
     """Modelo para listas de contactos"""
     
@@ -512,18 +664,8 @@ class ListaContactos:
             return None
     
     def guardar(self):
-        """Guarda la lista"""
-        listas = self.obtener_todas_dict()
-        
-        # Buscar si ya existe
-        for i, lista_data in enumerate(listas):
-            if lista_data['id'] == self.id:
-                listas[i] = self.to_dict()
-                break
-        else:
-            listas.append(self.to_dict())
-        
-        return db.guardar_datos('listas_contactos', listas)
+        """Guarda la lista (upsert por id)"""
+        return db.guardar_registro('listas_contactos', self.to_dict())
     
     @property
     def cantidad_contactos(self):
@@ -574,13 +716,8 @@ class ListaContactos:
     @staticmethod
     def obtener_por_id(lista_id):
         """Obtiene una lista por ID"""
-        listas = ListaContactos.obtener_todas_dict()
-        
-        for lista_data in listas:
-            if lista_data['id'] == lista_id:
-                return ListaContactos.from_dict(lista_data)
-        
-        return None
+        lista_data = db.obtener_registro('listas_contactos', lista_id)
+        return ListaContactos.from_dict(lista_data) if lista_data else None
     
     @staticmethod
     def crear(nombre, descripcion='', contactos_ids=None):
@@ -1,57 +1,46 @@
-import json
 import os
 from datetime import datetime
 from typing import List, Dict, Optional
+from models.base_datos import db
 
 class PlantillaModel:
+    COLECCION_PLANTILLAS = 'plantillas'
+    COLECCION_CATEGORIAS = 'categorias'
+    
     def __init__(self):
-        self.archivo_plantillas = 'data/plantillas.json'
-        self.archivo_categorias = 'data/categorias.json'
         self._asegurar_archivos()
     
     def _asegurar_archivos(self):
-        """Asegura que existan los archivos de datos"""
+        """Asegura que existan las colecciones de datos"""
         os.makedirs('data', exist_ok=True)
         
-        if not os.path.exists(self.archivo_plantillas):
-            with open(self.archivo_plantillas, 'w', encoding='utf-8') as f:
-                json.dump([], f)
+        if not db.existe(self.COLECCION_PLANTILLAS):
+            self._guardar_plantillas([])
         
-        if not os.path.exists(self.archivo_categorias):
+        if not db.existe(self.COLECCION_CATEGORIAS):
             categorias_default = [
                 {"id": 1, "nombre": "Marketing", "color": "#25d366"},
                 {"id": 2, "nombre": "Transaccional", "color": "#3b82f6"},
                 {"id": 3, "nombre": "Eventos", "color": "#f59e0b"},
                 {"id": 4, "nombre": "Soporte", "color": "#ef4444"}
             ]
-            with open(self.archivo_categorias, 'w', encoding='utf-8') as f:
-                json.dump(categorias_default, f, ensure_ascii=False, indent=2)
+            self._guardar_categorias(categorias_default)
     
     def _cargar_plantillas(self) -> List[Dict]:
-        """Carga plantillas desde el archivo"""
-        try:
-            with open(self.archivo_plantillas, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return []
+        """Carga plantillas desde el almacenamiento"""
+        return db.cargar_datos(self.COLECCION_PLANTILLAS)
     
     def _guardar_plantillas(self, plantillas: List[Dict]):
-        """Guarda plantillas en el archivo"""
-        with open(self.archivo_plantillas, 'w', encoding='utf-8') as f:
-            json.dump(plantillas, f, ensure_ascii=False, indent=2)
+        """Guarda plantillas en el almacenamiento"""
+        return db.guardar_datos(self.COLECCION_PLANTILLAS, plantillas)
     
     def _cargar_categorias(self) -> List[Dict]:
-        """Carga categorías desde el archivo"""
-        try:
-            with open(self.archivo_categorias, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return []
+        """Carga categorías desde el almacenamiento"""
+        return db.cargar_datos(self.COLECCION_CATEGORIAS)
     
     def _guardar_categorias(self, categorias: List[Dict]):
-        """Guarda categorías en el archivo"""
-        with open(self.archivo_categorias, 'w', encoding='utf-8') as f:
-            json.dump(categorias, f, ensure_ascii=False, indent=2)
+        """Guarda categorías en el almacenamiento"""
+        return db.guardar_datos(self.COLECCION_CATEGORIAS, categorias)
     
     def obtener_todas(self) -> List[Dict]:
         """Obtiene todas las plantillas"""
@@ -59,8 +48,7 @@ class PlantillaModel:
     
     def obtener_por_id(self, plantilla_id: int) -> Optional[Dict]:
         """Obtiene una plantilla por ID"""
-        plantillas = self._cargar_plantillas()
-        return next((p for p in plantillas if p['id'] == plantilla_id), None)
+        return db.obtener_registro(self.COLECCION_PLANTILLAS, plantilla_id)
     
     def crear(self, datos: Dict) -> Dict:
         """Crea una nueva plantilla"""
@@ -80,51 +68,39 @@ class PlantillaModel:
             'fecha_modificacion': datetime.now().strftime('%d/%m/%Y %H:%M')
         }
         
-        plantillas.append(nueva_plantilla)
-        self._guardar_plantillas(plantillas)
+        db.guardar_registro(self.COLECCION_PLANTILLAS, nueva_plantilla)
         
         return nueva_plantilla
     
     def actualizar(self, plantilla_id: int, datos: Dict) -> Optional[Dict]:
         """Actualiza una plantilla existente"""
-        plantillas = self._cargar_plantillas()
+        plantilla = db.obtener_registro(self.COLECCION_PLANTILLAS, plantilla_id)
         
-        for i, plantilla in enumerate(plantillas):
-            if plantilla['id'] == plantilla_id:
-                plantillas[i].update({
-                    'nombre': datos['nombre'],
-                    'categoria': datos['categoria'],
-                    'contenido': datos['contenido'],
-                    'variables': self._extraer_variables(datos['contenido']),
-                    'fecha_modificacion': datetime.now().strftime('%d/%m/%Y %H:%M')
-                })
-                
-                self._guardar_plantillas(plantillas)
-                return plantillas[i]
+        if not plantilla:
+            return None
+        
+        plantilla.update({
+            'nombre': datos['nombre'],
+            'categoria': datos['categoria'],
+            'contenido': datos['contenido'],
+            'variables': self._extraer_variables(datos['contenido']),
+            'fecha_modificacion': datetime.now().strftime('%d/%m/%Y %H:%M')
+        })
         
-        return None
+        db.guardar_registro(self.COLECCION_PLANTILLAS, plantilla)
+        return plantilla
     
     def eliminar(self, plantilla_id: int) -> bool:
         """Elimina una plantilla"""
-        plantillas = self._cargar_plantillas()
-        plantillas_filtradas = [p for p in plantillas if p['id'] != plantilla_id]
-        
-        if len(plantillas_filtradas) < len(plantillas):
-            self._guardar_plantillas(plantillas_filtradas)
-            return True
-        
-        return False
+        return db.eliminar_registro(self.COLECCION_PLANTILLAS, plantilla_id)
     
     def incrementar_uso(self, plantilla_id: int):
         """Incrementa el contador de usos de una plantilla"""
-        plantillas = self._cargar_plantillas()
+        plantilla = db.obtener_registro(self.COLECCION_PLANTILLAS, plantilla_id)
         
-        for plantilla in plantillas:
-            if plantilla['id'] == plantilla_id:
-                plantilla['usos'] = plantilla.get('usos', 0) + 1
-                break
-        
-        self._guardar_plantillas(plantillas)
+        if plantilla:
+            plantilla['usos'] = plantilla.get('usos', 0) + 1
+            db.guardar_registro(self.COLECCION_PLANTILLAS, plantilla)
     
     def _extraer_variables(self, contenido: str) -> List[str]:
         """Extrae variables del contenido"""
@@ -149,21 +125,13 @@ class PlantillaModel:
             'color': color
         }
         
-        categorias.append(nueva_categoria)
-        self._guardar_categorias(categorias)
+        db.guardar_registro(self.COLECCION_CATEGORIAS, nueva_categoria)
         
         return nueva_categoria
     
     def eliminar_categoria(self, categoria_id: int) -> bool:
         """Elimina una categoría"""
-        categorias = self._cargar_categorias()
-        categorias_filtradas = [c for c in categorias if c['id'] != categoria_id]
-        
-        if len(categorias_filtradas) < len(categorias):
-            self._guardar_categorias(categorias_filtradas)
-            return True
-        
-        return False
+        return db.eliminar_registro(self.COLECCION_CATEGORIAS, categoria_id)
     
     def buscar(self, termino: str) -> List[Dict]:
         """Busca plantillas por término"""
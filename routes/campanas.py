@@ -5,8 +5,12 @@ from datetime import datetime
 from models.contacto import Contacto
 from models.analitica import Analitica
 from models.campana import Campana
+from models.bandeja_salida import BandejaSalida
+from utils.control_envio import ControlEnvio
+from utils.planificador_envios import planificador_envios
+from utils.medios import ErrorMedio, preparar_adjunto, eliminar_preparado
+from utils.metricas_envio import metricas_envio
 import logging
-import threading
 import os
 from werkzeug.utils import secure_filename
 
@@ -17,6 +21,12 @@ campanas_bp = Blueprint('campanas', __name__)
 
 CAMPANAS_ACTIVAS = []
 
+# Control de detención/pausa del hilo enviador de cada campaña (por id)
+CONTROLES_ENVIO = {}
+
+# Cada cuántos mensajes se guardan los tiempos por fase en el registro de la campaña
+MENSAJES_POR_GUARDADO_TIEMPOS = 25
+
 PLANTILLAS_MOCK = [
     {'id': 1, 'nombre': 'Plantilla Promocional'},
     {'id': 2, 'nombre': 'Plantilla Informativa'},
@@ -40,6 +50,20 @@ def allowed_file(filename, tipo):
     ext = filename.rsplit('.', 1)[1].lower()
     return ext in ALLOWED_EXTENSIONS.get(tipo, set())
 
+def liberar_adjunto(campana_id, archivo_path):
+    """Borrar el adjunto si ninguna otra campaña sin terminar lo usa (la caché de medios lo comparte)"""
+    if not archivo_path or not os.path.exists(archivo_path):
+        return
+    for otra in CAMPANAS_ACTIVAS + Campana.get_all():
+        if (otra.get('id') != campana_id and otra.get('archivo_path') == archivo_path
+                and otra.get('estado') != 'completado'):
+            return
+    try:
+        eliminar_preparado(archivo_path)
+        logger.info(f" Archivo temporal eliminado: {archivo_path}")
+    except OSError:
+        pass
+
 class ContactosService:
     """Servicio para manejo centralizado de contactos"""
     
@@ -87,71 +111,84 @@ def manejar_error_global(error, mensaje="Error interno", codigo=500):
         'error': str(error) if isinstance(error, (ValueError, TypeError)) else None
     }), codigo
 
-def enviar_campana_background(campana_id, contactos, mensaje, intervalo, archivo_path=None, tipo_archivo=None):
-    """ MEJORADO: Enviar campaña en segundo plano CON ARCHIVOS"""
-    from utils.servicio_whatsapp import servicio_whatsapp
+def programar_envio_campana(campana, contactos, control, prioridad=0, inicio=None):
+    """Encolar la campaña en el planificador de envíos (un solo navegador para todas)"""
+    campana_id = campana['id']
+    archivo_path = campana.get('archivo_path')
     
-    logger.info(f"Iniciando envío de campaña {campana_id}")
-    
-    campana = None
-    for c in CAMPANAS_ACTIVAS:
-        if c['id'] == campana_id:
-            campana = c
-            break
-    
-    if not campana:
-        logger.error(f"Campaña {campana_id} no encontrada")
-        return
+    # Bandeja persistente: si la campaña ya se había iniciado, retoma los pendientes.
+    # Aún no hay otro escritor, así que se pueden cerrar los envíos interrumpidos
+    bandeja = BandejaSalida.abrir_o_crear(campana_id, contactos)
+    bandeja.recuperar_interrumpidos()
     
     def actualizar_progreso(progreso):
         campana['enviados'] = progreso['enviados']
         campana['fallidos'] = progreso['fallidos']
+        campana['ritmo_efectivo'] = progreso.get('mensajes_por_hora')
+        cambios = {'enviados': progreso['enviados'], 'fallidos': progreso['fallidos']}
+        
+        if campana['estado'] == 'programado':
+            campana['estado'] = cambios['estado'] = 'enviando'
+        
+        if progreso['actual'] % MENSAJES_POR_GUARDADO_TIEMPOS == 0:
+            campana['tiempos'] = cambios['tiempos'] = metricas_envio.resumen(campana_id)
         
-        campana_obj = Campana.get_by_id(campana_id)
-        if campana_obj:
-            campana_obj.enviados = progreso['enviados']
-            campana_obj.fallidos = progreso['fallidos']
-            campana_obj.save()
+        Campana.actualizar_campos(campana_id, **cambios)
         
         logger.info(
-            f"Progreso: {progreso['actual']}/{progreso['total']} "
+            f"Progreso {campana_id}: {progreso['actual']}/{progreso['total']} "
             f"({progreso['enviados']} | {progreso['fallidos']})"
         )
     
-    #  Enviar mensajes con archivo si existe
-    resultados = servicio_whatsapp.enviar_mensajes_masivos(
-        contactos=contactos,
-        mensaje=mensaje,
-        intervalo=intervalo,
-        callback=actualizar_progreso,
-        archivo_path=archivo_path,
-        tipo_archivo=tipo_archivo
-    )
-    
-    campana['estado'] = 'completado'
-    campana['enviados'] = resultados['enviados']
-    campana['fallidos'] = resultados['fallidos']
-    campana['actualizado_en'] = datetime.now().isoformat()
-    
-    campana_obj = Campana.get_by_id(campana_id)
-    if campana_obj:
-        campana_obj.estado = 'completado'
-        campana_obj.enviados = resultados['enviados']
-        campana_obj.fallidos = resultados['fallidos']
-        campana_obj.save()
+    def finalizar(resultados):
+        campana['enviados'] = resultados['enviados']
+        campana['fallidos'] = resultados['fallidos']
+        campana['actualizado_en'] = datetime.now().isoformat()
+        campana['tiempos'] = metricas_envio.resumen(campana_id)
+        
+        if resultados['detenido']:
+            # Los pendientes siguen en la bandeja: se puede volver a iniciar
+            Campana.actualizar_campos(
+                campana_id,
+                enviados=resultados['enviados'],
+                fallidos=resultados['fallidos'],
+                tiempos=campana['tiempos']
+            )
+            logger.info(f"Campaña {campana_id} detenida durante el envío")
+            return
+        
+        campana['estado'] = 'completado'
+        Campana.actualizar_campos(
+            campana_id,
+            estado='completado',
+            enviados=resultados['enviados'],
+            fallidos=resultados['fallidos'],
+            tiempos=campana['tiempos']
+        )
+        
+        logger.info(
+            f"Campaña completada: {resultados['enviados']} enviados, "
+            f"{resultados['fallidos']} fallidos"
+        )
+        
+        #  Limpiar archivo temporal si existe
+        liberar_adjunto(campana_id, archivo_path)
     
-    logger.info(
-        f"Campaña completada: {resultados['enviados']} enviados, "
-        f"{resultados['fallidos']} fallidos"
+    return planificador_envios.programar(
+        campana_id,
+        bandeja,
+        campana['contenido'],
+        intervalo=campana['intervalo'],
+        mensajes_por_hora=campana.get('mensajes_por_hora'),
+        archivo_path=archivo_path,
+        tipo_archivo=campana.get('tipo_archivo'),
+        reenviar_adjunto=campana.get('reenviar_adjunto', False),
+        prioridad=prioridad,
+        inicio=inicio,
+        control=control,
+        al_progresar=actualizar_progreso,
+        al_terminar=finalizar
     )
-    
-    #  Limpiar archivo temporal si existe
-    if archivo_path and os.path.exists(archivo_path):
-        try:
-            os.remove(archivo_path)
-            logger.info(f" Archivo temporal eliminado: {archivo_path}")
-        except:
-            pass
 
 @campanas_bp.route('/')
 @campanas_bp.route('/index')
@@ -218,6 +255,25 @@ def api_crear():
                 400
             )
         
+        # Presupuesto por número; si se indica reemplaza al intervalo
+        mensajes_por_hora = data.get('mensajes_por_hora')
+        if mensajes_por_hora in (None, ''):
+            mensajes_por_hora = None
+        else:
+            try:
+                mensajes_por_hora = int(mensajes_por_hora)
+            except (TypeError, ValueError):
+                mensajes_por_hora = 0
+            if mensajes_por_hora <= 0:
+                return manejar_error_global(
+                    ValueError("mensajes_por_hora debe ser un entero mayor que 0"),
+                    "Mensajes por hora inválido",
+                    400
+                )
+        
+        # Reenviar el adjunto es opcional: llega como mensaje aparte marcado "Reenviado"
+        reenviar_adjunto = str(data.get('reenviar_adjunto', '')).lower() in ('true', '1', 'on')
+        
         origen = data.get('recipients_origin', 'activos')
         
         if origen == 'activos':
@@ -248,15 +304,26 @@ def api_crear():
         #  Procesar archivo adjunto si existe
         archivo_path = None
         tipo_archivo = data.get('tipo_archivo')
+        adjunto = None
         
         if archivo and tipo_archivo:
             if allowed_file(archivo.filename, tipo_archivo):
                 filename = secure_filename(archivo.filename)
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 filename = f"{timestamp}_{filename}"
-                archivo_path = os.path.join(UPLOAD_FOLDER, filename)
-                archivo.save(archivo_path)
-                logger.info(f"Archivo guardado: {archivo_path}")
+                subido_path = os.path.join(UPLOAD_FOLDER, filename)
+                archivo.save(subido_path)
+                logger.info(f"Archivo guardado: {subido_path}")
+                
+                # Validar y convertir una sola vez; el envío usa el resultado tal cual
+                try:
+                    adjunto = preparar_adjunto(subido_path, tipo_archivo, nombre_original=archivo.filename)
+                except ErrorMedio as e:
+                    return jsonify({'success': False, 'error': str(e)}), 400
+                finally:
+                    os.remove(subido_path)
+                
+                archivo_path = adjunto['ruta']
             else:
                 return jsonify({
                     'success': False,
@@ -270,6 +337,7 @@ def api_crear():
             'contenido': data.get('content'),
             'plantilla_id': plantilla_id,
             'intervalo': int(data.get('interval', 5)),
+            'mensajes_por_hora': mensajes_por_hora,
             'origen_destinatarios': origen,
             'total_contactos': total_contactos,
             'contactos_objetivo': [c.to_dict() for c in contactos_objetivo],
@@ -279,7 +347,9 @@ def api_crear():
             'creado_en': datetime.now().isoformat(),
             'actualizado_en': datetime.now().isoformat(),
             'archivo_path': archivo_path,
-            'tipo_archivo': tipo_archivo
+            'tipo_archivo': tipo_archivo,
+            'adjunto': adjunto,
+            'reenviar_adjunto': reenviar_adjunto
         }
         
         CAMPANAS_ACTIVAS.append(nueva_campana)
@@ -293,6 +363,11 @@ def api_crear():
         campana_obj.id = nueva_campana['id']
         campana_obj.nombre = nombre_campana
         campana_obj.total_contactos = total_contactos
+        campana_obj.archivo_path = archivo_path
+        campana_obj.tipo_archivo = tipo_archivo
+        campana_obj.adjunto = adjunto
+        campana_obj.reenviar_adjunto = reenviar_adjunto
+        campana_obj.mensajes_por_hora = nueva_campana['mensajes_por_hora']
         campana_obj.save()
         
         logger.info(f"Campaña creada: {nombre_campana} para {total_contactos} contactos")
@@ -352,32 +427,38 @@ def api_obtener(campana_id):
 def api_iniciar_campana(campana_id):
     """MEJORADO: API para iniciar una campaña con verificación robusta"""
     try:
-        from utils.servicio_whatsapp import servicio_whatsapp
+        from utils.pool_sesiones import pool_sesiones
         
-        if not servicio_whatsapp.driver:
+        # Todas las sesiones conectadas (principal y números adicionales) envían
+        sesiones = [s for s in pool_sesiones.sesiones() if s.driver]
+        if not sesiones:
             return jsonify({
                 'success': False,
                 'error': 'WhatsApp no está conectado - No hay navegador activo'
             }), 400
         
-        try:
-            sesion_activa = servicio_whatsapp.verificar_sesion_activa_real()
-            if not sesion_activa:
-                servicio_whatsapp.is_connected = False
-                return jsonify({
-                    'success': False,
-                    'error': 'WhatsApp no está conectado - Sesión cerrada desde el celular'
-                }), 400
-        except Exception as e:
-            logger.error(f"Error verificando sesión: {e}")
+        activas = 0
+        for sesion in sesiones:
+            if planificador_envios.tiene_trabajador(sesion):
+                # Ya está enviando: no se usa su navegador desde este hilo
+                activas += 1
+                continue
+            try:
+                if sesion.verificar_sesion_activa_real():
+                    sesion.is_connected = True
+                    activas += 1
+                else:
+                    sesion.is_connected = False
+            except Exception as e:
+                logger.error(f"Error verificando sesión {sesion.numero_conectado}: {e}")
+                sesion.is_connected = False
+        
+        if not activas:
             return jsonify({
                 'success': False,
-                'error': 'Error verificando conexión de WhatsApp'
+                'error': 'WhatsApp no está conectado - Sesión cerrada desde el celular'
             }), 400
         
-        if not servicio_whatsapp.is_connected:
-            servicio_whatsapp.is_connected = True
-        
         campana = None
         for c in CAMPANAS_ACTIVAS:
             if c['id'] == campana_id:
@@ -397,38 +478,54 @@ def api_iniciar_campana(campana_id):
                 'error': 'No hay contactos en la campaña'
             }), 400
         
-        campana['estado'] = 'enviando'
+        if planificador_envios.esta_programada(campana_id):
+            return jsonify({
+                'success': False,
+                'error': 'La campaña ya se está enviando'
+            }), 409
+        
+        # Opcionales: prioridad frente a otras campañas y hora de inicio programada
+        data = request.get_json(silent=True) or {}
+        try:
+            prioridad = int(data.get('prioridad', 0))
+            inicio = data.get('programado_para')
+            inicio = datetime.fromisoformat(inicio) if inicio else None
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': 'Prioridad u hora de inicio inválida'
+            }), 400
+        
+        programada = inicio is not None and inicio > datetime.now()
+        
+        control = ControlEnvio()
+        CONTROLES_ENVIO[campana_id] = control
+        
+        campana['estado'] = 'programado' if programada else 'enviando'
+        campana['prioridad'] = prioridad
+        campana['programado_para'] = inicio.isoformat() if programada else None
         campana['actualizado_en'] = datetime.now().isoformat()
         
-        campana_obj = Campana.get_by_id(campana_id)
-        if campana_obj:
-            campana_obj.estado = 'enviando'
-            campana_obj.save()
-        
-        archivo_path = campana.get('archivo_path')
-        tipo_archivo = campana.get('tipo_archivo')
-        
-        thread = threading.Thread(
-            target=enviar_campana_background,
-            args=(
-                campana_id, 
-                contactos, 
-                campana['contenido'], 
-                campana['intervalo'],
-                archivo_path,
-                tipo_archivo
-            )
+        # La hora de inicio se guarda para volver a programarla tras un reinicio
+        Campana.actualizar_campos(
+            campana_id,
+            estado=campana['estado'],
+            prioridad=prioridad,
+            programado_para=campana['programado_para']
         )
-        thread.daemon = True
-        thread.start()
+        
+        programar_envio_campana(campana, contactos, control, prioridad=prioridad, inicio=inicio)
         
         logger.info(f"Campaña iniciada: {campana_id} con {len(contactos)} contactos")
-        if archivo_path:
-            logger.info(f"Con archivo: {archivo_path}")
+        if campana.get('archivo_path'):
+            logger.info(f"Con archivo: {campana['archivo_path']}")
         
         return jsonify({
             'success': True,
-            'message': 'Campaña iniciada - enviando mensajes',
+            'message': (
+                f"Campaña programada para {inicio.isoformat()}" if programada
+                else 'Campaña iniciada - enviando mensajes'
+            ),
             'data': campana
         })
         
@@ -436,6 +533,50 @@ def api_iniciar_campana(campana_id):
         logger.error(f"Error iniciando campaña: {e}")
         return manejar_error_global(e, "Error iniciando campaña", 500)
 
+@campanas_bp.route('/api/planificador', methods=['GET'])
+def api_estado_planificador():
+    """API para consultar la cola de campañas del planificador de envíos"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': planificador_envios.estado()
+        })
+    except Exception as e:
+        return manejar_error_global(e, "Error obteniendo estado del planificador", 500)
+
+@campanas_bp.route('/api/tiempos', methods=['GET'])
+def api_tiempos_envio():
+    """API para consultar los percentiles por fase de los últimos envíos (todas las campañas)"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': metricas_envio.resumen()
+        })
+    except Exception as e:
+        return manejar_error_global(e, "Error obteniendo tiempos de envío", 500)
+
+@campanas_bp.route('/api/<campana_id>/tiempos', methods=['GET'])
+def api_tiempos_campana(campana_id):
+    """API para consultar los percentiles por fase de los envíos de una campaña"""
+    try:
+        tiempos = metricas_envio.resumen(campana_id)
+        if not tiempos['mensajes']:
+            # Sin muestras en memoria (p. ej. tras un reinicio): el último resumen guardado
+            campana = Campana.get_by_id(campana_id)
+            if campana is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Campaña no encontrada'
+                }), 404
+            tiempos = campana.tiempos or tiempos
+        
+        return jsonify({
+            'success': True,
+            'data': tiempos
+        })
+    except Exception as e:
+        return manejar_error_global(e, "Error obteniendo tiempos de la campaña", 500)
+
 @campanas_bp.route('/api/<campana_id>/progreso', methods=['GET'])
 def api_obtener_progreso(campana_id):
     """API para obtener progreso de campaña en tiempo real"""
@@ -456,7 +597,9 @@ def api_obtener_progreso(campana_id):
                         'enviados': enviados,
                         'fallidos': fallidos,
                         'progreso': round(progreso, 1),
-                        'exitosos': enviados - fallidos
+                        'exitosos': enviados - fallidos,
+                        'mensajes_por_hora': campana.get('mensajes_por_hora'),
+                        'ritmo_efectivo': campana.get('ritmo_efectivo')
                     }
                 })
         
@@ -468,19 +611,49 @@ def api_obtener_progreso(campana_id):
     except Exception as e:
         return manejar_error_global(e, "Error obteniendo progreso", 500)
 
+@campanas_bp.route('/api/<campana_id>/destinatarios', methods=['GET'])
+def api_destinatarios(campana_id):
+    """API para consultar el estado de envío de cada destinatario (bandeja de salida)"""
+    try:
+        if not BandejaSalida.existe(campana_id):
+            return jsonify({
+                'success': False,
+                'error': 'La campaña no tiene envíos registrados'
+            }), 404
+        
+        # La bandeja en curso del planificador, o una lectura del diario que no lo modifica
+        bandeja = planificador_envios.bandeja(campana_id) or BandejaSalida(campana_id)
+        estado = request.args.get('estado')
+        entradas = bandeja.entradas()
+        if estado:
+            entradas = [e for e in entradas if e['estado'] == estado]
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'resumen': bandeja.resumen(),
+                'destinatarios': entradas
+            }
+        })
+        
+    except Exception as e:
+        return manejar_error_global(e, "Error obteniendo destinatarios", 500)
+
 @campanas_bp.route('/api/<campana_id>/detener', methods=['POST'])
 def api_detener_campana_real(campana_id):
     """API para detener una campaña en ejecución"""
     try:
         for campana in CAMPANAS_ACTIVAS:
             if campana['id'] == campana_id:
+                control = CONTROLES_ENVIO.get(campana_id)
+                if control:
+                    control.detener()
+                    planificador_envios.despertar()
+                
                 campana['estado'] = 'detenido'
                 campana['actualizado_en'] = datetime.now().isoformat()
                 
-                campana_obj = Campana.get_by_id(campana_id)
-                if campana_obj:
-                    campana_obj.estado = 'detenido'
-                    campana_obj.save()
+                Campana.actualizar_campos(campana_id, estado='detenido')
                 
                 logger.info(f"Campaña detenida: {campana_id}")
                 
@@ -498,6 +671,75 @@ def api_detener_campana_real(campana_id):
     except Exception as e:
         return manejar_error_global(e, "Error deteniendo campaña", 500)
 
+@campanas_bp.route('/api/<campana_id>/pausar', methods=['POST'])
+def api_pausar_campana(campana_id):
+    """API para pausar una campaña en envío (se detiene antes del siguiente mensaje)"""
+    try:
+        campana = next((c for c in CAMPANAS_ACTIVAS if c['id'] == campana_id), None)
+        if not campana:
+            return jsonify({
+                'success': False,
+                'error': 'Campaña no encontrada'
+            }), 404
+        
+        control = CONTROLES_ENVIO.get(campana_id)
+        if not control or not planificador_envios.esta_programada(campana_id):
+            return jsonify({
+                'success': False,
+                'error': 'La campaña no se está enviando'
+            }), 400
+        
+        control.pausar()
+        
+        campana['estado'] = 'pausado'
+        campana['actualizado_en'] = datetime.now().isoformat()
+        Campana.actualizar_campos(campana_id, estado='pausado')
+        
+        logger.info(f"Campaña pausada: {campana_id}")
+        
+        return jsonify({
+            'success': True,
+            'message': 'Campaña pausada',
+            'data': campana
+        })
+        
+    except Exception as e:
+        return manejar_error_global(e, "Error pausando campaña", 500)
+
+@campanas_bp.route('/api/<campana_id>/reanudar', methods=['POST'])
+def api_reanudar_campana(campana_id):
+    """API para reanudar una campaña pausada"""
+    try:
+        campana = next((c for c in CAMPANAS_ACTIVAS if c['id'] == campana_id), None)
+        if not campana:
+            return jsonify({
+                'success': False,
+                'error': 'Campaña no encontrada'
+            }), 404
+        
+        control = CONTROLES_ENVIO.get(campana_id)
+        if not control or not planificador_envios.esta_programada(campana_id):
+            # Fuera del planificador (p. ej. tras un reinicio): se inicia desde la bandeja
+            return api_iniciar_campana(campana_id)
+        
+        control.reanudar()
+        planificador_envios.despertar()
+        
+        campana['estado'] = 'enviando'
+        campana['actualizado_en'] = datetime.now().isoformat()
+        Campana.actualizar_campos(campana_id, estado='enviando')
+        
+        logger.info(f"Campaña reanudada: {campana_id}")
+        
+        return jsonify({
+            'success': True,
+            'message': 'Campaña reanudada',
+            'data': campana
+        })
+        
+    except Exception as e:
+        return manejar_error_global(e, "Error reanudando campaña", 500)
+
 @campanas_bp.route('/api/<campana_id>/completar', methods=['POST'])
 def api_completar_campana(campana_id):
     """API para completar una campaña"""
@@ -588,26 +830,33 @@ def api_estado_campana_real():
 def api_eliminar_campana(campana_id):
     """API para eliminar una campaña"""
     try:
+        archivo_path = None
+        
         # Eliminar de CAMPANAS_ACTIVAS
         for i, campana in enumerate(CAMPANAS_ACTIVAS):
             if campana['id'] == campana_id:
-                # Eliminar archivo si existe
-                if campana.get('archivo_path') and os.path.exists(campana['archivo_path']):
-                    try:
-                        os.remove(campana['archivo_path'])
-                        logger.info(f"Archivo eliminado: {campana['archivo_path']}")
-                    except:
-                        pass
-                
+                archivo_path = campana.get('archivo_path')
                 CAMPANAS_ACTIVAS.pop(i)
                 break
         
-        # Eliminar de la base de datos
-        campanas_db = Campana.get_all()
-        campanas_filtradas = [c for c in campanas_db if c.get('id') != campana_id]
+        control = CONTROLES_ENVIO.pop(campana_id, None)
+        if control:
+            control.detener()
+            # Esperar a que termine el mensaje en curso antes de borrar su bandeja
+            planificador_envios.esperar_fin(campana_id, timeout=30)
         
+        BandejaSalida.eliminar(campana_id)
+        metricas_envio.olvidar(campana_id)
+        
+        # Eliminar de la base de datos
         from models.base_datos import db
-        db.save_to_file('campanas', campanas_filtradas)
+        registro = db.obtener_registro(Campana.COLECCION, campana_id)
+        if registro and not archivo_path:
+            archivo_path = registro.get('archivo_path')
+        db.eliminar_registro(Campana.COLECCION, campana_id)
+        
+        # Eliminar archivo si ninguna otra campaña lo usa
+        liberar_adjunto(campana_id, archivo_path)
         
         logger.info(f"Campaña eliminada: {campana_id}")
         
@@ -646,7 +895,7 @@ def api_limpiar_duplicadas():
                 ids_vistos_db.add(campana_data['id'])
         
         from models.base_datos import db
-        db.save_to_file('campanas', campanas_db_limpias)
+        db.guardar_datos(Campana.COLECCION, campanas_db_limpias)
         
         logger.info(f"Campañas limpiadas: {len(CAMPANAS_ACTIVAS)} en memoria, {len(campanas_db_limpias)} en DB")
         
@@ -658,4 +907,61 @@ def api_limpiar_duplicadas():
         })
         
     except Exception as e:
-        return manejar_error_global(e, "Error limpiando campañas", 500)
\ No newline at end of file
+        return manejar_error_global(e, "Error limpiando campañas", 500)
+
+def restaurar_campanas_interrumpidas():
+    """
+    Al arrancar, vuelve a cargar en memoria las campañas que quedaron enviándose
+    y las deja en 'pausado'; al iniciarlas de nuevo solo se envía a los
+    destinatarios pendientes de su bandeja de salida. Las que esperaban su hora
+    de inicio se vuelven a programar para esa hora.
+    """
+    try:
+        for campana_obj in Campana.get_activas():
+            if any(c['id'] == campana_obj.id for c in CAMPANAS_ACTIVAS):
+                continue
+            if not BandejaSalida.existe(campana_obj.id):
+                continue
+            
+            bandeja = BandejaSalida(campana_obj.id)
+            interrumpidos = bandeja.recuperar_interrumpidos()
+            bandeja.cerrar()
+            resumen = bandeja.resumen()
+            
+            campana = campana_obj.to_dict()
+            programada = campana_obj.estado == 'programado' and campana_obj.programado_para
+            campana.update({
+                'estado': 'programado' if programada else 'pausado',
+                'total_contactos': resumen['total'],
+                'contactos_objetivo': [
+                    {'id': e['contacto_id'], 'nombre': e['nombre'], 'telefono': e['telefono']}
+                    for e in bandeja.entradas()
+                ],
+                'enviados': resumen['enviado'],
+                'fallidos': resumen['fallido']
+            })
+            CAMPANAS_ACTIVAS.append(campana)
+            
+            Campana.actualizar_campos(
+                campana_obj.id,
+                estado=campana['estado'],
+                enviados=resumen['enviado'],
+                fallidos=resumen['fallido']
+            )
+            
+            if programada:
+                # Si la hora ya pasó, sale en cuanto haya una sesión conectada
+                control = ControlEnvio()
+                CONTROLES_ENVIO[campana_obj.id] = control
+                programar_envio_campana(
+                    campana, campana['contactos_objetivo'], control,
+                    prioridad=campana_obj.prioridad or 0,
+                    inicio=datetime.fromisoformat(campana_obj.programado_para)
+                )
+            logger.info(
+                f"Campaña interrumpida restaurada: {campana_obj.id} "
+                f"({resumen['pendiente']} pendientes de {resumen['total']}, "
+                f"{interrumpidos} interrumpidos)"
+            )
+    except Exception as e:
+        logger.error(f"Error restaurando campañas interrumpidas: {e}")
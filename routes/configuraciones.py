@@ -23,10 +23,14 @@ def api_estado_whatsapp():
     """
     try:
         from utils.servicio_whatsapp import servicio_whatsapp
+        from utils.planificador_envios import planificador_envios
         
         sesion_real_activa = False
         
-        if servicio_whatsapp.driver:
+        if servicio_whatsapp.driver and planificador_envios.tiene_trabajador(servicio_whatsapp):
+            # El navegador es del trabajador que envía: el estado lo mantiene él
+            sesion_real_activa = servicio_whatsapp.is_connected
+        elif servicio_whatsapp.driver:
             try:
                 sesion_real_activa = servicio_whatsapp.verificar_sesion_activa_real()
                 
@@ -88,6 +92,10 @@ def abrir_whatsapp():
                 navegador_nombre
             )
             
+            # Campañas en espera de una sesión empiezan a enviar
+            from utils.planificador_envios import planificador_envios
+            planificador_envios.actualizar_sesiones()
+            
             return jsonify({
                 'success': True,
                 'message': mensaje,
@@ -138,6 +146,88 @@ def api_desconectar_whatsapp():
             'error': 'Error interno del servidor'
         }), 500
 
+@configuracion_bp.route('/api/whatsapp/sesiones', methods=['GET'])
+def api_listar_sesiones():
+    """Listar las sesiones de WhatsApp usadas para enviar (principal y adicionales)"""
+    try:
+        from utils.pool_sesiones import pool_sesiones
+        
+        return jsonify({
+            'success': True,
+            'data': pool_sesiones.estado()
+        })
+    except Exception as e:
+        logger.error(f"Error listando sesiones: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Error listando sesiones de WhatsApp'
+        }), 500
+
+@configuracion_bp.route('/api/whatsapp/sesiones', methods=['POST'])
+def api_agregar_sesion():
+    """Conectar un número adicional para repartir los envíos"""
+    try:
+        from utils.pool_sesiones import pool_sesiones
+        
+        data = request.get_json() or {}
+        numero = data.get('numero')
+        
+        if not numero:
+            return jsonify({'success': False, 'error': 'Número requerido'}), 400
+        
+        logger.info(f"Agregando sesión de WhatsApp para {numero}")
+        exito, mensaje = pool_sesiones.conectar(numero)
+        
+        if exito:
+            return jsonify({
+                'success': True,
+                'message': mensaje,
+                'data': pool_sesiones.estado()
+            })
+        return jsonify({'success': False, 'error': mensaje}), 500
+    
+    except Exception as e:
+        logger.error(f"Error agregando sesión: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@configuracion_bp.route('/api/whatsapp/sesiones/<numero>', methods=['DELETE'])
+def api_quitar_sesion(numero):
+    """Desconectar un número adicional"""
+    try:
+        from utils.pool_sesiones import pool_sesiones
+        
+        if not pool_sesiones.desconectar(numero):
+            return jsonify({
+                'success': False,
+                'error': 'Sesión no encontrada'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'message': f'Sesión {numero} desconectada',
+            'data': pool_sesiones.estado()
+        })
+    except Exception as e:
+        logger.error(f"Error quitando sesión: {e}")
+        return jsonify({'success': False, 'error': 'Error desconectando la sesión'}), 500
+
+@configuracion_bp.route('/api/whatsapp/selectores', methods=['GET'])
+def api_estadisticas_selectores():
+    """Variante de selector preferida por elemento y sus aciertos/fallos"""
+    try:
+        from utils.selectores import registro_selectores
+        
+        return jsonify({
+            'success': True,
+            'data': registro_selectores.estadisticas()
+        })
+    except Exception as e:
+        logger.error(f"Error obteniendo estadísticas de selectores: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Error obteniendo estadísticas de selectores'
+        }), 500
+
 @configuracion_bp.route('/api/configuracion/aplicacion', methods=['GET'])
 def api_obtener_configuracion_aplicacion():
     """Obtener configuración de aplicación"""
@@ -1,6 +1,7 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, url_for
 from models.contacto import Contacto, ListaContactos
 import logging
+import os
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -451,45 +452,129 @@ def importar_contactos():
                 400
             )
         
-        # Procesar archivo
-        from utils.manejador_excel import procesar_archivo_contactos
-        resultado = procesar_archivo_contactos(archivo)
+        # Procesar archivo en segundo plano; el progreso se consulta con el id del trabajo
+        from utils.importaciones import gestor_importaciones
+        trabajo = gestor_importaciones.iniciar(archivo)
         
-        # Preparar mensaje de respuesta
-        mensaje_base = f'Importación completada: {resultado["procesados"]} de {resultado["total_filas"]} filas procesadas'
+        return jsonify({
+            'success': True,
+            'message': 'Importación iniciada',
+            'data': trabajo.to_dict()
+        }), 202
+        
+    except ValueError as ve:
+        return manejar_error(ve, str(ve), 400)
+    except Exception as e:
+        logger.error(f"Error importando contactos: {e}")
+        return manejar_error(e, "Error importando contactos", 500)
+
+@contactos_bp.route('/api/importar/<job_id>', methods=['GET'])
+def obtener_importacion(job_id):
+    """API para consultar el progreso y resultado de una importación"""
+    try:
+        from utils.importaciones import gestor_importaciones
+        trabajo = gestor_importaciones.obtener(job_id)
         
-        alertas = []
-        if resultado["duplicados"] > 0:
-            alertas.append(f'{resultado["duplicados"]} teléfonos duplicados rechazados')
-        if resultado["nombres_repetidos"] > 0:
-            alertas.append(f'{resultado["nombres_repetidos"]} nombres duplicados rechazados')
-        if resultado["telefonos_invalidos"] > 0:
-            alertas.append(f'{resultado["telefonos_invalidos"]} teléfonos inválidos rechazados')
-        if resultado["errores"] > 0:
-            alertas.append(f'{resultado["errores"]} errores adicionales')
+        if not trabajo:
+            return jsonify({
+                'success': False,
+                'message': 'Importación no encontrada'
+            }), 404
+        
+        data = trabajo.to_dict()
         
-        if alertas:
-            mensaje_base += f'. ALERTAS: {", ".join(alertas)}'
+        if trabajo.estado == 'error':
+            data['message'] = f'Error procesando archivo: {trabajo.error}'
+        elif trabajo.resultado is not None:
+            mensaje, resultado = resumen_importacion(trabajo.resultado)
+            data['message'] = mensaje
+            data.update(resultado)
+            data['url_rechazados'] = url_for('contactos.descargar_rechazados', job_id=job_id)
         
         return jsonify({
             'success': True,
-            'message': mensaje_base,
-            'data': {
-                'estadisticas': {
-                    'total_filas': resultado.get('total_filas', 0),
-                    'procesados': resultado.get('procesados', 0),
-                    'errores': resultado.get('errores', 0),
-                    'duplicados': resultado.get('duplicados', 0),
-                    'nombres_repetidos': resultado.get('nombres_repetidos', 0),
-                    'telefonos_invalidos': resultado.get('telefonos_invalidos', 0),
-                    'detalles_errores': resultado.get('detalles_errores', [])
-                },
-                'contactos': resultado.get('contactos', [])
-            }
+            'data': data
         })
         
-    except ValueError as ve:
-        return manejar_error(ve, str(ve), 400)
     except Exception as e:
-        logger.error(f"Error importando contactos: {e}")
-        return manejar_error(e, "Error importando contactos", 500)
\ No newline at end of file
+        return manejar_error(e, "Error obteniendo importación", 500)
+
+@contactos_bp.route('/api/importar/<job_id>/cancelar', methods=['POST'])
+def cancelar_importacion(job_id):
+    """API para cancelar una importación en curso"""
+    try:
+        from utils.importaciones import gestor_importaciones
+        trabajo = gestor_importaciones.cancelar(job_id)
+        
+        if not trabajo:
+            return jsonify({
+                'success': False,
+                'message': 'Importación no encontrada'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'message': 'Cancelación solicitada' if not trabajo.terminado else 'La importación ya había terminado',
+            'data': trabajo.to_dict()
+        })
+        
+    except Exception as e:
+        return manejar_error(e, "Error cancelando importación", 500)
+
+@contactos_bp.route('/api/importar/<job_id>/rechazados', methods=['GET'])
+def descargar_rechazados(job_id):
+    """Descarga un CSV con las filas rechazadas de una importación"""
+    try:
+        from flask import Response
+        from utils.importaciones import gestor_importaciones
+        trabajo = gestor_importaciones.obtener(job_id)
+        
+        if not trabajo or trabajo.diagnostico is None:
+            return jsonify({
+                'success': False,
+                'message': 'Importación no encontrada'
+            }), 404
+        
+        nombre = f"rechazados_{os.path.splitext(trabajo.nombre_archivo)[0]}.csv"
+        
+        # BOM para que Excel reconozca UTF-8
+        return Response(
+            '\ufeff' + trabajo.diagnostico.a_csv(),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename="{nombre}"'}
+        )
+        
+    except Exception as e:
+        return manejar_error(e, "Error generando reporte de rechazados", 500)
+
+def resumen_importacion(resultado):
+    """Construye el mensaje y los datos de respuesta de una importación terminada"""
+    estado = 'cancelada' if resultado.get('cancelado') else 'completada'
+    mensaje_base = f'Importación {estado}: {resultado["procesados"]} de {resultado["total_filas"]} filas procesadas'
+    
+    alertas = []
+    if resultado["duplicados"] > 0:
+        alertas.append(f'{resultado["duplicados"]} teléfonos duplicados rechazados')
+    if resultado["nombres_repetidos"] > 0:
+        alertas.append(f'{resultado["nombres_repetidos"]} nombres duplicados rechazados')
+    if resultado["telefonos_invalidos"] > 0:
+        alertas.append(f'{resultado["telefonos_invalidos"]} teléfonos inválidos rechazados')
+    if resultado["errores"] > 0:
+        alertas.append(f'{resultado["errores"]} errores adicionales')
+    
+    if alertas:
+        mensaje_base += f'. ALERTAS: {", ".join(alertas)}'
+    
+    return mensaje_base, {
+        'estadisticas': {
+            'total_filas': resultado.get('total_filas', 0),
+            'procesados': resultado.get('procesados', 0),
+            'errores': resultado.get('errores', 0),
+            'duplicados': resultado.get('duplicados', 0),
+            'nombres_repetidos': resultado.get('nombres_repetidos', 0),
+            'telefonos_invalidos': resultado.get('telefonos_invalidos', 0),
+            'detalles_errores': resultado.get('detalles_errores', [])
+        },
+        'muestra_contactos': resultado.get('muestra_contactos', []),
+        'diagnostico': resultado.get('diagnostico')
+    }
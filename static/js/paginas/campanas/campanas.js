@@ -282,6 +282,7 @@ window.iniciarCampana = async function() {
             formData.append('content', dataCampana.content);
             formData.append('nombre', dataCampana.nombre);
             formData.append('interval', dataCampana.interval);
+            formData.append('reenviar_adjunto', document.getElementById('reenviar-adjunto-check')?.checked || false);
             formData.append('recipients_origin', dataCampana.recipients_origin);
             console.log('📎 Archivo adjunto:', archivoData.file.name, 'Tipo:', archivoData.tipo);
         }
@@ -2,6 +2,7 @@ console.log('📤 Cargando subir_archivo.js...');
 
 window.SubirArchivo = {
     inicializado: false,
+    importacionActual: null,
     
     init() {
         if (this.inicializado) return;
@@ -60,6 +61,14 @@ window.SubirArchivo = {
             };
         }
         
+        // 6. Botón cancelar importación en curso
+        const btnCancelImport = document.getElementById('btnCancelImport');
+        if (btnCancelImport) {
+            btnCancelImport.onclick = () => {
+                this.cancelarImportacion();
+            };
+        }
+        
         // 6. Drag & Drop
         const uploadContainer = document.getElementById('uploadContainer');
         if (uploadContainer) {
@@ -300,12 +309,26 @@ window.SubirArchivo = {
                 body: formData
             });
             
-            const result = await response.json();
+            const inicio = await response.json();
+            
+            if (!inicio.success) {
+                throw new Error(inicio.message || 'Error procesando archivo');
+            }
+            
+            // La importación corre en segundo plano: consultar progreso hasta que termine
+            this.importacionActual = inicio.data.id;
+            const result = await this.esperarImportacion(inicio.data.id);
+            
+            if (result.estado === 'error') {
+                throw new Error(result.message || 'Error procesando archivo');
+            }
             
-            if (result.success) {
-                const stats = result.data.estadisticas;
+            if (result.estadisticas) {
+                const stats = result.estadisticas;
                 
-                let mensaje = `✅ Importación completada:\n`;
+                let mensaje = result.estado === 'cancelado'
+                    ? `⏹️ Importación cancelada:\n`
+                    : `✅ Importación completada:\n`;
                 mensaje += `• ${stats.procesados} contactos importados correctamente\n`;
                 
                 if (stats.errores > 0 || stats.duplicados > 0 || stats.telefonos_invalidos > 0 || stats.nombres_repetidos > 0) {
@@ -330,7 +353,12 @@ window.SubirArchivo = {
                 
                 // Mostrar errores detallados con contador de exitosos
                 if (stats.detalles_errores && stats.detalles_errores.length > 0) {
-                    this.mostrarDetallesErrores(stats.detalles_errores, stats.procesados);
+                    this.mostrarDetallesErrores(
+                        stats.detalles_errores,
+                        stats.procesados,
+                        result.diagnostico ? result.diagnostico.total_rechazados : null,
+                        result.url_rechazados || `/contactos/api/importar/${result.id}/rechazados`
+                    );
                 }
                 
                 // Recargar contactos
@@ -341,8 +369,8 @@ window.SubirArchivo = {
                 // Limpiar
                 this.quitarArchivo();
                 
-            } else {
-                throw new Error(result.message || 'Error procesando archivo');
+            } else if (typeof mostrarNotificacion === 'function') {
+                mostrarNotificacion('Importación cancelada', 'warning');
             }
             
         } catch (error) {
@@ -352,6 +380,8 @@ window.SubirArchivo = {
             }
             
         } finally {
+            this.importacionActual = null;
+            
             if (btnProcessFile) {
                 btnProcessFile.disabled = false;
                 btnProcessFile.innerHTML = '<i class="fas fa-cogs"></i> Procesar Archivo';
@@ -363,7 +393,56 @@ window.SubirArchivo = {
         }
     },
     
-    mostrarDetallesErrores(errores, exitosos = 0) {
+    async esperarImportacion(jobId) {
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            
+            const response = await fetch(`/contactos/api/importar/${jobId}`);
+            const result = await response.json();
+            
+            if (!result.success) {
+                throw new Error(result.message || 'Importación no encontrada');
+            }
+            
+            this.actualizarProgresoImportacion(result.data);
+            
+            if (['completado', 'cancelado', 'error'].includes(result.data.estado)) {
+                return result.data;
+            }
+        }
+    },
+    
+    actualizarProgresoImportacion(trabajo) {
+        const progressPercent = document.getElementById('progressPercent');
+        const progressFill = document.getElementById('progressFill');
+        const progressDetails = document.getElementById('progressDetails');
+        const progreso = trabajo.progreso;
+        const rechazados = Object.values(progreso.rechazados).reduce((a, b) => a + b, 0);
+        
+        if (trabajo.porcentaje !== null) {
+            if (progressPercent) progressPercent.textContent = `${Math.round(trabajo.porcentaje)}%`;
+            if (progressFill) progressFill.style.width = `${trabajo.porcentaje}%`;
+        }
+        
+        if (progressDetails) {
+            progressDetails.textContent =
+                `${progreso.filas_procesadas} filas leídas • ${progreso.aceptados} importadas • ${rechazados} rechazadas`;
+        }
+    },
+    
+    async cancelarImportacion() {
+        if (!this.importacionActual) return;
+        
+        try {
+            await fetch(`/contactos/api/importar/${this.importacionActual}/cancelar`, {
+                method: 'POST'
+            });
+        } catch (error) {
+            console.error('❌ Error cancelando importación:', error);
+        }
+    },
+    
+    mostrarDetallesErrores(errores, exitosos = 0, totalRechazados = null, urlRechazados = null) {
         console.log('📋 Detalles de errores:', errores);
         
         // Agrupar errores por tipo
@@ -493,7 +572,7 @@ window.SubirArchivo = {
                 <i class="fas fa-exclamation-triangle"></i> Resumen de importación
             </h3>
             <div style="font-size: 14px; color: #666; margin-bottom: 16px;">
-                Total de errores detectados: <strong>${errores.length}</strong>
+                Total de errores detectados: <strong>${totalRechazados ?? errores.length}</strong>
             </div>
             <div style="background: #fef2f2; border-left: 3px solid #dc2626; padding: 16px; border-radius: 4px; max-height: 400px; overflow-y: auto;">
                 ${contenidoErrores}
@@ -502,6 +581,10 @@ window.SubirArchivo = {
                 💡 <strong>Recuerda:</strong> Los teléfonos deben tener el formato <code style="background: #e5e7eb; padding: 2px 6px; border-radius: 3px;">+593XXXXXXXXX</code> 
                 donde los 9 dígitos siguientes deben empezar con 9.
             </div>
+            ${urlRechazados ? `
+            <a href="${urlRechazados}" download style="display: block; margin-top: 16px; text-align: center; color: #dc2626; font-size: 14px;">
+                <i class="fas fa-download"></i> Descargar filas rechazadas (CSV)
+            </a>` : ''}
             <button id="cerrarErrores" style="
                 margin-top: 20px;
                 width: 100%;
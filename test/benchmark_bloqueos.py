@@ -0,0 +1,102 @@
+"""
+Benchmark: bloqueo lectores-escritor por colección
+
+1. Lectores concurrentes: N hilos mantienen el bloqueo de lectura a la vez
+   (no se serializan) frente a un bloqueo exclusivo.
+2. Escrituras concurrentes: un hilo "enviador" actualiza el progreso de una
+   campaña mientras otros hilos cambian su estado; no se pierde ninguna escritura.
+
+Uso (desde la raíz del proyecto):
+    python test/benchmark_bloqueos.py [hilos]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.base_datos import AlmacenamientoJSON
+from utils.bloqueos import BloqueoLecturaEscritura
+
+# Tiempo que cada lector mantiene el bloqueo (simula leer un archivo grande)
+ESPERA_LECTOR = 0.05
+
+
+def medir_hilos(cantidad, funcion):
+    """Ejecuta funcion en cantidad hilos a la vez y devuelve los segundos totales"""
+    hilos = [threading.Thread(target=funcion) for _ in range(cantidad)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return time.perf_counter() - inicio
+
+
+def lectores_concurrentes(cantidad, directorio):
+    bloqueo = BloqueoLecturaEscritura(os.path.join(directorio, 'bench.lock'))
+    exclusivo = threading.Lock()
+
+    def leer_compartido():
+        with bloqueo.lectura():
+            time.sleep(ESPERA_LECTOR)
+
+    def leer_exclusivo():
+        with exclusivo:
+            time.sleep(ESPERA_LECTOR)
+
+    tiempo_compartido = medir_hilos(cantidad, leer_compartido)
+    tiempo_exclusivo = medir_hilos(cantidad, leer_exclusivo)
+
+    print(f"Lectores:            {cantidad} x {ESPERA_LECTOR * 1000:.0f} ms")
+    print(f"Bloqueo compartido:  {tiempo_compartido:.3f}s")
+    print(f"Bloqueo exclusivo:   {tiempo_exclusivo:.3f}s")
+    print(f"Serializado sería:   {cantidad * ESPERA_LECTOR:.3f}s")
+
+
+def escrituras_concurrentes(cantidad, directorio):
+    almacenamiento = AlmacenamientoJSON(data_dir=directorio)
+    almacenamiento.guardar_datos('campanas', [
+        {'id': 'c1', 'estado': 'enviando', 'enviados': 0, 'notas': []}
+    ])
+
+    def enviador():
+        # Progreso por mensaje, como el planificador de envíos
+        for i in range(1, 51):
+            almacenamiento.actualizar_registro('campanas', 'c1', {'enviados': i})
+
+    def editor(numero):
+        def editar():
+            for i in range(10):
+                with almacenamiento.bloqueos.escritura('campanas'):
+                    registro = almacenamiento.obtener_registro('campanas', 'c1')
+                    registro['notas'].append(f'{numero}-{i}')
+                    almacenamiento.guardar_registro('campanas', registro)
+        return editar
+
+    hilos = [threading.Thread(target=enviador)]
+    hilos += [threading.Thread(target=editor(n)) for n in range(cantidad)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    tiempo = time.perf_counter() - inicio
+
+    registro = almacenamiento.obtener_registro('campanas', 'c1')
+    print(f"Escrituras:          {50 + cantidad * 10} en {tiempo:.3f}s")
+    print(f"Enviados finales:    {registro['enviados']} (esperado 50)")
+    print(f"Notas guardadas:     {len(registro['notas'])} (esperado {cantidad * 10})")
+
+
+def main(cantidad=16):
+    with tempfile.TemporaryDirectory() as directorio:
+        lectores_concurrentes(cantidad, directorio)
+        print()
+        escrituras_concurrentes(cantidad, directorio)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 16)
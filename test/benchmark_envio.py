@@ -0,0 +1,174 @@
+"""
+Benchmark: envío masivo contra una copia local de WhatsApp Web
+
+Levanta test/whatsapp_falso/index.html en un servidor local con las latencias
+y fallos indicados, abre Chrome sin ventana y ejecuta
+ServicioWhatsApp.enviar_mensajes_masivos contra esa página. Reporta mensajes por
+minuto, los percentiles por fase (utils/metricas_envio.py) y compara lo que
+el enviador cree haber enviado con lo que la página recibió. Con --archivo, por
+defecto el adjunto se sube para cada destinatario; --adjuntos reenviar lo sube
+una vez y lo reenvía a los demás (como una campaña con reenviar_adjunto).
+
+Uso (desde la raíz del proyecto, con Chrome y chromedriver disponibles):
+    python test/benchmark_envio.py [mensajes] [--archivo ruta] [--adjuntos subir|reenviar]
+        [--navegacion pagina|url] [--chat-ms 150] [--vista-previa-ms 300] [--confirmacion-ms 200]
+        [--fallo-chat 0.0] [--invalido 0.0] [--fallo-envio 0.0] [--ver]
+"""
+import argparse
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import sys
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGINA_FALSA = os.path.join(RAIZ, 'test', 'whatsapp_falso', 'index.html')
+
+sys.path.insert(0, RAIZ)
+
+
+class ServidorWhatsAppFalso:
+    """Sirve la página falsa en cualquier ruta (/, /send?phone=...) con la configuración inyectada"""
+
+    def __init__(self, config=None, puerto=0):
+        with open(PAGINA_FALSA, 'r', encoding='utf-8') as f:
+            pagina = f.read().replace(
+                '/*CONFIG*/', f'window.CONFIG_FALSO = {json.dumps(config or {})};'
+            ).encode('utf-8')
+
+        class Manejador(SimpleHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(pagina)))
+                self.end_headers()
+                self.wfile.write(pagina)
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', puerto), Manejador)
+        self.url = f'http://127.0.0.1:{self.servidor.server_address[1]}'
+        self._hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *args):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+def crear_driver(visible=False):
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    if not visible:
+        options.add_argument('--headless=new')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--window-size=1200,900')
+    return webdriver.Chrome(options=options)
+
+
+def imprimir_fases(resumen):
+    print(f"\n{'fase':<14}{'n':>6}{'media':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for fase, d in resumen['fases'].items():
+        print(f"{fase:<14}{d['n']:>6}{d['media']:>9.3f}{d['p50']:>9.3f}{d['p95']:>9.3f}{d['p99']:>9.3f}{d['max']:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('mensajes', nargs='?', type=int, default=50)
+    parser.add_argument('--texto', default='Hola, este es un mensaje de prueba.\nSegunda línea 😀')
+    parser.add_argument('--archivo', help='Adjunto a enviar con cada mensaje')
+    parser.add_argument('--tipo-archivo', choices=['imagen', 'video', 'documento'])
+    parser.add_argument('--adjuntos', choices=['subir', 'reenviar'], default='subir')
+    parser.add_argument('--navegacion', choices=['pagina', 'url'], default='pagina')
+    parser.add_argument('--carga-ms', type=int, default=500)
+    parser.add_argument('--chat-ms', type=int, default=150)
+    parser.add_argument('--vista-previa-ms', type=int, default=300)
+    parser.add_argument('--confirmacion-ms', type=int, default=200)
+    parser.add_argument('--fallo-chat', type=float, default=0.0)
+    parser.add_argument('--invalido', type=float, default=0.0)
+    parser.add_argument('--fallo-envio', type=float, default=0.0)
+    parser.add_argument('--espera-maxima', type=float, default=5,
+                        help='Tope de cada espera del enviador (segundos); acorta los fallos simulados')
+    parser.add_argument('--ver', action='store_true', help='Mostrar la ventana del navegador')
+    args = parser.parse_args()
+
+    config = {
+        'carga_ms': args.carga_ms,
+        'chat_ms': args.chat_ms,
+        'vista_previa_ms': args.vista_previa_ms,
+        'confirmacion_ms': args.confirmacion_ms,
+        'fallo_chat': args.fallo_chat,
+        'invalido': args.invalido,
+        'fallo_envio': args.fallo_envio,
+    }
+
+    with ServidorWhatsAppFalso(config) as servidor:
+        # El servicio lee la dirección al importarse
+        os.environ['URL_WHATSAPP_WEB'] = servidor.url
+        from utils.servicio_whatsapp import ServicioWhatsApp
+        from utils.metricas_envio import metricas_envio
+
+        driver = crear_driver(args.ver)
+        try:
+            servicio = ServicioWhatsApp()
+            servicio.driver = driver
+            servicio.is_connected = True
+            servicio.numero_conectado = 'benchmark'
+            servicio.navegacion_en_pagina = args.navegacion == 'pagina'
+            servicio.esperas = {paso: min(espera, args.espera_maxima) for paso, espera in servicio.esperas.items()}
+
+            driver.get(servidor.url)
+            servicio._esperar(lambda d: servicio._app_cargada(), 'chat')
+
+            contactos = [
+                {'id': str(n), 'nombre': f'Contacto {n}', 'telefono': f'59399{n:07d}'}
+                for n in range(1, args.mensajes + 1)
+            ]
+            print(f"Enviando {args.mensajes} mensajes a {servidor.url} (navegación: {args.navegacion})...")
+
+            inicio = time.perf_counter()
+            resultados = servicio.enviar_mensajes_masivos(
+                contactos, args.texto, intervalo=0,
+                archivo_path=args.archivo, tipo_archivo=args.tipo_archivo,
+                reenviar_adjunto=args.adjuntos == 'reenviar'
+            )
+            segundos = time.perf_counter() - inicio
+
+            recibido = driver.execute_script('return window.__falso')
+        finally:
+            driver.quit()
+
+    por_minuto = args.mensajes / segundos * 60 if segundos else 0
+    # Con reenvío cada destinatario recibe texto y archivo por separado: se cuenta cada tipo
+    recibidos = {}
+    for mensaje in recibido['mensajes']:
+        tipos = recibidos.setdefault(mensaje['telefono'], {})
+        tipos[mensaje['tipo']] = tipos.get(mensaje['tipo'], 0) + 1
+    duplicados = sum(1 for tipos in recibidos.values() if max(tipos.values()) > 1)
+
+    print(f"\n{args.mensajes} mensajes en {segundos:.1f}s → {por_minuto:.1f} mensajes/minuto")
+    print(f"Enviador: {resultados['enviados']} enviados, {resultados['fallidos']} fallidos")
+    print(
+        f"Página: {len(recibidos)} chats con mensaje ({recibido['textos']} textos, "
+        f"{recibido['archivos']} archivos, {recibido['reenvios']} reenviados), "
+        f"{recibido['cargas']} cargas, {recibido['invalidos']} inválidos, "
+        f"{recibido['fallos_chat']} chats sin abrir, {recibido['fallos_envio']} envíos perdidos"
+    )
+    if duplicados:
+        print(f"ATENCIÓN: {duplicados} chats recibieron más de un mensaje")
+    if resultados['enviados'] > len(recibidos):
+        print(f"ATENCIÓN: {resultados['enviados'] - len(recibidos)} envíos dados por buenos sin mensaje en la página")
+
+    imprimir_fases(metricas_envio.resumen())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark: tamaño y latencia de contactos.json en formato legible vs. compacto
+
+- legible:  formato anterior (indent=2, con iniciales/tasa_entrega/tasa_lectura)
+- compacto: sin sangría y sin campos derivados (orjson si está instalado)
+
+Uso (desde la raíz del proyecto):
+    python test/benchmark_formato_json.py [cantidad]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.base_datos import AlmacenamientoJSON
+from models.contacto import Contacto
+from utils import escritura_atomica
+
+
+def generar_contactos(cantidad):
+    """Contactos válidos con teléfonos únicos"""
+    return [
+        Contacto(f'Contacto Prueba {i}', f'+5939{i:08d}', email=f'contacto{i}@ejemplo.com')
+        for i in range(cantidad)
+    ]
+
+
+def medir(funcion, repeticiones=3):
+    """Mejor tiempo de varias ejecuciones"""
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        transcurrido = time.perf_counter() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor
+
+
+def probar_formato(nombre, directorio, registros, compacto):
+    almacenamiento = AlmacenamientoJSON(data_dir=directorio, compacto=compacto)
+    escritura = medir(lambda: almacenamiento.guardar_datos('contactos', registros))
+    lectura = medir(lambda: almacenamiento.cargar_datos('contactos'))
+    tamano = os.path.getsize(almacenamiento.ruta_archivo('contactos'))
+    print(f"{nombre:<22} {tamano / 1024 / 1024:>8.1f} MB {escritura:>9.3f}s {lectura:>9.3f}s")
+    return almacenamiento
+
+
+def main(cantidad=100000):
+    print(f"Generando {cantidad} contactos de prueba...")
+    contactos = generar_contactos(cantidad)
+    legibles = [c.to_dict() for c in contactos]
+    compactos = [c.to_registro() for c in contactos]
+
+    print(f"orjson disponible: {'sí' if escritura_atomica.orjson else 'no'}")
+    print(f"{'Formato':<22} {'Tamaño':>11} {'Escritura':>10} {'Lectura':>10}")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        # Formato anterior: siempre con la biblioteca estándar
+        orjson = escritura_atomica.orjson
+        escritura_atomica.orjson = None
+        probar_formato('legible (json)', os.path.join(directorio, 'legible'), legibles, False)
+        probar_formato('compacto (json)', os.path.join(directorio, 'compacto_json'), compactos, True)
+        escritura_atomica.orjson = orjson
+
+        if orjson:
+            probar_formato('compacto (orjson)', os.path.join(directorio, 'compacto'), compactos, True)
+
+            # Lectura transparente del formato anterior con el motor compacto
+            legado = AlmacenamientoJSON(data_dir=os.path.join(directorio, 'legible'), compacto=True)
+            print(f"Lectura formato anterior: {len(legado.cargar_datos('contactos'))} registros")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
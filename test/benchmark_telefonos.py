@@ -0,0 +1,52 @@
+"""
+Benchmark: normalización de teléfonos fila por fila vs. vectorizada
+
+Uso (desde la raíz del proyecto):
+    python test/benchmark_telefonos.py [cantidad]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+from data_generator import generar_contactos_formatos_mixtos
+from utils.manejador_excel import limpiar_telefono, normalizar_telefonos
+
+
+def medir(funcion):
+    """Ejecutar la función y devolver (resultado, segundos)"""
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return resultado, time.perf_counter() - inicio
+
+
+def main(cantidad=100000):
+    print(f"Generando {cantidad} contactos de prueba...")
+    df = pd.DataFrame(generar_contactos_formatos_mixtos(cantidad))
+    serie = df['telefono']
+
+    def por_fila():
+        return [limpiar_telefono(t if pd.notna(t) else '') for t in serie]
+
+    def vectorizado():
+        return normalizar_telefonos(serie)
+
+    resultado_fila, tiempo_fila = medir(por_fila)
+    (telefonos, motivos, validos), tiempo_vector = medir(vectorizado)
+
+    diferencias = sum(1 for a, b in zip(resultado_fila, telefonos) if a != b)
+
+    print(f"Filas:             {cantidad}")
+    print(f"Válidos:           {int(validos.sum())}")
+    print(f"Motivos:           {motivos[motivos != ''].value_counts().to_dict()}")
+    print(f"Por fila:          {tiempo_fila:.3f}s")
+    print(f"Vectorizado:       {tiempo_vector:.3f}s")
+    print(f"Aceleración:       {tiempo_fila / max(tiempo_vector, 1e-9):.1f}x")
+    print(f"Diferencias:       {diferencias}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -18,6 +18,34 @@ def generar_contactos_prueba(cantidad=20):
     
     return contactos
 
+def generar_contactos_formatos_mixtos(cantidad=100000, proporcion_invalidos=0.1):
+    """Generar contactos con teléfonos en los formatos que llegan en hojas de cálculo reales"""
+    contactos = generar_contactos_prueba(cantidad)
+    
+    formatos = [
+        lambda n: f"+593{n}",             # +5939XXXXXXXX
+        lambda n: f"593{n}",              # 5939XXXXXXXX
+        lambda n: f"0{n}",                # 09XXXXXXXX
+        lambda n: n,                      # 9XXXXXXXX
+        lambda n: f"{float(n):.8E}",      # 9.87654321E+08 (Excel)
+        lambda n: f"+593 {n[:2]} {n[2:5]} {n[5:]}"
+    ]
+    invalidos = [
+        lambda n: f"+5938{n[1:]}",        # +5938XXXXXXXX
+        lambda n: f"+593{n[:5]}",         # muy corto
+        lambda n: f"{n[:5]}abcd",         # letras en lugar de dígitos
+        lambda n: ""                      # vacío
+    ]
+    
+    for contacto in contactos:
+        numero = contacto['telefono'][4:]
+        if random.random() < proporcion_invalidos:
+            contacto['telefono'] = random.choice(invalidos)(numero)
+        else:
+            contacto['telefono'] = random.choice(formatos)(numero)
+    
+    return contactos
+
 def generar_casos_prueba_validacion():
     """Generar casos de prueba para validación"""
     casos_validos = [
@@ -0,0 +1,161 @@
+"""
+Bloqueos de lectura/escritura por colección
+
+Cada colección tiene un bloqueo lectores-escritor dentro del proceso y un
+bloqueo de archivo del sistema operativo (data/.locks/<coleccion>.lock) para
+coordinar varios procesos que usan el mismo directorio de datos.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+class _BloqueoArchivo:
+    """Bloqueo del sistema operativo sobre un archivo .lock (compartido o exclusivo)"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+
+    def adquirir(self, exclusivo):
+        """Abre el archivo y lo bloquea; retorna el descriptor para liberar"""
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        fd = os.open(self.ruta, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.name == 'nt':
+                # msvcrt solo ofrece bloqueo exclusivo: en Windows los lectores no lo
+                # toman y se apoyan en que las escrituras reemplazan el archivo atómicamente
+                while exclusivo:
+                    try:
+                        # LK_LOCK se rinde tras ~10 s de reintentos; se sigue esperando
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    def liberar(self, fd, exclusivo):
+        try:
+            if os.name == 'nt':
+                if exclusivo:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+class BloqueoLecturaEscritura:
+    """
+    Varios lectores a la vez o un único escritor (con preferencia de escritores).
+    El escritor puede volver a entrar y leer mientras mantiene el bloqueo; un
+    lector no puede pasar a escritor sin soltar antes la lectura.
+    """
+
+    def __init__(self, ruta_bloqueo=None):
+        self._condicion = threading.Condition(threading.Lock())
+        self._lectores = 0
+        self._escritor = None
+        self._profundidad = 0
+        self._escritores_esperando = 0
+        self._archivo = _BloqueoArchivo(ruta_bloqueo) if ruta_bloqueo else None
+
+    def _es_escritor(self):
+        return self._escritor == threading.get_ident()
+
+    @contextmanager
+    def lectura(self):
+        """Bloqueo compartido: no espera a otros lectores"""
+        if self._es_escritor():
+            yield
+            return
+
+        with self._condicion:
+            while self._escritor is not None or self._escritores_esperando:
+                self._condicion.wait()
+            self._lectores += 1
+
+        fd = None
+        try:
+            if self._archivo:
+                fd = self._archivo.adquirir(exclusivo=False)
+            yield
+        finally:
+            if fd is not None:
+                self._archivo.liberar(fd, exclusivo=False)
+            with self._condicion:
+                self._lectores -= 1
+                if not self._lectores:
+                    self._condicion.notify_all()
+
+    @contextmanager
+    def escritura(self):
+        """Bloqueo exclusivo frente a lectores y otros escritores"""
+        if self._es_escritor():
+            self._profundidad += 1
+            try:
+                yield
+            finally:
+                self._profundidad -= 1
+            return
+
+        with self._condicion:
+            self._escritores_esperando += 1
+            try:
+                while self._escritor is not None or self._lectores:
+                    self._condicion.wait()
+            finally:
+                self._escritores_esperando -= 1
+            self._escritor = threading.get_ident()
+            self._profundidad = 1
+
+        fd = None
+        try:
+            if self._archivo:
+                fd = self._archivo.adquirir(exclusivo=True)
+            yield
+        finally:
+            if fd is not None:
+                self._archivo.liberar(fd, exclusivo=True)
+            with self._condicion:
+                self._escritor = None
+                self._profundidad = 0
+                self._condicion.notify_all()
+
+
+class BloqueosColecciones:
+    """Registro de bloqueos lectores-escritor, uno por colección"""
+
+    def __init__(self, directorio_bloqueos=None):
+        self.directorio_bloqueos = directorio_bloqueos
+        self._bloqueos = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, coleccion):
+        with self._lock:
+            bloqueo = self._bloqueos.get(coleccion)
+            if bloqueo is None:
+                ruta = None
+                if self.directorio_bloqueos:
+                    ruta = os.path.join(self.directorio_bloqueos, f'{coleccion}.lock')
+                bloqueo = BloqueoLecturaEscritura(ruta)
+                self._bloqueos[coleccion] = bloqueo
+            return bloqueo
+
+    def lectura(self, coleccion):
+        return self.obtener(coleccion).lectura()
+
+    def escritura(self, coleccion):
+        return self.obtener(coleccion).escritura()
@@ -0,0 +1,49 @@
+"""
+Control cooperativo de un envío masivo (detener / pausar / reanudar)
+
+El hilo enviador consulta el control entre destinatarios y durante la espera
+del intervalo; las rutas solo cambian el estado del control.
+"""
+import threading
+
+
+class ControlEnvio:
+    """Señales de detención y pausa de una campaña en envío"""
+
+    def __init__(self):
+        self._detenido = threading.Event()
+        self._activo = threading.Event()  # Sin marcar = pausado
+        self._activo.set()
+
+    @property
+    def detenido(self):
+        return self._detenido.is_set()
+
+    @property
+    def pausado(self):
+        return not self._activo.is_set() and not self.detenido
+
+    def detener(self):
+        self._detenido.set()
+        self._activo.set()  # Despierta a un enviador en pausa para que salga
+
+    def pausar(self):
+        if not self.detenido:
+            self._activo.clear()
+
+    def reanudar(self):
+        self._activo.set()
+
+    def esperar_si_pausado(self):
+        """Bloquea mientras esté en pausa; retorna False si se detuvo"""
+        self._activo.wait()
+        return not self.detenido
+
+    def esperar(self, segundos):
+        """
+        Espera el intervalo entre mensajes cortándolo si se detiene. Una pausa
+        durante la espera la prolonga hasta reanudar. Retorna False si se detuvo.
+        """
+        if self._detenido.wait(segundos):
+            return False
+        return self.esperar_si_pausado()
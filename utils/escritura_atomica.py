@@ -0,0 +1,186 @@
+"""
+Escritura atómica de archivos JSON con respaldos rotativos
+
+El contenido se escribe en un archivo temporal del mismo directorio, se
+sincroniza a disco (fsync) y luego reemplaza al original con os.replace,
+de modo que un corte a mitad de escritura nunca deja el archivo truncado.
+"""
+import glob
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_RESPALDOS = os.path.join('data', 'backups')
+
+# Respaldos conservados por archivo y segundos mínimos entre respaldos
+RESPALDOS_MAXIMOS = int(os.environ.get('RESPALDOS_MAXIMOS') or 5)
+INTERVALO_RESPALDO = int(os.environ.get('INTERVALO_RESPALDO') or 600)
+
+_lock_respaldos = threading.Lock()
+_ultimo_respaldo = {}
+
+
+def _sincronizar_directorio(directorio):
+    """fsync del directorio para persistir el renombrado (no disponible en Windows)"""
+    if os.name == 'nt':
+        return
+    try:
+        fd = os.open(directorio or '.', os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def _reemplazar(origen, destino, intentos=5):
+    """os.replace con reintentos (en Windows falla si otro proceso tiene abierto el destino)"""
+    for intento in range(intentos):
+        try:
+            os.replace(origen, destino)
+            return
+        except PermissionError:
+            if intento == intentos - 1:
+                raise
+            time.sleep(0.05 * (intento + 1))
+
+
+def _patron_respaldos(ruta, directorio_respaldos):
+    base, extension = os.path.splitext(os.path.basename(ruta))
+    return os.path.join(directorio_respaldos, f'{base}_[0-9]*{extension}')
+
+
+def listar_respaldos(ruta, directorio_respaldos=DIRECTORIO_RESPALDOS):
+    """Respaldos existentes de un archivo, del más reciente al más antiguo"""
+    return sorted(glob.glob(_patron_respaldos(ruta, directorio_respaldos)), reverse=True)
+
+
+def respaldar(ruta, directorio_respaldos=DIRECTORIO_RESPALDOS, maximo=RESPALDOS_MAXIMOS,
+              intervalo=INTERVALO_RESPALDO):
+    """
+    Copia el archivo actual a directorio_respaldos si pasó el intervalo desde el
+    último respaldo, y elimina los más antiguos por encima de maximo.
+    """
+    if maximo <= 0 or not os.path.exists(ruta):
+        return None
+
+    clave = os.path.abspath(ruta)
+    ahora = time.time()
+
+    with _lock_respaldos:
+        if clave not in _ultimo_respaldo:
+            existentes = listar_respaldos(ruta, directorio_respaldos)
+            _ultimo_respaldo[clave] = os.path.getmtime(existentes[0]) if existentes else 0
+
+        if ahora - _ultimo_respaldo[clave] < intervalo:
+            return None
+        _ultimo_respaldo[clave] = ahora
+
+    try:
+        os.makedirs(directorio_respaldos, exist_ok=True)
+        base, extension = os.path.splitext(os.path.basename(ruta))
+        marca = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        destino = os.path.join(directorio_respaldos, f'{base}_{marca}{extension}')
+
+        # Un enlace duro evita copiar el archivo: os.replace deja intacto el contenido anterior
+        try:
+            os.link(ruta, destino)
+        except OSError:
+            shutil.copy2(ruta, destino)
+
+        for antiguo in listar_respaldos(ruta, directorio_respaldos)[maximo:]:
+            try:
+                os.remove(antiguo)
+            except OSError:
+                pass
+
+        return destino
+    except OSError as e:
+        logger.warning(f"No se pudo respaldar {ruta}: {e}")
+        return None
+
+
+def escribir_atomico(ruta, contenido, respaldo=False, directorio_respaldos=DIRECTORIO_RESPALDOS):
+    """Escribe bytes o texto (UTF-8) en ruta de forma atómica"""
+    if isinstance(contenido, str):
+        contenido = contenido.encode('utf-8')
+
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+
+    fd, temporal = tempfile.mkstemp(
+        prefix=f'.{os.path.basename(ruta)}.', suffix='.tmp', dir=directorio or '.'
+    )
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(contenido)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if respaldo:
+            respaldar(ruta, directorio_respaldos)
+
+        _reemplazar(temporal, ruta)
+        _sincronizar_directorio(directorio)
+    except BaseException:
+        try:
+            os.remove(temporal)
+        except OSError:
+            pass
+        raise
+
+
+def serializar_json(datos, indent=2):
+    """
+    JSON en bytes UTF-8. indent=None genera el formato compacto (sin espacios).
+    Usa orjson si está instalado y la biblioteca estándar en caso contrario.
+    """
+    if orjson is not None and indent in (None, 2):
+        opciones = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return orjson.dumps(datos, option=opciones)
+        except TypeError:
+            pass
+    separadores = (',', ':') if indent is None else None
+    return json.dumps(datos, ensure_ascii=False, indent=indent, separators=separadores).encode('utf-8')
+
+
+def leer_json(ruta):
+    """Lee un archivo JSON, compacto o con sangría"""
+    with open(ruta, 'rb') as f:
+        contenido = f.read()
+    if orjson is not None:
+        return orjson.loads(contenido)
+    return json.loads(contenido.decode('utf-8'))
+
+
+def escribir_json_atomico(ruta, datos, respaldo=False, indent=2, directorio_respaldos=DIRECTORIO_RESPALDOS):
+    """Serializa datos a JSON y los escribe en ruta de forma atómica"""
+    contenido = serializar_json(datos, indent=indent)
+    escribir_atomico(ruta, contenido, respaldo=respaldo, directorio_respaldos=directorio_respaldos)
+
+
+def cargar_respaldo_json(ruta, directorio_respaldos=DIRECTORIO_RESPALDOS):
+    """Carga el respaldo válido más reciente de un archivo JSON; None si no hay ninguno"""
+    for respaldo in listar_respaldos(ruta, directorio_respaldos):
+        try:
+            datos = leer_json(respaldo)
+            logger.warning(f"Usando respaldo {respaldo} para {ruta}")
+            return datos
+        except (ValueError, IOError):
+            continue
+    return None
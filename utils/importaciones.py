@@ -0,0 +1,209 @@
+"""
+Trabajos de importación de contactos en segundo plano
+
+"""
+from datetime import datetime
+import logging
+import os
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Carpeta donde se guardan los archivos subidos mientras se procesan
+CARPETA_IMPORTACIONES = 'uploads/importaciones'
+
+# Trabajos terminados que se conservan en memoria para consultar su resultado
+MAX_TRABAJOS_TERMINADOS = 50
+
+ESTADOS_TERMINADOS = ('completado', 'cancelado', 'error')
+
+def estimar_filas(ruta):
+    """Estima el número de filas de datos de un archivo (None si no se puede)"""
+    try:
+        nombre = ruta.lower()
+
+        if nombre.endswith('.csv'):
+            lineas = 0
+            ultimo = b''
+            with open(ruta, 'rb') as f:
+                for bloque in iter(lambda: f.read(1024 * 1024), b''):
+                    lineas += bloque.count(b'\n')
+                    ultimo = bloque
+            if ultimo and not ultimo.endswith(b'\n'):
+                lineas += 1
+            return max(lineas - 1, 0)
+
+        if nombre.endswith('.xlsx'):
+            from openpyxl import load_workbook
+            libro = load_workbook(ruta, read_only=True)
+            try:
+                max_fila = libro.worksheets[0].max_row
+            finally:
+                libro.close()
+            return max(max_fila - 1, 0) if max_fila else None
+
+    except Exception as e:
+        logger.warning(f"No se pudo estimar filas de {ruta}: {e}")
+
+    return None
+
+class TrabajoImportacion:
+    """Importación de un archivo de contactos ejecutándose en un hilo"""
+
+    def __init__(self, nombre_archivo, carpeta=CARPETA_IMPORTACIONES):
+        self.id = str(uuid.uuid4())
+        extension = os.path.splitext(nombre_archivo)[1].lower()
+        self.ruta_archivo = os.path.join(carpeta, f"{self.id}{extension}")
+        self.nombre_archivo = nombre_archivo
+        self.estado = 'pendiente'
+        self.filas_estimadas = None
+        self.progreso = {
+            'filas_procesadas': 0,
+            'aceptados': 0,
+            'rechazados': {
+                'duplicados': 0,
+                'nombres_repetidos': 0,
+                'telefonos_invalidos': 0,
+                'errores': 0
+            }
+        }
+        self.resultado = None
+        self.diagnostico = None
+        self.error = None
+        self.creado_en = datetime.now().isoformat()
+        self.actualizado_en = self.creado_en
+        self._cancelar = threading.Event()
+
+    @property
+    def terminado(self):
+        return self.estado in ESTADOS_TERMINADOS
+
+    def cancelar(self):
+        """Solicita la cancelación; se aplica antes del siguiente bloque"""
+        self._cancelar.set()
+
+    def actualizar_progreso(self, estadisticas):
+        """Callback de procesar_archivo_contactos tras cada bloque"""
+        self.progreso = {
+            'filas_procesadas': estadisticas['total_filas'],
+            'aceptados': estadisticas['procesados'],
+            'rechazados': {
+                'duplicados': estadisticas['duplicados'],
+                'nombres_repetidos': estadisticas['nombres_repetidos'],
+                'telefonos_invalidos': estadisticas['telefonos_invalidos'],
+                'errores': estadisticas['errores']
+            }
+        }
+        self.actualizado_en = datetime.now().isoformat()
+
+    def ejecutar(self):
+        """Procesa el archivo y guarda el resultado (se ejecuta en el hilo)"""
+        from utils.manejador_excel import procesar_archivo_contactos, DiagnosticoImportacion
+
+        try:
+            if self._cancelar.is_set():
+                self.estado = 'cancelado'
+                return
+
+            self.estado = 'procesando'
+            self.actualizado_en = datetime.now().isoformat()
+            self.filas_estimadas = estimar_filas(self.ruta_archivo)
+            self.diagnostico = DiagnosticoImportacion()
+
+            resultado = procesar_archivo_contactos(
+                self.ruta_archivo,
+                progreso=self.actualizar_progreso,
+                cancelado=self._cancelar.is_set,
+                diagnostico=self.diagnostico
+            )
+
+            # Solo el resumen: el detalle de rechazados se sirve como CSV aparte
+            resultado['diagnostico'] = self.diagnostico.resumen()
+            self.resultado = resultado
+            self.estado = 'cancelado' if resultado.get('cancelado') else 'completado'
+
+            logger.info(
+                f"Importación {self.id} {self.estado}: "
+                f"{resultado['procesados']} de {resultado['total_filas']} filas"
+            )
+
+        except Exception as e:
+            self.error = str(e)
+            self.estado = 'error'
+            logger.error(f"Error en importación {self.id}: {e}")
+
+        finally:
+            self.actualizado_en = datetime.now().isoformat()
+            if os.path.exists(self.ruta_archivo):
+                try:
+                    os.remove(self.ruta_archivo)
+                except OSError:
+                    pass
+
+    def to_dict(self):
+        """Estado del trabajo para la API (sin el resultado)"""
+        porcentaje = None
+        if self.estado == 'completado':
+            porcentaje = 100
+        elif self.filas_estimadas:
+            porcentaje = round(min(self.progreso['filas_procesadas'] / self.filas_estimadas * 100, 99.9), 1)
+
+        return {
+            'id': self.id,
+            'nombre_archivo': self.nombre_archivo,
+            'estado': self.estado,
+            'filas_estimadas': self.filas_estimadas,
+            'porcentaje': porcentaje,
+            'progreso': self.progreso,
+            'error': self.error,
+            'creado_en': self.creado_en,
+            'actualizado_en': self.actualizado_en
+        }
+
+class GestorImportaciones:
+    """Registro en memoria de los trabajos de importación"""
+
+    def __init__(self, carpeta=CARPETA_IMPORTACIONES):
+        self.carpeta = carpeta
+        self._trabajos = {}
+        self._lock = threading.Lock()
+
+    def iniciar(self, archivo):
+        """Guarda el archivo subido en disco y lanza su importación en un hilo"""
+        os.makedirs(self.carpeta, exist_ok=True)
+
+        trabajo = TrabajoImportacion(archivo.filename, self.carpeta)
+        archivo.save(trabajo.ruta_archivo)
+
+        with self._lock:
+            self._limpiar_terminados()
+            self._trabajos[trabajo.id] = trabajo
+
+        thread = threading.Thread(target=trabajo.ejecutar)
+        thread.daemon = True
+        thread.start()
+
+        logger.info(f"Importación iniciada: {trabajo.id} ({archivo.filename})")
+        return trabajo
+
+    def obtener(self, trabajo_id):
+        with self._lock:
+            return self._trabajos.get(trabajo_id)
+
+    def cancelar(self, trabajo_id):
+        """Solicita la cancelación de un trabajo; retorna el trabajo o None"""
+        trabajo = self.obtener(trabajo_id)
+        if trabajo and not trabajo.terminado:
+            trabajo.cancelar()
+            logger.info(f"Cancelación solicitada para importación {trabajo_id}")
+        return trabajo
+
+    def _limpiar_terminados(self):
+        terminados = [t for t in self._trabajos.values() if t.terminado]
+        sobrantes = len(terminados) - MAX_TRABAJOS_TERMINADOS + 1
+        for trabajo in sorted(terminados, key=lambda t: t.actualizado_en)[:max(sobrantes, 0)]:
+            del self._trabajos[trabajo.id]
+
+# Instancia global
+gestor_importaciones = GestorImportaciones()
@@ -1,6 +1,108 @@
 import pandas as pd
+import numpy as np
+import csv
+import io
 import re
-from models.contacto import Contacto
+from array import array
+from models.contacto import Contacto, repositorio_contactos
+
+# Filas por bloque al leer y guardar archivos de contactos
+TAMANO_BLOQUE = 5000
+
+# Códigos de motivo de rechazo de teléfonos (normalizar_telefonos)
+MOTIVOS_TELEFONO = {
+    'vacio': 'Teléfono vacío',
+    'notacion_cientifica': 'Notación científica no convertible',
+    'prefijo_5938': 'Empieza con +5938 (debe ser +5939)',
+    'sin_prefijo_593': 'No empieza con +593',
+    'longitud': 'Longitud incorrecta (debe ser 13 caracteres)',
+    'formato': 'Formato inválido'
+}
+
+# Motivos de rechazo de filas al importar; la posición es el código compacto
+MOTIVOS_RECHAZO = (
+    'nombre_invalido',
+    'nombre_repetido',
+    'telefono_invalido',
+    'telefono_prefijo_5938',
+    'telefono_duplicado',
+    'error_guardado',
+    'error'
+)
+CODIGOS_RECHAZO = {motivo: codigo for codigo, motivo in enumerate(MOTIVOS_RECHAZO)}
+
+# Mensajes detallados que se devuelven en estadisticas['detalles_errores']
+MAX_DETALLES_ERRORES = 25
+
+# Contactos importados que se devuelven de muestra en estadisticas['muestra_contactos']
+MAX_MUESTRA_CONTACTOS = 20
+
+def mensaje_rechazo(fila, motivo, nombre, telefono, detalle=''):
+    """Mensaje legible de una fila rechazada"""
+    if motivo == 'nombre_invalido':
+        return f"Fila {fila}: Nombre vacío o inválido - RECHAZADO"
+    if motivo == 'nombre_repetido':
+        return f"Fila {fila}: Nombre '{nombre}' ya existe - RECHAZADO"
+    if motivo == 'telefono_prefijo_5938':
+        return f"Fila {fila}: Teléfono '{telefono}' INVÁLIDO - NO puede empezar con +5938, debe ser +5939XXXXXXXX - RECHAZADO"
+    if motivo == 'telefono_invalido':
+        return f"Fila {fila}: Teléfono '{telefono}' INVÁLIDO - debe ser +593 seguido de 9 dígitos que empiecen con 9 - RECHAZADO"
+    if motivo == 'telefono_duplicado':
+        return f"Fila {fila}: Teléfono {telefono} ya existe - RECHAZADO"
+    if motivo == 'error':
+        return f"Fila {fila}: Error inesperado - {detalle} - RECHAZADO"
+    return f"Fila {fila}: {detalle} - RECHAZADO"
+
+class DiagnosticoImportacion:
+    """
+    Registro compacto de filas rechazadas en una importación.
+    Número de fila y código de motivo se guardan en arrays paralelos; los valores
+    originales se conservan solo para generar el CSV de rechazados.
+    """
+    
+    def __init__(self):
+        self.filas = array('I')
+        self.codigos = array('B')
+        self.valores = []
+    
+    def __len__(self):
+        return len(self.filas)
+    
+    def registrar(self, fila, motivo, nombre='', telefono='', detalle=''):
+        self.filas.append(fila)
+        self.codigos.append(CODIGOS_RECHAZO[motivo])
+        self.valores.append((nombre, telefono, detalle))
+    
+    def por_motivo(self):
+        """Cantidad de filas rechazadas por motivo"""
+        conteo = np.bincount(np.frombuffer(self.codigos, dtype=np.uint8), minlength=len(MOTIVOS_RECHAZO))
+        return {motivo: int(conteo[codigo]) for codigo, motivo in enumerate(MOTIVOS_RECHAZO) if conteo[codigo]}
+    
+    def resumen(self):
+        """Totales por motivo, sin el detalle fila a fila"""
+        return {
+            'total_rechazados': len(self),
+            'por_motivo': self.por_motivo()
+        }
+    
+    def to_dict(self):
+        return {
+            'total_rechazados': len(self),
+            'por_motivo': self.por_motivo(),
+            'motivos': list(MOTIVOS_RECHAZO),
+            'filas': self.filas.tolist(),
+            'codigos': self.codigos.tolist()
+        }
+    
+    def a_csv(self):
+        """CSV de filas rechazadas (Fila, Motivo, Detalle, Nombre, Telefono)"""
+        salida = io.StringIO()
+        escritor = csv.writer(salida)
+        escritor.writerow(['Fila', 'Motivo', 'Detalle', 'Nombre', 'Telefono'])
+        for fila, codigo, (nombre, telefono, detalle) in zip(self.filas, self.codigos, self.valores):
+            motivo = MOTIVOS_RECHAZO[codigo]
+            escritor.writerow([fila, motivo, detalle or mensaje_rechazo(fila, motivo, nombre, telefono), nombre, telefono])
+        return salida.getvalue()
 
 def validar_telefono(telefono):
     """Valida formato de teléfono ecuatoriano - ESTRICTO"""
@@ -14,16 +116,6 @@ def validar_telefono(telefono):
     patron = r'^\+5939\d{8}$'
     resultado = bool(re.match(patron, telefono_limpio))
     
-    # Debug para teléfonos inválidos
-    if not resultado:
-        print(f"Teléfono inválido detectado: '{telefono}' -> '{telefono_limpio}'")
-        if telefono_limpio.startswith('+5938'):
-            print(f"   ERROR: Empieza con +5938 (debe ser +5939)")
-        elif not telefono_limpio.startswith('+593'):
-            print(f"   ERROR: No empieza con +593")
-        elif len(telefono_limpio) != 13:
-            print(f"   ERROR: Longitud incorrecta {len(telefono_limpio)} (debe ser 13)")
-    
     return resultado
 
 def limpiar_telefono(telefono):
@@ -41,6 +133,9 @@ def limpiar_telefono(telefono):
         except:
             return None
     
+    # Quitar el sufijo decimal de números leídos como float (987654321.0)
+    telefono_str = re.sub(r'\.0+$', '', telefono_str.strip())
+    
     # Remover espacios y caracteres especiales excepto +
     telefono_limpio = re.sub(r'[^\d+]', '', telefono_str)
     
@@ -59,11 +154,61 @@ def limpiar_telefono(telefono):
     
     return telefono_limpio if validar_telefono(telefono_limpio) else None
 
-def buscar_columnas_nombres(df):
-    """Busca y combina columnas de nombres y apellidos"""
-    columnas_df = [col.strip() for col in df.columns]
+def normalizar_telefonos(serie):
+    """
+    Versión vectorizada de limpiar_telefono para una columna completa
+    
+    Args:
+        serie: pd.Series con los teléfonos tal como vienen del archivo
+        
+    Returns:
+        tuple: (teléfonos normalizados o None, código de motivo o '', máscara de válidos)
+    """
+    texto = serie.where(serie.notna(), '').astype(str).str.strip()
+    vacio = texto == ''
+    
+    # Notación científica (9.87654321E+8) -> entero
+    cientifico = texto.str.contains('e+', case=False, regex=False)
+    fallo_cientifico = pd.Series(False, index=serie.index)
+    if cientifico.any():
+        convertidos = pd.to_numeric(texto[cientifico], errors='coerce')
+        fallo_cientifico[convertidos.index[convertidos.isna()]] = True
+        convertidos = convertidos.dropna()
+        texto[convertidos.index] = convertidos.astype('int64').astype(str)
     
-    # Buscar columnas de nombre
+    # Quitar sufijo decimal de floats y todo lo que no sea dígito o +
+    limpio = texto.str.replace(r'\.0+$|[^\d+]', '', regex=True)
+    
+    # +5939XXXXXXXX, 5939XXXXXXXX, 09XXXXXXXX y 9XXXXXXXX son los únicos formatos válidos
+    numero = limpio.str.extract(r'^(?:\+593|593|0)?(9\d{8})$', expand=False)
+    validos = numero.notna() & ~fallo_cientifico
+    
+    telefonos = ('+593' + numero).where(validos, None)
+    motivos = pd.Series('', index=serie.index, dtype=object)
+    
+    # Motivos solo para las filas rechazadas (normalmente pocas)
+    invalidos = ~validos
+    if invalidos.any():
+        rechazados = limpio[invalidos]
+        longitud = rechazados.str.len()
+        rechazados = rechazados.mask(rechazados.str.startswith('593') & (longitud == 12), '+' + rechazados)
+        rechazados = rechazados.mask(rechazados.str.startswith('0') & (longitud == 10), '+593' + rechazados.str.slice(1))
+        motivos[invalidos] = np.select(
+            [
+                vacio[invalidos].to_numpy(),
+                fallo_cientifico[invalidos].to_numpy(),
+                rechazados.str.startswith('+5938').to_numpy(dtype=bool),
+                (~rechazados.str.startswith('+593')).to_numpy(dtype=bool),
+                (rechazados.str.len() != 13).to_numpy(dtype=bool)
+            ],
+            ['vacio', 'notacion_cientifica', 'prefijo_5938', 'sin_prefijo_593', 'longitud'],
+            default='formato'
+        )
+    
+    return telefonos, motivos, validos
+
+def detectar_columnas_nombres(columnas_df):
+    """Detecta las columnas de nombre y apellido a partir de los encabezados"""
     col_nombre = None
     col_apellido = None
     
@@ -86,21 +231,26 @@ def buscar_columnas_nombres(df):
             col_apellido = col
             break
     
+    return col_nombre, col_apellido
+
+def combinar_columnas_nombres(df, col_nombre, col_apellido):
+    """Crea la columna Nombre_Completo combinando nombre y apellido"""
+    nombre = df[col_nombre].where(df[col_nombre].notna(), '').astype(str).str.strip()
+    apellido = df[col_apellido].where(df[col_apellido].notna(), '').astype(str).str.strip()
+    
+    nombre_completo = (nombre + ' ' + apellido).str.strip()
+    df['Nombre_Completo'] = nombre_completo.where(nombre_completo != '', None)
+    return 'Nombre_Completo'
+
+def buscar_columnas_nombres(df):
+    """Busca y combina columnas de nombres y apellidos"""
+    columnas_df = [col.strip() for col in df.columns]
+    col_nombre, col_apellido = detectar_columnas_nombres(columnas_df)
+    
     # Si encontramos ambas columnas, crear una columna combinada
     if col_nombre and col_apellido:
         print(f"Combinando columnas: '{col_nombre}' + '{col_apellido}'")
-        
-        # Crear nueva columna combinada
-        def combinar_nombres(row):
-            nombre = str(row[col_nombre]).strip() if pd.notna(row[col_nombre]) else ''
-            apellido = str(row[col_apellido]).strip() if pd.notna(row[col_apellido]) else ''
-            
-            # Combinar nombres
-            nombre_completo = f"{nombre} {apellido}".strip()
-            return nombre_completo if nombre_completo else None
-        
-        df['Nombre_Completo'] = df.apply(combinar_nombres, axis=1)
-        return 'Nombre_Completo'
+        return combinar_columnas_nombres(df, col_nombre, col_apellido)
     
     # Si solo encontramos una columna de nombre, usarla
     if col_nombre:
@@ -128,29 +278,89 @@ def buscar_columna_telefono(columnas_df):
     
     return None
 
-def procesar_archivo_contactos(archivo):
+def _leer_xlsx_por_bloques(archivo, tamano_bloque):
+    """Lee un .xlsx fila a fila (openpyxl en modo solo lectura) y genera DataFrames por bloques"""
+    from openpyxl import load_workbook
+    
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if not encabezado:
+            return
+        
+        columnas = [
+            str(col) if col is not None else f'Unnamed: {i}'
+            for i, col in enumerate(encabezado)
+        ]
+        
+        bloque = []
+        indices = []
+        for indice, fila in enumerate(filas):
+            # Filas completamente vacías se omiten sin alterar la numeración
+            if all(valor is None for valor in fila):
+                continue
+            bloque.append(fila[:len(columnas)])
+            indices.append(indice)
+            
+            if len(bloque) >= tamano_bloque:
+                yield pd.DataFrame(bloque, columns=columnas, index=indices)
+                bloque = []
+                indices = []
+        
+        if bloque:
+            yield pd.DataFrame(bloque, columns=columnas, index=indices)
+    finally:
+        libro.close()
+
+def leer_archivo_por_bloques(archivo, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Genera DataFrames de como máximo tamano_bloque filas.
+    El índice de cada bloque es la posición de la fila de datos en el archivo
+    (fila de Excel = índice + 2). Acepta un archivo subido o una ruta en disco.
     """
-    Procesa archivo Excel/CSV y retorna estadísticas de importación + contactos
+    nombre_archivo = getattr(archivo, 'filename', archivo).lower()
+    
+    if nombre_archivo.endswith('.csv'):
+        # Los bloques de read_csv mantienen el índice continuo entre bloques
+        yield from pd.read_csv(archivo, chunksize=tamano_bloque)
+    elif nombre_archivo.endswith('.xlsx'):
+        yield from _leer_xlsx_por_bloques(archivo, tamano_bloque)
+    else:
+        # .xls no admite lectura en streaming
+        df = pd.read_excel(archivo)
+        for inicio in range(0, len(df), tamano_bloque):
+            yield df.iloc[inicio:inicio + tamano_bloque]
+
+def procesar_archivo_contactos(archivo, tamano_bloque=TAMANO_BLOQUE, progreso=None, cancelado=None,
+                               diagnostico=None):
+    """
+    Procesa archivo Excel/CSV y retorna estadísticas de importación con una muestra
+    de los contactos importados. El archivo se lee y se guarda por bloques, y cada
+    bloque se descarta al guardarlo, para mantener acotado el uso de memoria.
+    
+    progreso(estadisticas) se llama después de guardar cada bloque y cancelado()
+    se consulta antes de cada bloque; si devuelve True la importación se detiene
+    (los bloques ya guardados se conservan) y se marca estadisticas['cancelado'].
+    Las filas rechazadas se registran en diagnostico (DiagnosticoImportacion).
     """
     try:
-        # Leer archivo según extensión
-        if archivo.filename.lower().endswith('.csv'):
-            df = pd.read_csv(archivo)
-        else:
-            df = pd.read_excel(archivo)
+        bloques = leer_archivo_por_bloques(archivo, tamano_bloque)
+        primer_bloque = next(bloques, None)
         
-        # Validar que el DataFrame no esté vacío
-        if df.empty:
+        # Validar que el archivo no esté vacío
+        if primer_bloque is None or primer_bloque.empty:
             raise ValueError("El archivo está vacío")
         
         # Limpiar nombres de columnas (quitar espacios)
-        df.columns = df.columns.str.strip()
-        columnas_df = [col.strip() for col in df.columns]
+        primer_bloque.columns = [str(col).strip() for col in primer_bloque.columns]
+        columnas_df = list(primer_bloque.columns)
         
         print(f"Columnas encontradas: {columnas_df}")
         
-        # Buscar columna de nombre (puede combinar nombre + apellido)
-        col_nombre = buscar_columnas_nombres(df)
+        # Detectar columnas una sola vez desde el encabezado (puede combinar nombre + apellido)
+        col_nombre = buscar_columnas_nombres(primer_bloque)
+        col_nombre_base, col_apellido = detectar_columnas_nombres(columnas_df)
         
         # Buscar columna de teléfono
         col_telefono = buscar_columna_telefono(columnas_df)
@@ -173,121 +383,146 @@ def procesar_archivo_contactos(archivo):
         
         # Estadísticas
         estadisticas = {
-            'total_filas': len(df),
+            'total_filas': 0,
             'procesados': 0,
             'errores': 0,
             'duplicados': 0,
             'telefonos_invalidos': 0,
             'nombres_repetidos': 0,
-            'detalles_errores': []
+            'detalles_errores': [],
+            'muestra_contactos': []
         }
         
-        contactos_procesados = []
         telefonos_vistos = set()
         nombres_vistos = set()
         
-        # Obtener todos los contactos existentes
-        contactos_existentes = Contacto.obtener_todos()
-        telefonos_existentes = {c.telefono for c in contactos_existentes}
-        nombres_existentes = {c.nombre.lower() for c in contactos_existentes}
+        if diagnostico is None:
+            diagnostico = DiagnosticoImportacion()
         
-        print(f"Procesando {len(df)} filas...")
+        def rechazar(fila, motivo, nombre, telefono, detalle=''):
+            diagnostico.registrar(fila, motivo, nombre, telefono, detalle)
+            # Solo se redactan los primeros mensajes; el resto queda en el diagnóstico
+            if len(estadisticas['detalles_errores']) < MAX_DETALLES_ERRORES:
+                estadisticas['detalles_errores'].append(
+                    mensaje_rechazo(fila, motivo, nombre, telefono, detalle)
+                )
+        
+        # Teléfonos y nombres existentes (una sola carga desde la caché de contactos)
+        telefonos_existentes, nombres_existentes = repositorio_contactos.telefonos_y_nombres()
         
-        for index, fila in df.iterrows():
-            try:
-                # Extraer datos básicos
-                nombre = str(fila[col_nombre]).strip() if pd.notna(fila[col_nombre]) else ''
-                telefono_raw = fila[col_telefono] if pd.notna(fila[col_telefono]) else ''
-                
-                print(f"  Fila {index + 2}: Nombre='{nombre}', Teléfono='{telefono_raw}'")
-                
-                # Validar nombre
-                if not nombre or nombre.lower() in ['nan', 'null', ''] or len(nombre.strip()) == 0:
+        def procesar_bloque(df):
+            estadisticas['total_filas'] += len(df)
+            
+            # Filas válidas del bloque pendientes de guardar: (número de fila, datos)
+            filas_pendientes = []
+            
+            # Preparar columnas completas antes del bucle (operaciones vectorizadas)
+            nombres = df[col_nombre].where(df[col_nombre].notna(), '').astype(str).str.strip()
+            telefonos_raw = df[col_telefono].where(df[col_telefono].notna(), '')
+            telefonos, motivos, _ = normalizar_telefonos(df[col_telefono])
+            
+            estados = pd.Series('activo', index=df.index)
+            if col_estado:
+                estados_raw = df[col_estado].astype('string').str.strip().str.lower()
+                estados = estados_raw.where(estados_raw.isin(['activo', 'inactivo', 'bloqueado']), 'activo')
+            
+            for index, nombre, telefono_raw, telefono, motivo, estado in zip(
+                df.index, nombres, telefonos_raw, telefonos, motivos, estados
+            ):
+                fila = index + 2
+                try:
+                    # Validar nombre
+                    if not nombre or nombre.lower() in ['nan', 'null', ''] or len(nombre.strip()) == 0:
+                        estadisticas['errores'] += 1
+                        rechazar(fila, 'nombre_invalido', nombre, telefono_raw)
+                        continue
+                    
+                    # Verificar nombre duplicado
+                    nombre_lower = nombre.lower()
+                    if nombre_lower in nombres_existentes or nombre_lower in nombres_vistos:
+                        estadisticas['nombres_repetidos'] += 1
+                        rechazar(fila, 'nombre_repetido', nombre, telefono_raw)
+                        continue
+                    
+                    # Teléfono ya normalizado y validado por normalizar_telefonos
+                    if not telefono:
+                        estadisticas['telefonos_invalidos'] += 1
+                        if motivo == 'prefijo_5938':
+                            rechazar(fila, 'telefono_prefijo_5938', nombre, telefono_raw)
+                        else:
+                            rechazar(fila, 'telefono_invalido', nombre, telefono_raw)
+                        continue
+                    
+                    # Verificar teléfono duplicado
+                    if telefono in telefonos_existentes or telefono in telefonos_vistos:
+                        estadisticas['duplicados'] += 1
+                        rechazar(fila, 'telefono_duplicado', nombre, telefono)
+                        continue
+                    
+                    # Validación completa en memoria; el guardado se hace por bloque
+                    filas_pendientes.append((fila, {
+                        'nombre': nombre,
+                        'telefono': telefono,
+                        'estado': estado
+                    }))
+                    
+                    # Agregar a conjuntos para evitar duplicados en el mismo archivo
+                    telefonos_vistos.add(telefono)
+                    nombres_vistos.add(nombre_lower)
+                    
+                except Exception as e:
                     estadisticas['errores'] += 1
-                    error_msg = f"Fila {index + 2}: Nombre vacío o inválido - RECHAZADO"
-                    estadisticas['detalles_errores'].append(error_msg)
-                    print(f"    {error_msg}")
-                    continue
-                
-                # Verificar nombre duplicado
-                nombre_lower = nombre.lower()
-                if nombre_lower in nombres_existentes or nombre_lower in nombres_vistos:
-                    estadisticas['nombres_repetidos'] += 1
-                    error_msg = f"Fila {index + 2}: Nombre '{nombre}' ya existe - RECHAZADO"
-                    estadisticas['detalles_errores'].append(error_msg)
-                    print(f"    {error_msg}")
-                    continue
-                
-                # Validar y limpiar teléfono
-                telefono = limpiar_telefono(telefono_raw)
-                if not telefono:
-                    estadisticas['telefonos_invalidos'] += 1
-                    # Detectar específicamente +5938
-                    telefono_str = str(telefono_raw)
-                    if '+5938' in telefono_str:
-                        error_msg = f"Fila {index + 2}: Teléfono '{telefono_raw}' INVÁLIDO - NO puede empezar con +5938, debe ser +5939XXXXXXXX - RECHAZADO"
-                    else:
-                        error_msg = f"Fila {index + 2}: Teléfono '{telefono_raw}' INVÁLIDO - debe ser +593 seguido de 9 dígitos que empiecen con 9 - RECHAZADO"
-                    estadisticas['detalles_errores'].append(error_msg)
-                    print(f"    {error_msg}")
-                    continue
-                
-                # Verificar teléfono duplicado
-                if telefono in telefonos_existentes or telefono in telefonos_vistos:
-                    estadisticas['duplicados'] += 1
-                    error_msg = f"Fila {index + 2}: Teléfono {telefono} ya existe - RECHAZADO"
-                    estadisticas['detalles_errores'].append(error_msg)
-                    print(f"    {error_msg}")
+                    rechazar(fila, 'error', nombre, telefono_raw, str(e))
                     continue
-                
-                # Estado (por defecto activo)
-                estado = 'activo'
-                if col_estado and pd.notna(fila[col_estado]):
-                    estado_raw = str(fila[col_estado]).strip().lower()
-                    if estado_raw in ['activo', 'inactivo', 'bloqueado']:
-                        estado = estado_raw
-                
-                # Crear contacto
-                contacto = Contacto.crear(
-                    nombre=nombre,
-                    telefono=telefono,
-                    origen='excel'
-                )
-                
-                # Actualizar estado si es diferente de activo
-                if estado != 'activo':
-                    contacto.estado = estado
-                    contacto.guardar()
-                
-                contactos_procesados.append(contacto)
-                estadisticas['procesados'] += 1
-                
-                # Agregar a conjuntos para evitar duplicados en el mismo archivo
-                telefonos_vistos.add(telefono)
-                nombres_vistos.add(nombre_lower)
-                
-                print(f"    Contacto creado: {nombre} - {telefono}")
-                
-            except Exception as e:
+            
+            # Guardar los contactos válidos del bloque con una sola escritura
+            creados, errores_lote = Contacto.crear_lote(
+                [datos for _, datos in filas_pendientes],
+                origen='excel'
+            )
+            estadisticas['procesados'] += len(creados)
+            faltan = MAX_MUESTRA_CONTACTOS - len(estadisticas['muestra_contactos'])
+            if faltan > 0:
+                estadisticas['muestra_contactos'].extend(c.to_dict() for c in creados[:faltan])
+            
+            for indice, mensaje in errores_lote:
                 estadisticas['errores'] += 1
-                error_msg = f"Fila {index + 2}: Error inesperado - {str(e)} - RECHAZADO"
-                estadisticas['detalles_errores'].append(error_msg)
-                print(f"    {error_msg}")
-                continue
+                fila, datos = filas_pendientes[indice]
+                rechazar(fila, 'error_guardado', datos['nombre'], datos['telefono'], mensaje)
+        
+        def avisar_progreso():
+            if progreso:
+                progreso(estadisticas)
+        
+        procesar_bloque(primer_bloque)
+        del primer_bloque
+        avisar_progreso()
+        
+        for bloque in bloques:
+            if cancelado and cancelado():
+                estadisticas['cancelado'] = True
+                print("Importación cancelada")
+                break
+            
+            bloque.columns = [str(col).strip() for col in bloque.columns]
+            if col_nombre == 'Nombre_Completo' and col_nombre not in bloque.columns:
+                combinar_columnas_nombres(bloque, col_nombre_base, col_apellido)
+            procesar_bloque(bloque)
+            avisar_progreso()
         
         # Limitar errores mostrados
-        if len(estadisticas['detalles_errores']) > 25:
-            extra = len(estadisticas['detalles_errores']) - 25
-            estadisticas['detalles_errores'] = estadisticas['detalles_errores'][:25]
+        extra = len(diagnostico) - len(estadisticas['detalles_errores'])
+        if extra > 0:
             estadisticas['detalles_errores'].append(f"... y {extra} errores más")
         
-        # Devolver también los contactos en formato dict
-        contactos_dicts = [c.to_dict() for c in contactos_procesados]
-        estadisticas["contactos"] = contactos_dicts
+        estadisticas['diagnostico'] = diagnostico.to_dict()
         
-        print(f"RESUMEN: {estadisticas['procesados']} procesados, {estadisticas['errores']} errores")
+        print(
+            f"RESUMEN: {estadisticas['total_filas']} filas, {estadisticas['procesados']} procesados, "
+            f"{len(diagnostico)} rechazados {diagnostico.por_motivo()}"
+        )
         
         return estadisticas
         
     except Exception as e:
-        raise ValueError(f"Error procesando archivo: {str(e)}")
\ No newline at end of file
+        raise ValueError(f"Error procesando archivo: {str(e)}")
@@ -0,0 +1,280 @@
+"""
+Preparación de los adjuntos de campaña antes del envío
+
+Al crear la campaña el archivo subido se valida y, si hace falta, se convierte
+a un formato y tamaño que WhatsApp acepta (imágenes con Pillow, videos con
+ffmpeg si está instalado). El resultado queda en uploads/campanas/procesados
+con el hash del contenido como nombre, junto a un .json con sus metadatos, así
+que subir el mismo archivo otra vez no lo vuelve a procesar y el envío no
+valida nada por destinatario.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from utils.escritura_atomica import escribir_atomico, serializar_json
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_MEDIOS = os.path.join('uploads', 'campanas', 'procesados')
+
+# Límites de WhatsApp: 16 MB para fotos y videos, 100 MB para documentos
+LIMITE_MEDIA_MB = 16
+LIMITE_DOCUMENTO_MB = 100
+
+# Objetivo de la conversión (WhatsApp recomprime todo lo que pase de esto)
+LADO_MAXIMO_IMAGEN = int(os.environ.get('LADO_MAXIMO_IMAGEN') or 1600)
+CALIDAD_JPEG = int(os.environ.get('CALIDAD_JPEG') or 80)
+ANCHO_MAXIMO_VIDEO = int(os.environ.get('ANCHO_MAXIMO_VIDEO') or 854)
+OBJETIVO_VIDEO_MB = float(os.environ.get('OBJETIVO_VIDEO_MB') or 15)
+
+# Tope (segundos) de la conversión de un video; corre dentro de la petición que crea la campaña
+TIEMPO_MAXIMO_CONVERSION = float(os.environ.get('TIEMPO_MAXIMO_CONVERSION') or 300)
+
+FFMPEG = os.environ.get('FFMPEG_PATH') or shutil.which('ffmpeg')
+FFPROBE = os.environ.get('FFPROBE_PATH') or shutil.which('ffprobe')
+
+FORMATOS_ENVIABLES = {
+    'imagen': {'.jpg', '.jpeg', '.png', '.gif', '.webp'},
+    'video': {'.mp4', '.3gp', '.mov'},
+}
+
+_lock = threading.Lock()
+_preparados = {}  # Ruta absoluta del procesado → metadatos
+
+
+class ErrorMedio(ValueError):
+    """El archivo no se puede enviar por WhatsApp ni convertir"""
+
+
+def calcular_hash(ruta, bloque=1024 * 1024):
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for trozo in iter(lambda: f.read(bloque), b''):
+            sha.update(trozo)
+    return sha.hexdigest()
+
+
+def _mb(ruta):
+    return os.path.getsize(ruta) / (1024 * 1024)
+
+
+def _ruta_metadatos(hash_contenido, directorio):
+    return os.path.join(directorio, f'{hash_contenido}.json')
+
+
+def _leer_cache(hash_contenido, directorio):
+    ruta_meta = _ruta_metadatos(hash_contenido, directorio)
+    try:
+        with open(ruta_meta, 'r', encoding='utf-8') as f:
+            metadatos = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(metadatos.get('ruta', '')):
+        return None
+    return metadatos
+
+
+def _registrar(metadatos):
+    with _lock:
+        _preparados[os.path.abspath(metadatos['ruta'])] = metadatos
+    return metadatos
+
+
+# ===== Conversores =====
+
+def _preparar_imagen(origen, destino_base):
+    """Retorna (ruta, metadatos extra); copia tal cual si ya cumple"""
+    extension = os.path.splitext(origen)[1].lower()
+    if Image is None:
+        if extension not in FORMATOS_ENVIABLES['imagen'] or _mb(origen) > LIMITE_MEDIA_MB:
+            raise ErrorMedio('Imagen no compatible con WhatsApp y Pillow no está instalado para convertirla')
+        destino = destino_base + extension
+        shutil.copyfile(origen, destino)
+        return destino, {'procesado': False}
+
+    try:
+        with Image.open(origen) as imagen:
+            ancho, alto = imagen.size
+            animada = getattr(imagen, 'is_animated', False)
+            cumple = (
+                extension in FORMATOS_ENVIABLES['imagen']
+                and max(ancho, alto) <= LADO_MAXIMO_IMAGEN
+                and _mb(origen) <= LIMITE_MEDIA_MB
+            )
+            # Los GIF animados se conservan: convertirlos los dejaría estáticos
+            if cumple or (animada and _mb(origen) <= LIMITE_MEDIA_MB):
+                destino = destino_base + extension
+                shutil.copyfile(origen, destino)
+                return destino, {'procesado': False, 'ancho': ancho, 'alto': alto}
+
+            imagen = ImageOps.exif_transpose(imagen)
+            imagen.thumbnail((LADO_MAXIMO_IMAGEN, LADO_MAXIMO_IMAGEN))
+            if imagen.mode not in ('RGB', 'L'):
+                fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+                imagen = imagen.convert('RGBA')
+                fondo.paste(imagen, mask=imagen.split()[-1])
+                imagen = fondo
+            destino = destino_base + '.jpg'
+            imagen.save(destino, 'JPEG', quality=CALIDAD_JPEG, optimize=True)
+            return destino, {'procesado': True, 'ancho': imagen.size[0], 'alto': imagen.size[1]}
+    except (OSError, Image.DecompressionBombError) as e:
+        # Incluye UnidentifiedImageError: archivo dañado o que no es una imagen
+        raise ErrorMedio(f'No se pudo leer la imagen: {e}')
+
+
+def _duracion_video(origen):
+    if not FFPROBE:
+        return None
+    try:
+        salida = subprocess.run(
+            [FFPROBE, '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', origen],
+            capture_output=True, text=True, timeout=60
+        )
+        return float(salida.stdout.strip())
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+
+
+def _preparar_video(origen, destino_base):
+    extension = os.path.splitext(origen)[1].lower()
+    duracion = _duracion_video(origen)
+    if extension in FORMATOS_ENVIABLES['video'] and _mb(origen) <= LIMITE_MEDIA_MB:
+        destino = destino_base + extension
+        shutil.copyfile(origen, destino)
+        return destino, {'procesado': False, 'duracion': duracion}
+
+    if not FFMPEG:
+        raise ErrorMedio(
+            f'Video no compatible con WhatsApp ({extension}, {_mb(origen):.1f}MB): usa .mp4/.3gp/.mov '
+            f'de hasta {LIMITE_MEDIA_MB}MB o instala ffmpeg para convertirlo'
+        )
+
+    # H.264 + AAC: tasa de bits calculada para quedar bajo el objetivo de tamaño
+    comando = [
+        FFMPEG, '-y', '-v', 'error', '-i', origen,
+        '-vf', f"scale='min({ANCHO_MAXIMO_VIDEO},iw)':-2",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-b:a', '96k', '-movflags', '+faststart'
+    ]
+    if duracion:
+        kbps_video = int(OBJETIVO_VIDEO_MB * 8 * 1024 / duracion) - 96
+        if kbps_video < 100:
+            raise ErrorMedio(f'Video demasiado largo ({duracion:.0f}s) para caber en {LIMITE_MEDIA_MB}MB')
+        comando += ['-b:v', f'{kbps_video}k', '-maxrate', f'{kbps_video}k', '-bufsize', f'{2 * kbps_video}k']
+    else:
+        comando += ['-crf', '28']
+
+    destino = destino_base + '.mp4'
+    try:
+        resultado = subprocess.run(
+            comando + [destino], capture_output=True, text=True, timeout=TIEMPO_MAXIMO_CONVERSION
+        )
+    except subprocess.TimeoutExpired:
+        raise ErrorMedio(
+            f'La conversión del video superó {TIEMPO_MAXIMO_CONVERSION:.0f}s; súbelo ya en .mp4 de hasta {LIMITE_MEDIA_MB}MB'
+        )
+    except OSError as e:
+        raise ErrorMedio(f'No se pudo ejecutar ffmpeg: {e}')
+    if resultado.returncode != 0 or not os.path.exists(destino):
+        raise ErrorMedio(f'ffmpeg no pudo convertir el video: {resultado.stderr.strip()[-200:]}')
+    if _mb(destino) > LIMITE_MEDIA_MB:
+        os.remove(destino)
+        raise ErrorMedio(f'El video convertido sigue superando {LIMITE_MEDIA_MB}MB')
+    return destino, {'procesado': True, 'duracion': duracion}
+
+
+def _preparar_documento(origen, destino_base):
+    if _mb(origen) > LIMITE_DOCUMENTO_MB:
+        raise ErrorMedio(f'Documento muy grande ({_mb(origen):.1f}MB). Máximo {LIMITE_DOCUMENTO_MB}MB')
+    destino = destino_base + os.path.splitext(origen)[1].lower()
+    shutil.copyfile(origen, destino)
+    return destino, {'procesado': False}
+
+
+CONVERSORES = {
+    'imagen': _preparar_imagen,
+    'video': _preparar_video,
+    'documento': _preparar_documento,
+}
+
+
+# ===== API =====
+
+def preparar_adjunto(origen, tipo_archivo, nombre_original=None, directorio=DIRECTORIO_MEDIOS):
+    """
+    Valida y convierte el archivo para WhatsApp y lo guarda en la caché por hash.
+    Retorna los metadatos (ruta, tipo, hash, tamaño...) o lanza ErrorMedio.
+    """
+    if tipo_archivo not in CONVERSORES:
+        raise ErrorMedio(f'Tipo de archivo desconocido: {tipo_archivo}')
+
+    hash_contenido = calcular_hash(origen)
+    metadatos = _leer_cache(hash_contenido, directorio)
+    if metadatos and metadatos['tipo'] == tipo_archivo:
+        logger.info(f"Adjunto ya procesado (caché): {metadatos['ruta']}")
+        return _registrar(metadatos)
+
+    os.makedirs(directorio, exist_ok=True)
+    # Se convierte con nombre temporal y se renombra al final: otra petición con el
+    # mismo archivo nunca ve un resultado a medio escribir
+    temporal = tempfile.mkdtemp(dir=directorio)
+    try:
+        ruta_temporal, extra = CONVERSORES[tipo_archivo](origen, os.path.join(temporal, hash_contenido))
+        ruta = os.path.join(directorio, os.path.basename(ruta_temporal))
+        os.replace(ruta_temporal, ruta)
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+    metadatos = {
+        'ruta': ruta,
+        'tipo': tipo_archivo,
+        'hash': hash_contenido,
+        'extension': os.path.splitext(ruta)[1].lower(),
+        'tamano_bytes': os.path.getsize(ruta),
+        'tamano_original_bytes': os.path.getsize(origen),
+        'nombre_original': nombre_original or os.path.basename(origen),
+        **extra
+    }
+    escribir_atomico(_ruta_metadatos(hash_contenido, directorio), serializar_json(metadatos))
+    logger.info(
+        f"Adjunto preparado: {ruta} ({metadatos['tamano_original_bytes']} → {metadatos['tamano_bytes']} bytes)"
+    )
+    return _registrar(metadatos)
+
+
+def obtener_preparado(ruta):
+    """Metadatos si la ruta es un adjunto ya preparado; None si no"""
+    clave = os.path.abspath(ruta)
+    with _lock:
+        metadatos = _preparados.get(clave)
+    if metadatos is not None:
+        return metadatos
+
+    # Preparado en una ejecución anterior: se reconoce por su .json
+    directorio, nombre = os.path.split(clave)
+    metadatos = _leer_cache(os.path.splitext(nombre)[0], directorio)
+    if metadatos and os.path.abspath(metadatos['ruta']) == clave:
+        return _registrar(metadatos)
+    return None
+
+
+def eliminar_preparado(ruta):
+    """Borra el adjunto procesado y sus metadatos"""
+    clave = os.path.abspath(ruta)
+    with _lock:
+        _preparados.pop(clave, None)
+    base = os.path.splitext(clave)[0]
+    for archivo in (clave, base + '.json'):
+        if os.path.exists(archivo):
+            os.remove(archivo)
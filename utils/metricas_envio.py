@@ -0,0 +1,91 @@
+"""
+Tiempos por fase de cada envío (abrir chat, caja de texto, escritura, adjuntar...)
+
+ServicioWhatsApp.enviar_mensaje mide cada paso en tiempos_ultimo_envio y
+enviar_entrada los registra aquí junto con la campaña. Se guardan las últimas
+MUESTRAS_MAXIMAS muestras por campaña y en total, y el resumen da p50/p95/p99
+de cada fase para ver dónde se va el tiempo del envío.
+"""
+from collections import deque
+import math
+import os
+import threading
+
+MUESTRAS_MAXIMAS = int(os.environ.get('MUESTRAS_TIEMPOS_MAXIMAS') or 2000)
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentil(valores_ordenados, p):
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not valores_ordenados:
+        return None
+    indice = max(0, math.ceil(p / 100 * len(valores_ordenados)) - 1)
+    return valores_ordenados[indice]
+
+
+def resumir(muestras):
+    """Cantidad, media, percentiles y máximo de cada fase"""
+    por_fase = {}
+    for muestra in muestras:
+        for fase, segundos in muestra['tiempos'].items():
+            por_fase.setdefault(fase, []).append(segundos)
+
+    fases = {}
+    for fase, valores in por_fase.items():
+        valores.sort()
+        fases[fase] = {
+            'n': len(valores),
+            'media': round(sum(valores) / len(valores), 3),
+            **{f'p{p}': percentil(valores, p) for p in PERCENTILES},
+            'max': valores[-1]
+        }
+
+    exitos = sum(1 for m in muestras if m['exito'])
+    return {
+        'mensajes': len(muestras),
+        'exitosos': exitos,
+        'fallidos': len(muestras) - exitos,
+        'fases': fases
+    }
+
+
+class MetricasEnvio:
+    """Muestras de tiempos por campaña y globales"""
+
+    def __init__(self, maximo=MUESTRAS_MAXIMAS):
+        self._maximo = maximo
+        self._global = deque(maxlen=maximo)
+        self._campanas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, campana_id, tiempos, exito):
+        if not tiempos:
+            return
+        muestra = {'tiempos': dict(tiempos), 'exito': bool(exito)}
+        with self._lock:
+            self._global.append(muestra)
+            if campana_id is not None:
+                if campana_id not in self._campanas:
+                    self._campanas[campana_id] = deque(maxlen=self._maximo)
+                self._campanas[campana_id].append(muestra)
+
+    def resumen(self, campana_id=None):
+        """Resumen de la campaña, o de todos los envíos si campana_id es None"""
+        with self._lock:
+            if campana_id is None:
+                muestras = list(self._global)
+            else:
+                muestras = list(self._campanas.get(campana_id, ()))
+        return resumir(muestras)
+
+    def campanas(self):
+        with self._lock:
+            return list(self._campanas)
+
+    def olvidar(self, campana_id):
+        with self._lock:
+            self._campanas.pop(campana_id, None)
+
+
+metricas_envio = MetricasEnvio()
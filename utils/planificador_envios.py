@@ -0,0 +1,441 @@
+"""
+Planificador central de envíos de campañas
+
+Cada sesión de WhatsApp conectada (ver utils/pool_sesiones.py) tiene un único
+hilo trabajador, dueño de su navegador: toma de su cola de prioridad la campaña
+que toca, le envía un mensaje al siguiente destinatario pendiente de la
+BandejaSalida y la vuelve a encolar. El ritmo (utils/ritmo_envio.py) es uno
+por número, compartido por sus campañas: cada envío reserva el número durante
+el espaciado de la campaña que envió, y el freno por fallos o avisos de límite
+frena a todas. Con varias sesiones los destinatarios de una campaña se reparten
+entre todas.
+"""
+from collections import deque
+from datetime import datetime
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from utils.ritmo_envio import RitmoEnvio, espaciado_de, por_hora
+
+logger = logging.getLogger(__name__)
+
+# Espera máxima de un trabajador entre revisiones de pausas, detenciones y sesiones
+ESPERA_MAXIMA = 1.0
+
+# Espera máxima (segundos) a que una sesión que se cierra termine su envío en curso
+ESPERA_RETIRO_SESION = 120
+
+
+def _sesiones_del_pool():
+    from utils.pool_sesiones import pool_sesiones
+    return pool_sesiones.activas()
+
+
+class TrabajoCampana:
+    """Campaña programada en el planificador"""
+
+    def __init__(self, campana_id, bandeja, mensaje, intervalo=5, archivo_path=None, tipo_archivo=None,
+                 prioridad=0, inicio=None, control=None, al_progresar=None, al_terminar=None,
+                 mensajes_por_hora=None, reenviar_adjunto=False):
+        self.campana_id = campana_id
+        self.bandeja = bandeja
+        self.mensaje = mensaje
+        self.intervalo = max(float(intervalo or 0), 0)
+        self.mensajes_por_hora = mensajes_por_hora
+        # Segundos que cada envío de la campaña reserva el número que lo hizo
+        self.espaciado = espaciado_de(self.intervalo, mensajes_por_hora)
+        self.archivo_path = archivo_path
+        self.tipo_archivo = tipo_archivo
+        self.reenviar_adjunto = reenviar_adjunto
+        self.prioridad = prioridad
+        self.control = control
+        self.al_progresar = al_progresar
+        self.al_terminar = al_terminar
+
+        # Hora (time.time) desde la que la campaña puede enviar
+        self.inicio = inicio.timestamp() if isinstance(inicio, datetime) else (inicio or time.time())
+
+        # Mensajes que se están enviando ahora mismo (uno por sesión como máximo)
+        self.en_vuelo = 0
+        self.terminado = False
+
+        # Hora de cada envío de la última hora (para el ritmo efectivo)
+        self.envios = deque()
+
+        resumen = bandeja.resumen()
+        self.total = resumen['total']
+        self.resultados = {
+            'enviados': resumen['enviado'],
+            'fallidos': resumen['fallido'],
+            'errores': [],
+            'detenido': False
+        }
+
+    @property
+    def procesados(self):
+        return self.resultados['enviados'] + self.resultados['fallidos']
+
+    @property
+    def detenido(self):
+        return self.resultados['detenido'] or bool(self.control and self.control.detenido)
+
+    def ritmo_efectivo(self):
+        """Mensajes por hora enviados sumando todas las sesiones"""
+        return por_hora(self.envios)
+
+    def to_dict(self):
+        return {
+            'campana_id': self.campana_id,
+            'prioridad': self.prioridad,
+            'intervalo': self.intervalo,
+            'mensajes_por_hora': self.mensajes_por_hora,
+            'ritmo_efectivo': self.ritmo_efectivo(),
+            'inicio': datetime.fromtimestamp(self.inicio).isoformat(),
+            'total': self.total,
+            'procesados': self.procesados,
+            'en_vuelo': self.en_vuelo,
+            'pausado': bool(self.control and self.control.pausado)
+        }
+
+
+class _ColaSesion:
+    """Colas de una sesión; el ritmo del número lo comparten sus campañas"""
+
+    def __init__(self, servicio):
+        self.servicio = servicio
+        self.esperando = []  # heap (siguiente_envio, secuencia, trabajo)
+        self.listas = []  # heap (-prioridad, listo_desde, secuencia, trabajo)
+        self.pausados = []
+        self.en_curso = None
+        self.hilo = None
+        # La sesión se va a cerrar: el trabajador termina su envío y se retira
+        self.retirar = False
+
+
+class PlanificadorEnvios:
+    """
+    Cola de prioridad de campañas sobre las sesiones de WhatsApp conectadas.
+
+    - En cada sesión, las campañas a las que ya les toca pasan a la cola de
+      listas, ordenada por prioridad (mayor primero) y, a igual prioridad, por
+      orden de llegada, lo que las intercala por turnos.
+    - Cada número tiene un solo ritmo: tras un envío queda reservado durante
+      el espaciado (intervalo o mensajes por hora) de la campaña que envió, así
+      que sus campañas se reparten un mismo presupuesto y un mismo freno. El
+      total crece con la cantidad de números conectados.
+    - Una hora de inicio futura deja la campaña en espera hasta entonces.
+    """
+
+    def __init__(self, sesiones=None):
+        self._sesiones = sesiones or _sesiones_del_pool
+        self._condicion = threading.Condition()
+        self._colas = {}
+        self._trabajos = {}
+        # Ritmo por número (sobrevive a reconexiones de la sesión)
+        self._ritmos = {}
+        self._secuencia = itertools.count()
+
+    # ===== API =====
+
+    def programar(self, campana_id, bandeja, mensaje, **opciones):
+        """Encola una campaña; opciones de TrabajoCampana (intervalo, prioridad, inicio, control...)"""
+        trabajo = TrabajoCampana(campana_id, bandeja, mensaje, **opciones)
+        with self._condicion:
+            if campana_id in self._trabajos:
+                raise ValueError(f'La campaña {campana_id} ya está programada')
+            self._trabajos[campana_id] = trabajo
+            for cola in self._colas.values():
+                self._encolar(cola, trabajo, trabajo.inicio)
+            self._condicion.notify_all()
+
+        self.actualizar_sesiones()
+
+        logger.info(
+            f"Campaña {campana_id} programada (prioridad {trabajo.prioridad}, "
+            f"{trabajo.total - trabajo.procesados} pendientes)"
+        )
+        return trabajo
+
+    def actualizar_sesiones(self):
+        """Arranca un trabajador por cada sesión conectada que aún no lo tenga"""
+        sesiones = self._sesiones()
+        with self._condicion:
+            if not self._trabajos:
+                return
+            for servicio in sesiones:
+                # Se revisa con el lock tomado: una sesión retirada ya no está sana
+                if id(servicio) in self._colas or not self._sesion_sana(servicio):
+                    continue
+                cola = _ColaSesion(servicio)
+                for trabajo in self._trabajos.values():
+                    if not trabajo.terminado:
+                        self._encolar(cola, trabajo, trabajo.inicio)
+                cola.hilo = threading.Thread(
+                    target=self._ejecutar, args=(cola,), name='planificador-envios', daemon=True
+                )
+                self._colas[id(servicio)] = cola
+                cola.hilo.start()
+
+    def tiene_trabajador(self, servicio):
+        """Indica si la sesión tiene un trabajador enviando (dueño de su navegador)"""
+        with self._condicion:
+            return id(servicio) in self._colas
+
+    def retirar_sesion(self, servicio, timeout=ESPERA_RETIRO_SESION):
+        """
+        Antes de cerrar el navegador de una sesión: su trabajador termina el envío en
+        curso y se retira, y la sesión queda desconectada para el planificador. Los
+        destinatarios que no alcanzó siguen pendientes. False si se agotó el tiempo.
+        """
+        with self._condicion:
+            cola = self._colas.get(id(servicio))
+            if cola is None or cola.hilo is threading.current_thread():
+                servicio.is_connected = False
+                return True
+            cola.retirar = True
+            self._condicion.notify_all()
+            return self._condicion.wait_for(lambda: self._colas.get(id(servicio)) is not cola, timeout)
+
+    def esta_programada(self, campana_id):
+        with self._condicion:
+            return campana_id in self._trabajos
+
+    def bandeja(self, campana_id):
+        """Bandeja de salida de la campaña en curso (la única que escribe su diario); None si no está"""
+        with self._condicion:
+            trabajo = self._trabajos.get(campana_id)
+            return trabajo.bandeja if trabajo else None
+
+    def esperar_fin(self, campana_id, timeout=None):
+        """Espera a que la campaña salga del planificador; False si se agotó el tiempo"""
+        self.despertar()
+        with self._condicion:
+            return self._condicion.wait_for(lambda: campana_id not in self._trabajos, timeout)
+
+    def despertar(self):
+        """Revisar de inmediato pausas y detenciones"""
+        detenidos = []
+        with self._condicion:
+            if not self._colas:
+                # Sin sesiones no hay trabajador que las retire: se cierran aquí
+                for trabajo in self._trabajos.values():
+                    if trabajo.detenido and not trabajo.terminado:
+                        trabajo.resultados['detenido'] = True
+                        trabajo.terminado = True
+                        detenidos.append(trabajo)
+            self._condicion.notify_all()
+
+        for trabajo in detenidos:
+            self._terminar(trabajo)
+
+    def estado(self):
+        """Campañas en cola y lo que envía cada sesión"""
+        with self._condicion:
+            return {
+                'sesiones': [
+                    {
+                        'numero': cola.servicio.numero_conectado,
+                        'en_curso': cola.en_curso,
+                        'ritmo': self._ritmo(cola.servicio).estado()
+                    }
+                    for cola in self._colas.values()
+                ],
+                'campanas': [t.to_dict() for t in self._trabajos.values()]
+            }
+
+    # ===== Trabajadores =====
+
+    def _encolar(self, cola, trabajo, cuando):
+        heapq.heappush(cola.esperando, (cuando, next(self._secuencia), trabajo))
+
+    def _ritmo(self, servicio):
+        """Ritmo del número de la sesión (se llama con self._condicion tomado)"""
+        clave = servicio.numero_conectado or id(servicio)
+        if clave not in self._ritmos:
+            self._ritmos[clave] = RitmoEnvio(intervalo=0)
+        return self._ritmos[clave]
+
+    @staticmethod
+    def _sesion_sana(servicio):
+        return bool(servicio.driver) and servicio.is_connected
+
+    def _siguiente(self, cola):
+        """
+        Espera el siguiente envío de la sesión. Retorna (cerrar, trabajo, entrada):
+        las campañas que esta sesión debe cerrar y el destinatario reclamado (o
+        None); None si la sesión ya no tiene trabajo o se desconectó.
+        """
+        with self._condicion:
+            while True:
+                if cola.retirar or not self._trabajos or not self._sesion_sana(cola.servicio):
+                    # El trabajador termina; actualizar_sesiones() arranca otro cuando haga falta
+                    if cola.retirar:
+                        cola.servicio.is_connected = False
+                    self._colas.pop(id(cola.servicio), None)
+                    self._condicion.notify_all()
+                    return None
+
+                ahora = time.time()
+                while cola.esperando and cola.esperando[0][0] <= ahora:
+                    cuando, secuencia, trabajo = heapq.heappop(cola.esperando)
+                    heapq.heappush(cola.listas, (-trabajo.prioridad, cuando, secuencia, trabajo))
+
+                for trabajo in [t for t in cola.pausados if not t.control.pausado]:
+                    cola.pausados.remove(trabajo)
+                    heapq.heappush(cola.listas, (-trabajo.prioridad, ahora, next(self._secuencia), trabajo))
+
+                # Las terminadas o detenidas salen aunque no les haya llegado el turno
+                cerrar = self._retirar_detenidos(cola)
+                if cerrar:
+                    return cerrar, None, None
+
+                # El número sigue reservado por su último envío
+                libre_desde = self._ritmo(cola.servicio).libre_desde
+                if libre_desde > ahora:
+                    self._condicion.wait(min(ESPERA_MAXIMA, libre_desde - ahora))
+                    continue
+
+                while cola.listas:
+                    _, _, _, trabajo = heapq.heappop(cola.listas)
+                    if trabajo.control and trabajo.control.pausado:
+                        cola.pausados.append(trabajo)
+                        continue
+
+                    entrada = trabajo.bandeja.reclamar_siguiente()
+                    if entrada is None:
+                        # Sin pendientes: la cierra esta sesión o la que tenga un envío en curso
+                        if trabajo.en_vuelo == 0:
+                            trabajo.terminado = True
+                            return [trabajo], None, None
+                        continue
+
+                    trabajo.en_vuelo += 1
+                    return [], trabajo, entrada
+
+                espera = ESPERA_MAXIMA
+                if cola.esperando:
+                    espera = min(espera, max(cola.esperando[0][0] - ahora, 0))
+                self._condicion.wait(espera)
+
+    def _retirar_detenidos(self, cola):
+        """Quita de la sesión las campañas terminadas o detenidas; retorna las que hay que cerrar"""
+        cerrar = []
+        for heap in (cola.esperando, cola.listas):
+            retirados = [item for item in heap if item[-1].terminado or item[-1].detenido]
+            if not retirados:
+                continue
+            heap[:] = [item for item in heap if item not in retirados]
+            heapq.heapify(heap)
+            for *_, trabajo in retirados:
+                # Si otra sesión tiene un envío en curso, la cierra ella al terminarlo
+                if not trabajo.terminado and trabajo.en_vuelo == 0:
+                    trabajo.resultados['detenido'] = True
+                    trabajo.terminado = True
+                    cerrar.append(trabajo)
+        return cerrar
+
+    def _ejecutar(self, cola):
+        while True:
+            siguiente = self._siguiente(cola)
+            if siguiente is None:
+                return
+
+            cerrar, trabajo, entrada = siguiente
+            for terminado in cerrar:
+                self._terminar(terminado)
+            if entrada is None:
+                continue
+
+            cola.en_curso = trabajo.campana_id
+            try:
+                self._enviar(cola.servicio, trabajo, entrada)
+            finally:
+                cola.en_curso = None
+
+            with self._condicion:
+                trabajo.en_vuelo -= 1
+                fin = (
+                    not trabajo.terminado and trabajo.en_vuelo == 0
+                    and (trabajo.detenido or not trabajo.bandeja.hay_pendientes())
+                )
+                if fin:
+                    trabajo.resultados['detenido'] = trabajo.detenido
+                    trabajo.terminado = True
+                elif not trabajo.terminado:
+                    # Lista de inmediato: el espaciado lo impone el ritmo del número
+                    self._encolar(cola, trabajo, time.time())
+
+            if fin:
+                self._terminar(trabajo)
+
+    def _enviar(self, servicio, trabajo, entrada):
+        """Envía al destinatario y reserva el número según el espaciado de la campaña"""
+        inicio = time.time()
+        logger.info(
+            f" [{servicio.numero_conectado}] [{trabajo.campana_id}] "
+            f"{entrada['nombre']} ({entrada['telefono']})..."
+        )
+        try:
+            exito, error = servicio.enviar_entrada(
+                trabajo.bandeja, entrada, trabajo.mensaje, trabajo.archivo_path, trabajo.tipo_archivo,
+                trabajo.reenviar_adjunto
+            )
+        except Exception as e:
+            # enviar_entrada ya captura los errores del navegador; esto protege al resto de campañas
+            logger.error(f"Error enviando campaña {trabajo.campana_id}: {e}")
+            trabajo.bandeja.marcar_fallido(entrada['contacto_id'], str(e))
+            exito, error = False, f"{entrada['nombre']}: {e}"
+
+        limitado = False
+        if not exito:
+            # Si la sesión se cerró desde el celular, su trabajador se retira y las demás siguen
+            try:
+                servicio.verificar_sesion_activa_real()
+                limitado = servicio.detectar_limitacion()
+            except Exception:
+                servicio.is_connected = False
+
+        with self._condicion:
+            if exito:
+                trabajo.resultados['enviados'] += 1
+            else:
+                trabajo.resultados['fallidos'] += 1
+                trabajo.resultados['errores'].append(error)
+            self._ritmo(servicio).siguiente(inicio, exito, limitado, trabajo.espaciado)
+            trabajo.envios.append(time.time())
+            progreso = {
+                'actual': trabajo.procesados,
+                'total': trabajo.total,
+                'enviados': trabajo.resultados['enviados'],
+                'fallidos': trabajo.resultados['fallidos'],
+                'mensajes_por_hora': trabajo.ritmo_efectivo()
+            }
+
+        self._avisar(trabajo.al_progresar, trabajo, progreso)
+
+    def _terminar(self, trabajo):
+        trabajo.bandeja.cerrar()
+        with self._condicion:
+            self._trabajos.pop(trabajo.campana_id, None)
+            self._condicion.notify_all()
+
+        logger.info(
+            f"Campaña {trabajo.campana_id} {'detenida' if trabajo.resultados['detenido'] else 'terminada'}: "
+            f"{trabajo.resultados['enviados']} enviados, {trabajo.resultados['fallidos']} fallidos"
+        )
+        self._avisar(trabajo.al_terminar, trabajo, trabajo.resultados)
+
+    @staticmethod
+    def _avisar(funcion, trabajo, datos):
+        if not funcion:
+            return
+        try:
+            funcion(datos)
+        except Exception as e:
+            logger.error(f"Error en callback de la campaña {trabajo.campana_id}: {e}")
+
+
+planificador_envios = PlanificadorEnvios()
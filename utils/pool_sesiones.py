@@ -0,0 +1,137 @@
+"""
+Pool de sesiones de WhatsApp (una por número conectado)
+
+La sesión principal es la instancia global servicio_whatsapp que usa la
+pantalla de configuración; el pool agrega más números, cada uno con su propio
+navegador, perfil (data/browser_profile/<numero>) y archivo de cookies. El
+planificador de envíos reparte los destinatarios entre las sesiones activas.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PoolSesiones:
+    """Sesiones de envío adicionales, identificadas por número"""
+
+    def __init__(self):
+        self._sesiones = {}
+        self._lock = threading.Lock()
+        self._locks_numero = {}
+
+    @staticmethod
+    def _principal():
+        from utils.servicio_whatsapp import servicio_whatsapp
+        return servicio_whatsapp
+
+    def sesiones(self):
+        """Sesión principal más las adicionales"""
+        principal = self._principal()
+        with self._lock:
+            adicionales = [s for s in self._sesiones.values() if s is not principal]
+        return [principal] + adicionales
+
+    def activas(self):
+        """Sesiones con navegador abierto y conectadas"""
+        return [s for s in self.sesiones() if s.driver and s.is_connected]
+
+    def obtener(self, numero):
+        principal = self._principal()
+        if principal.numero_conectado == numero:
+            return principal
+        with self._lock:
+            return self._sesiones.get(numero)
+
+    def _lock_numero(self, numero):
+        """Serializa conectar y reanudar del mismo número"""
+        with self._lock:
+            return self._locks_numero.setdefault(numero, threading.Lock())
+
+    def conectar(self, numero):
+        """Abre un navegador para el número y espera el escaneo del QR (bloqueante)"""
+        from utils.servicio_whatsapp import ServicioWhatsApp
+        from utils.planificador_envios import planificador_envios
+
+        with self._lock_numero(numero):
+            sesion = self.obtener(numero)
+            if sesion and sesion.driver and sesion.is_connected:
+                return True, f'El número {numero} ya está conectado'
+
+            sesion = ServicioWhatsApp()
+            exito, mensaje = sesion.conectar(numero)
+            if not exito:
+                return False, mensaje
+
+            with self._lock:
+                self._sesiones[numero] = sesion
+
+        # Las campañas en curso empiezan a usar la nueva sesión
+        planificador_envios.actualizar_sesiones()
+        logger.info(f"Sesión agregada al pool: {numero}")
+        return True, mensaje
+
+    def desconectar(self, numero):
+        """Cierra la sesión adicional del número; False si no existe"""
+        with self._lock:
+            sesion = self._sesiones.pop(numero, None)
+        if not sesion:
+            return False
+        sesion.cerrar_sesion_whatsapp()
+        logger.info(f"Sesión quitada del pool: {numero}")
+        return True
+
+    def reanudar(self):
+        """
+        Tras un reinicio de la app, vuelve a tomar los navegadores separados que siguen
+        abiertos (NAVEGADOR_SEPARADO) con su sesión activa. Retorna los números reanudados.
+        """
+        from utils.servicio_whatsapp import NAVEGADOR_SEPARADO, ServicioWhatsApp
+        from utils.planificador_envios import planificador_envios
+        from models.configuracion import configuracion_global
+
+        if not NAVEGADOR_SEPARADO:
+            return []
+
+        principal = self._principal()
+        info = configuracion_global.obtener_info_sesion_whatsapp()
+        numero_principal = info['numero'] if info['conectado'] else None
+
+        reanudados = []
+        for numero in principal.navegadores_separados():
+            # Un navegador colgado o cerrado no impide reanudar los demás números
+            try:
+                with self._lock_numero(numero):
+                    existente = self.obtener(numero)
+                    if existente and existente.driver and existente.is_connected:
+                        continue
+                    sesion = principal if numero == numero_principal else ServicioWhatsApp()
+                    if not sesion.reanudar_sesion(numero):
+                        continue
+                    if sesion is not principal:
+                        with self._lock:
+                            self._sesiones[numero] = sesion
+                reanudados.append(numero)
+            except Exception as e:
+                logger.error(f"Error reanudando la sesión de {numero}: {e}")
+
+        if reanudados:
+            logger.info(f"Sesiones reanudadas sin recargar: {', '.join(reanudados)}")
+            planificador_envios.actualizar_sesiones()
+        return reanudados
+
+    def estado(self):
+        """Número, navegador y conexión de cada sesión"""
+        return [
+            {
+                'numero': s.numero_conectado,
+                'navegador': s.browser_name,
+                'conectado': bool(s.driver and s.is_connected),
+                'principal': s is self._principal()
+            }
+            for s in self.sesiones()
+            if s.numero_conectado
+        ]
+
+
+pool_sesiones = PoolSesiones()
@@ -0,0 +1,117 @@
+"""
+Ritmo de envío de un número de WhatsApp
+
+En vez de dormir el intervalo después de cada mensaje (intervalo + lo que tardó
+el envío), el ritmo fija la hora del siguiente envío contando desde el inicio
+del anterior, según un presupuesto de mensajes por hora (o el intervalo de la
+campaña). El planificador mantiene un ritmo por número, compartido por todas
+las campañas que envían desde él: cada envío consume el espaciado de su campaña
+y el freno por fallos o avisos de límite afecta a todas. Agrega una variación aleatoria para no enviar a compás fijo, frena
+(duplica el espaciado) tras varios fallos seguidos o de golpe si WhatsApp
+muestra un aviso de límite, y vuelve al ritmo normal a medida que hay éxitos.
+"""
+from collections import deque
+import os
+import random
+import threading
+import time
+
+# Variación aleatoria del espaciado (0.2 = ±20 %)
+VARIACION = float(os.environ.get('RITMO_VARIACION') or 0.2)
+
+# Fallos seguidos tras los que se duplica el espaciado, y multiplicador máximo
+FALLOS_PARA_FRENAR = int(os.environ.get('RITMO_FALLOS_PARA_FRENAR') or 3)
+FRENO_MAXIMO = float(os.environ.get('RITMO_FRENO_MAXIMO') or 8)
+
+# Espaciado mínimo (segundos) mientras se está frenando, aunque la campaña no tenga intervalo
+ESPACIADO_MINIMO_FRENADO = 5.0
+
+# Ventana (segundos) para calcular el ritmo efectivo
+VENTANA_EFECTIVA = 3600
+
+
+def espaciado_de(intervalo=5, mensajes_por_hora=None):
+    """Segundos entre mensajes según el presupuesto por hora o, si no hay, el intervalo"""
+    if mensajes_por_hora and float(mensajes_por_hora) > 0:
+        return 3600 / float(mensajes_por_hora)
+    return max(float(intervalo or 0), 0)
+
+
+def por_hora(envios):
+    """
+    Mensajes por hora según la separación real entre los envíos (deque de
+    time.time) de la última hora; descarta de envios los más antiguos.
+    """
+    ahora = time.time()
+    while envios and envios[0] < ahora - VENTANA_EFECTIVA:
+        envios.popleft()
+    if len(envios) < 2:
+        return 0.0
+    ventana = envios[-1] - envios[0]
+    if ventana <= 0:
+        return 0.0
+    return round((len(envios) - 1) / ventana * 3600, 1)
+
+
+class RitmoEnvio:
+    """Espaciado entre los mensajes de un número"""
+
+    def __init__(self, intervalo=5, mensajes_por_hora=None, variacion=VARIACION):
+        self.espaciado = espaciado_de(intervalo, mensajes_por_hora)
+        self.variacion = variacion
+        self.freno = 1.0
+        self.fallos_seguidos = 0
+        self.limitado = False
+        # Hora (time.time) desde la que el número puede volver a enviar
+        self.libre_desde = 0.0
+        self._envios = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def objetivo_por_hora(self):
+        return round(3600 / self.espaciado, 1) if self.espaciado else None
+
+    def siguiente(self, inicio_envio, exito, limitado=False, espaciado=None):
+        """
+        Registra el envío que empezó en inicio_envio (time.time) y retorna la hora
+        desde la que se puede enviar el siguiente. espaciado reemplaza el propio
+        del ritmo (el de la campaña que envió).
+        """
+        ahora = time.time()
+        with self._lock:
+            self._envios.append(ahora)
+            self.limitado = limitado
+
+            if limitado:
+                self.fallos_seguidos += 1
+                self.freno = FRENO_MAXIMO
+            elif exito:
+                self.fallos_seguidos = 0
+                self.freno = max(1.0, self.freno / 2)
+            else:
+                self.fallos_seguidos += 1
+                if self.fallos_seguidos >= FALLOS_PARA_FRENAR:
+                    self.freno = min(self.freno * 2, FRENO_MAXIMO)
+
+            if espaciado is None:
+                espaciado = self.espaciado
+            if self.freno > 1:
+                espaciado = max(espaciado, ESPACIADO_MINIMO_FRENADO) * self.freno
+            espaciado *= 1 + random.uniform(-self.variacion, self.variacion)
+
+            self.libre_desde = max(inicio_envio + espaciado, ahora)
+            return self.libre_desde
+
+    def efectivo_por_hora(self):
+        """Mensajes por hora según la separación real entre los envíos de la última hora"""
+        with self._lock:
+            return por_hora(self._envios)
+
+    def estado(self):
+        return {
+            'objetivo_por_hora': self.objetivo_por_hora,
+            'efectivo_por_hora': self.efectivo_por_hora(),
+            'freno': self.freno,
+            'fallos_seguidos': self.fallos_seguidos,
+            'limitado': self.limitado
+        }
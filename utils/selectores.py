@@ -0,0 +1,149 @@
+"""
+Registro de selectores de WhatsApp Web
+
+Cada elemento del envío (caja de texto, botón adjuntar, botón enviar) tiene
+varias variantes de XPath según la versión de WhatsApp Web. El registro
+recuerda la variante que funcionó, la prueba primero en los siguientes
+mensajes y solo vuelve a probar las demás cuando falla.
+"""
+import threading
+
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+SELECTORES = {
+    'caja_texto': [
+        '//footer//div[@contenteditable="true"][@data-tab="10"]',
+        '//div[@id="main"]//footer//div[@contenteditable="true"][@role="textbox"]',
+        '//div[@id="main"]//div[@contenteditable="true"][@data-tab="10"]',
+        '//footer//div[contains(@class, "copyable-text")][@contenteditable="true"]',
+    ],
+    'adjuntar': [
+        '//div[@title="Adjuntar"]',
+        '//div[@aria-label="Adjuntar"]',
+        '//span[@data-icon="plus"]/..',
+        '//span[@data-icon="attach-menu-plus"]/..',
+        '//span[@data-icon="clip"]/..',
+        '//button[@aria-label="Adjuntar"]',
+    ],
+    'enviar': [
+        '//span[@data-icon="send"]',
+        '//span[@data-icon="send"]/parent::button',
+        '//button[@aria-label="Enviar"]',
+        '//div[@aria-label="Enviar"]',
+    ],
+    # Reenvío de un mensaje ya enviado (reutilización de adjuntos)
+    'menu_mensaje': [
+        '//div[@id="main"]//span[@data-icon="down-context"]/..',
+        '//div[@id="main"]//span[@data-icon="ic-chevron-down-menu"]/..',
+        '//div[@id="main"]//div[@aria-label="Menú contextual"]',
+        '//div[@id="main"]//div[@aria-label="Context menu"]',
+    ],
+    'opcion_reenviar': [
+        '//li[@data-testid="mi-msg-forward"]',
+        '//div[@role="application"]//li//div[text()="Reenviar"]',
+        '//div[@role="application"]//li//div[text()="Forward"]',
+        '//div[@aria-label="Reenviar"]',
+    ],
+    'boton_reenviar': [
+        '//footer//span[@data-icon="forward"]/..',
+        '//button[@aria-label="Reenviar"]',
+        '//div[@aria-label="Reenviar"][@role="button"]',
+        '//button[@aria-label="Forward"]',
+    ],
+    'buscar_reenvio': [
+        '//div[@role="dialog"]//div[@contenteditable="true"]',
+        '//div[@role="dialog"]//input[@type="text"]',
+    ],
+    'resultado_reenvio': [
+        '//div[@role="dialog"]//div[@role="listitem"]//div[@role="checkbox"]',
+        '//div[@role="dialog"]//div[@role="listitem"]',
+        '//div[@role="dialog"]//div[@role="button"][.//span[@title]]',
+    ],
+    'enviar_reenvio': [
+        '//div[@role="dialog"]//span[@data-icon="send"]/..',
+        '//div[@role="dialog"]//div[@aria-label="Enviar"]',
+        '//div[@role="dialog"]//button[@aria-label="Send"]',
+    ],
+}
+
+
+class RegistroSelectores:
+    """Variante preferida de cada grupo de selectores, con contadores de aciertos y fallos"""
+
+    def __init__(self, selectores=None):
+        self._selectores = {grupo: list(variantes) for grupo, variantes in (selectores or SELECTORES).items()}
+        self._preferidos = {}
+        self._contadores = {
+            grupo: {'aciertos': 0, 'fallos': 0, 'no_encontrado': 0, 'por_selector': {}}
+            for grupo in self._selectores
+        }
+        self._lock = threading.Lock()
+
+    def ordenados(self, grupo):
+        """Variantes del grupo con la preferida primero"""
+        with self._lock:
+            variantes = self._selectores[grupo]
+            preferido = self._preferidos.get(grupo)
+        if preferido is None:
+            return list(variantes)
+        return [preferido] + [v for v in variantes if v != preferido]
+
+    def registrar(self, grupo, selector):
+        """Anota qué variante encontró el elemento (None si ninguna)"""
+        with self._lock:
+            contadores = self._contadores[grupo]
+            if selector is None:
+                contadores['no_encontrado'] += 1
+                return
+            if self._preferidos.get(grupo) == selector:
+                contadores['aciertos'] += 1
+            else:
+                contadores['fallos'] += 1
+                self._preferidos[grupo] = selector
+            contadores['por_selector'][selector] = contadores['por_selector'].get(selector, 0) + 1
+
+    def buscar(self, driver, grupo, espera, filtro=None):
+        """
+        Espera hasta espera segundos un elemento visible y habilitado de cualquier
+        variante del grupo, probando primero la preferida. Retorna el elemento o None.
+        """
+        variantes = self.ordenados(grupo)
+
+        def encontrar(driver):
+            for selector in variantes:
+                for elemento in driver.find_elements(By.XPATH, selector):
+                    try:
+                        if elemento.is_displayed() and elemento.is_enabled() and (filtro is None or filtro(elemento)):
+                            return selector, elemento
+                    except StaleElementReferenceException:
+                        continue
+            return False
+
+        try:
+            selector, elemento = WebDriverWait(driver, espera, poll_frequency=0.1).until(encontrar)
+        except TimeoutException:
+            self.registrar(grupo, None)
+            return None
+
+        self.registrar(grupo, selector)
+        return elemento
+
+    def estadisticas(self):
+        """Preferido y contadores de cada grupo"""
+        with self._lock:
+            return {
+                grupo: {
+                    'preferido': self._preferidos.get(grupo),
+                    'aciertos': contadores['aciertos'],
+                    'fallos': contadores['fallos'],
+                    'no_encontrado': contadores['no_encontrado'],
+                    'por_selector': dict(contadores['por_selector'])
+                }
+                for grupo, contadores in self._contadores.items()
+            }
+
+
+# Compartido por todas las sesiones: todas usan la misma versión de WhatsApp Web
+registro_selectores = RegistroSelectores()
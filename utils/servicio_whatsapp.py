@@ -17,6 +17,7 @@ from ctypes import windll
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options as ChromeOptions
@@ -24,13 +25,171 @@ from selenium.webdriver.edge.options import Options as EdgeOptions
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.edge.service import Service as EdgeService
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, TimeoutException
 from datetime import datetime
 import glob
+import json
+import socket
+import subprocess
 import threading
+import urllib.request
+from utils.selectores import registro_selectores
+from utils.medios import obtener_preparado
+from utils.metricas_envio import metricas_envio
+from utils.ritmo_envio import RitmoEnvio
+from utils.escritura_atomica import escribir_json_atomico
 
 logger = logging.getLogger(__name__)
 
+# Dirección de WhatsApp Web; se cambia para medir el envío contra una copia local
+# (test/whatsapp_falso, ver test/benchmark_envio.py)
+URL_WHATSAPP_WEB = (os.environ.get('URL_WHATSAPP_WEB') or 'https://web.whatsapp.com').rstrip('/')
+HOST_WHATSAPP_WEB = URL_WHATSAPP_WEB.split('://', 1)[-1]
+
+# Navegador 'ligero': sin ventana si el número ya está vinculado (el QR necesita ventana), sin
+# descargar avatares, fuentes ni medios salvo durante la subida de un adjunto, ventana fija
+# y memoria del renderer acotada. 'normal' abre la ventana maximizada como siempre
+MODO_NAVEGADOR = os.environ.get('MODO_NAVEGADOR', 'normal').lower()
+VENTANA_LIGERA = os.environ.get('VENTANA_NAVEGADOR_LIGERO') or '1024,768'
+MEMORIA_RENDERER_MB = int(os.environ.get('MEMORIA_RENDERER_MB') or 512)
+RECURSOS_MEDIOS = [
+    '*://mmg.whatsapp.net/*',   # descarga (y subida) de medios
+    '*.cdn.whatsapp.net/*',
+]
+RECURSOS_BLOQUEADOS = [
+    '*://pps.whatsapp.net/*',   # fotos de perfil
+    *RECURSOS_MEDIOS,
+    '*.woff', '*.woff2', '*.ttf',
+]
+# Si un adjunto se dio por enviado con el reloj todavía puesto, su subida puede seguir en
+# curso: los medios quedan sin bloquear hasta este máximo de segundos
+SUBIDA_PENDIENTE_MAXIMA = float(os.environ.get('SUBIDA_PENDIENTE_MAXIMA') or 600)
+
+# Navegador separado: se lanza como proceso propio con puerto de depuración y Selenium se
+# conecta a él; sobrevive a un reinicio de la app, que al volver se reconecta sin recargar
+# WhatsApp Web ni pedir el QR. Solo Chrome/Edge y similares
+NAVEGADOR_SEPARADO = os.environ.get('NAVEGADOR_SEPARADO', '').lower() in ('1', 'true', 'si', 'sí')
+ARCHIVO_NAVEGADOR = 'navegador_separado.json'  # Dentro del perfil: puerto, navegador y número
+
+# Esperas máximas (segundos) de cada paso del envío; se cortan en cuanto la página está lista
+ESPERAS_MAXIMAS = {
+    'chat': float(os.environ.get('ESPERA_MAXIMA_CHAT') or 30),
+    'chat_en_pagina': float(os.environ.get('ESPERA_MAXIMA_CHAT_EN_PAGINA') or 5),
+    'elemento': float(os.environ.get('ESPERA_MAXIMA_ELEMENTO') or 20),
+    'boton_enviar': float(os.environ.get('ESPERA_MAXIMA_BOTON_ENVIAR') or 5),
+    'menu_adjuntar': float(os.environ.get('ESPERA_MAXIMA_MENU_ADJUNTAR') or 5),
+    'vista_previa': float(os.environ.get('ESPERA_MAXIMA_VISTA_PREVIA') or 8),
+    'confirmacion': float(os.environ.get('ESPERA_MAXIMA_CONFIRMACION') or 15),
+    'reenvio': float(os.environ.get('ESPERA_MAXIMA_REENVIO') or 5),
+    'escritura': float(os.environ.get('ESPERA_MAXIMA_ESCRITURA') or 1),
+}
+
+# Avisos con que WhatsApp Web limita a una cuenta que envía demasiado
+# Aviso de límite de envíos: solo en modales y avisos flotantes (no en chats ni mensajes,
+# donde un contacto puede escribir "más tarde")
+XPATH_AVISO_LIMITE = (
+    '//div[@role="dialog" or @data-animate-modal-popup="true" or @role="alert"'
+    ' or @data-testid="toast-container" or @data-testid="toast"]'
+    '[contains(., "demasiados mensajes") or contains(., "too many messages")'
+    ' or contains(., "restringida temporalmente") or contains(., "temporarily restricted")'
+    ' or contains(., "temporalmente bloqueada") or contains(., "temporarily banned")]'
+)
+
+XPATH_CAJA_TEXTO_CHAT = '//div[@id="main"]//footer//div[@contenteditable="true"]'
+XPATH_NUMERO_INVALIDO = (
+    '//div[@role="dialog" or @data-animate-modal-popup="true"]'
+    '//*[contains(text(), "no es válido") or contains(text(), "invalid") or contains(text(), "isn\'t on WhatsApp")]'
+)
+
+# Navegación entre chats: 'pagina' abre el chat dentro de la app ya cargada, 'url' recarga /send?phone=
+NAVEGACION_CHAT = os.environ.get('NAVEGACION_CHAT', 'pagina').lower()
+
+# Fallos seguidos de la navegación en página tras los que la sesión pasa a usar solo la URL
+FALLOS_NAVEGACION_MAXIMOS = 3
+
+# Marca el chat abierto y hace clic en un enlace wa.me dentro de la app, que WhatsApp Web
+# intercepta y abre como chat sin recargar la página
+JS_ABRIR_CHAT_EN_PAGINA = """
+var principal = document.querySelector('#main');
+if (principal) principal.setAttribute('data-chat-anterior', '1');
+var enlace = document.createElement('a');
+enlace.href = 'https://wa.me/' + arguments[0];
+enlace.style.display = 'none';
+(document.querySelector('#pane-side') || document.querySelector('#app') || document.body).appendChild(enlace);
+enlace.click();
+enlace.remove();
+return true;
+"""
+
+# El chat nuevo está listo cuando #main ya no es el marcado y tiene caja de texto
+JS_CHAT_NUEVO_LISTO = """
+var principal = document.querySelector('#main');
+return !!(principal && !principal.hasAttribute('data-chat-anterior')
+          && principal.querySelector('footer div[contenteditable="true"]'));
+"""
+
+# Escritura del mensaje: 'pegar' lo inserta de una vez (pegado simulado), 'teclear' línea por línea
+ESCRITURA_MENSAJE = os.environ.get('ESCRITURA_MENSAJE', 'pegar').lower()
+
+# Vacía la caja de texto (p. ej. un borrador del chat) y pega el texto con un evento paste;
+# conserva emojis y saltos de línea, que send_keys no siempre puede teclear
+JS_PEGAR_TEXTO = """
+var caja = arguments[0], texto = arguments[1];
+caja.focus();
+document.execCommand('selectAll', false, null);
+document.execCommand('delete', false, null);
+var datos = new DataTransfer();
+datos.setData('text/plain', texto);
+caja.dispatchEvent(new ClipboardEvent('paste', {clipboardData: datos, bubbles: true, cancelable: true}));
+return caja.innerText || '';
+"""
+
+# Deja vacía la caja de texto antes de teclear (restos de un intento de pegado)
+JS_VACIAR_CAJA = """
+arguments[0].focus();
+document.execCommand('selectAll', false, null);
+document.execCommand('delete', false, null);
+"""
+
+# Alternativa si el editor ignora el pegado: inserción directa como texto escrito
+JS_INSERTAR_TEXTO = """
+var caja = arguments[0], texto = arguments[1];
+caja.focus();
+document.execCommand('selectAll', false, null);
+document.execCommand('delete', false, null);
+document.execCommand('insertText', false, texto);
+return caja.innerText || '';
+"""
+
+# Dígitos del título y el texto de un resultado del diálogo de reenvío (fila completa)
+JS_DIGITOS_RESULTADO = """
+var fila = arguments[0].closest('[role="listitem"]') || arguments[0];
+var textos = [fila.innerText || ''];
+fila.querySelectorAll('[title]').forEach(function (el) { textos.push(el.getAttribute('title')); });
+return textos.map(function (t) { return t.replace(/\\D/g, ''); });
+"""
+
+# data-id de la última burbuja saliente del chat abierto
+JS_ID_ULTIMA_SALIENTE = """
+var burbujas = document.querySelectorAll('#main div.message-out');
+var ultima = burbujas[burbujas.length - 1];
+var contenedor = ultima && ultima.closest('[data-id]');
+return contenedor ? contenedor.getAttribute('data-id') : null;
+"""
+
+# Estado de la última burbuja saliente del chat abierto y cantidad de burbujas salientes
+JS_ESTADO_SALIENTES = """
+var burbujas = document.querySelectorAll('#main div.message-out');
+var ultima = burbujas[burbujas.length - 1];
+var estado = null;
+if (ultima) {
+    if (ultima.querySelector('[data-icon="msg-time"]')) estado = 'pendiente';
+    else if (ultima.querySelector('[data-icon^="msg-check"], [data-icon^="msg-dblcheck"]')) estado = 'enviado';
+    else estado = 'desconocido';
+}
+return [burbujas.length, estado];
+"""
+
 class ServicioWhatsApp:
     """Servicio para gestionar conexión con WhatsApp Web"""
     
@@ -39,13 +198,27 @@ class ServicioWhatsApp:
         self.browser_type = None
         self.browser_name = None
         self.session_file = 'data/whatsapp_cookies.pkl'
-        self.user_data_dir = 'data/browser_profile'
+        self.perfiles_dir = 'data/browser_profile'
+        self.user_data_dir = self.perfiles_dir
         self.drivers_dir = 'drivers'
         self.is_connected = False
         self.numero_conectado = None
         self.numero_actual = None
         self.cookies_dir = 'data/cookies'
         self._navegadores_cache = None
+        self.esperas = dict(ESPERAS_MAXIMAS)
+        self.navegacion_en_pagina = NAVEGACION_CHAT != 'url'
+        self.modo_ligero = MODO_NAVEGADOR == 'ligero'
+        self.sin_ventana = False
+        self._medios_libres_hasta = 0
+        # Conectar y reanudar (hilo de arranque) no deben tocar el navegador a la vez
+        self._lock_conexion = threading.RLock()
+        self._forzar_ventana = False
+        # Archivo (ruta absoluta) → chat y data-id del primer mensaje con que se subió
+        self._adjuntos_subidos = {}
+        self._fallos_navegacion = 0
+        # Segundos de cada paso del último envío (chat, escritura, adjuntar, ...)
+        self.tiempos_ultimo_envio = {}
         
         os.makedirs(self.drivers_dir, exist_ok=True)
         os.makedirs(self.cookies_dir, exist_ok=True)
@@ -273,6 +446,234 @@ class ServicioWhatsApp:
             logger.error(f" Error inicializando driver: {e}")
             return False
     
+    def _sesion_vinculada(self):
+        """El número ya escaneó el QR alguna vez (tiene cookies guardadas)"""
+        return bool(self.numero_actual) and os.path.exists(
+            os.path.join(self.cookies_dir, f'whatsapp_{self.numero_actual}.pkl')
+        )
+    
+    def _opciones_ligeras(self, options):
+        """Tamaño de ventana y, en modo ligero, opciones de bajo consumo (Chrome y Edge)"""
+        self.sin_ventana = self.modo_ligero and not self._forzar_ventana and self._sesion_vinculada()
+        
+        if not self.modo_ligero:
+            options.add_argument('--window-size=1200,900')
+            return
+        
+        if self.sin_ventana:
+            options.add_argument('--headless=new')
+        options.add_argument(f'--window-size={VENTANA_LIGERA}')
+        options.add_argument('--force-prefers-reduced-motion')
+        options.add_argument('--mute-audio')
+        options.add_argument('--renderer-process-limit=2')
+        options.add_argument(f'--js-flags=--max-old-space-size={MEMORIA_RENDERER_MB}')
+        options.add_argument('--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication')
+    
+    def _preparar_ventana(self):
+        """Maximiza la ventana, o en modo ligero aplica el bloqueo de recursos"""
+        if not self.modo_ligero:
+            self.driver.maximize_window()
+            return
+        
+        try:
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            if self.sin_ventana:
+                # WhatsApp Web rechaza el navegador si el agente dice HeadlessChrome
+                agente = self.driver.execute_script('return navigator.userAgent;')
+                self.driver.execute_cdp_cmd(
+                    'Network.setUserAgentOverride', {'userAgent': agente.replace('HeadlessChrome', 'Chrome')}
+                )
+        except Exception as e:
+            logger.debug(f" No se pudo configurar el modo ligero: {e}")
+        self._bloquear_recursos(True)
+        logger.info(f" Navegador en modo ligero{' sin ventana' if self.sin_ventana else ''}")
+    
+    def _bloquear_recursos(self, activo):
+        """
+        Activa o suspende (durante la subida de un adjunto) el bloqueo de recursos pesados.
+        Mientras una subida pueda seguir en curso, los medios no se bloquean.
+        """
+        if not self.modo_ligero or not hasattr(self.driver, 'execute_cdp_cmd'):
+            return
+        urls = []
+        if activo:
+            urls = RECURSOS_BLOQUEADOS
+            if time.time() < self._medios_libres_hasta:
+                urls = [url for url in RECURSOS_BLOQUEADOS if url not in RECURSOS_MEDIOS]
+        try:
+            self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': urls})
+        except Exception as e:
+            logger.debug(f" No se pudo cambiar el bloqueo de recursos: {e}")
+    
+    # ===== Navegador separado =====
+    
+    def _ruta_navegador_separado(self):
+        return os.path.join(self.user_data_dir, ARCHIVO_NAVEGADOR)
+    
+    @staticmethod
+    def _puerto_activo(puerto):
+        """El navegador responde en su puerto de depuración"""
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{puerto}/json/version', timeout=1):
+                return True
+        except Exception:
+            return False
+    
+    def _lanzar_navegador_separado(self, navegador_info, options):
+        """Lanza el navegador como proceso independiente de la app y se conecta a él"""
+        with socket.socket() as libre:
+            libre.bind(('127.0.0.1', 0))
+            puerto = libre.getsockname()[1]
+        
+        # excludeSwitches y useAutomationExtension solo los aplica el driver al lanzar el
+        # navegador. Lanzado directamente no recibe los switches por defecto del driver
+        # (--enable-automation, --enable-logging) ni su extensión, así que basta con no
+        # pasar ningún switch excluido que esté entre los argumentos.
+        excluidos = {f'--{switch}' for switch in options.experimental_options.get('excludeSwitches', [])}
+        argumentos = [a for a in options.arguments if a.split('=', 1)[0] not in excluidos]
+        comando = [navegador_info['ruta'], *argumentos, f'--remote-debugging-port={puerto}', 'about:blank']
+        if platform.system() == 'Windows':
+            subprocess.Popen(
+                comando, creationflags=subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, close_fds=True
+            )
+        else:
+            subprocess.Popen(
+                comando, start_new_session=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+        
+        limite = time.time() + 15
+        while not self._puerto_activo(puerto):
+            if time.time() > limite:
+                raise Exception("El navegador no abrió su puerto de depuración")
+            time.sleep(0.2)
+        
+        datos = {
+            'puerto': puerto,
+            'numero': self.numero_actual,
+            'navegador': navegador_info,
+            'sin_ventana': self.sin_ventana
+        }
+        escribir_json_atomico(self._ruta_navegador_separado(), datos)
+        
+        logger.info(f" Navegador separado iniciado (puerto {puerto})")
+        self._adjuntar_navegador(datos)
+        return True
+    
+    def _adjuntar_navegador(self, datos):
+        """Conecta Selenium al navegador separado que escucha en datos['puerto']"""
+        navegador_info = datos['navegador']
+        es_edge = navegador_info['tipo_driver'] == 'edge'
+        options = EdgeOptions() if es_edge else ChromeOptions()
+        options.debugger_address = f"127.0.0.1:{datos['puerto']}"
+        
+        try:
+            self.driver = webdriver.Edge(options=options) if es_edge else webdriver.Chrome(options=options)
+        except Exception as e:
+            driver_local = self.descargar_driver_local('edge' if es_edge else 'chromium')
+            if not driver_local:
+                raise e
+            if es_edge:
+                self.driver = webdriver.Edge(service=EdgeService(executable_path=driver_local), options=options)
+            else:
+                self.driver = webdriver.Chrome(service=ChromeService(executable_path=driver_local), options=options)
+        
+        self.browser_type = navegador_info['tipo']
+        self.browser_name = navegador_info['nombre']
+        self.sin_ventana = datos.get('sin_ventana', False)
+        self._preparar_ventana()
+    
+    def reanudar_navegador(self, numero):
+        """
+        Se reconecta al navegador separado del número si sigue abierto. Retorna 'sesion'
+        si WhatsApp Web ya está conectado, 'navegador' si el navegador sigue abierto pero
+        la sesión no (p. ej. pide QR) y None si no hay navegador al que volver.
+        """
+        self.user_data_dir = self.ruta_perfil(numero)
+        try:
+            with open(self._ruta_navegador_separado(), 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if not self._puerto_activo(datos['puerto']):
+            os.remove(self._ruta_navegador_separado())
+            return None
+        
+        try:
+            self._adjuntar_navegador(datos)
+        except Exception as e:
+            logger.warning(f" No se pudo reconectar al navegador de {numero}: {e}")
+            return None
+        
+        self.numero_conectado = numero
+        self.numero_actual = numero
+        
+        # El navegador sigue en WhatsApp Web: sin recargar la página
+        if HOST_WHATSAPP_WEB not in (self.driver.current_url or ''):
+            self.abrir_whatsapp_web()
+        if self._esperar_app_o_qr() == 'app' and self.verificar_sesion_activa_real():
+            self.is_connected = True
+            logger.info(f" Sesión de {numero} reanudada en el navegador abierto")
+            return 'sesion'
+        return 'navegador'
+    
+    def reanudar_sesion(self, numero):
+        """
+        Al arrancar la app: reanuda la sesión del número en su navegador separado.
+        True si quedó conectada; si no, suelta el navegador para la próxima conexión manual.
+        """
+        with self._lock_conexion:
+            if self.driver and self.is_connected:
+                # Ya se conectó por otra vía mientras arrancaba la app
+                return self.numero_conectado == numero
+            try:
+                reanudado = self.reanudar_navegador(numero)
+            except Exception as e:
+                logger.warning(f" No se pudo reanudar la sesión de {numero}: {e}")
+                reanudado = None
+            if reanudado == 'sesion':
+                return True
+            
+            if self.driver:
+                try:
+                    self.driver.quit()
+                except Exception:
+                    pass
+                self.driver = None
+            self.is_connected = False
+            self.numero_conectado = self.numero_actual = None
+            return False
+    
+    def navegadores_separados(self):
+        """Números con un navegador separado registrado en su perfil"""
+        numeros = []
+        for ruta in glob.glob(os.path.join(self.perfiles_dir, '*', ARCHIVO_NAVEGADOR)):
+            try:
+                with open(ruta, 'r', encoding='utf-8') as f:
+                    numero = json.load(f).get('numero')
+            except (OSError, ValueError):
+                continue
+            if numero:
+                numeros.append(numero)
+        return numeros
+    
+    def _cerrar_navegador(self):
+        """Cierra el navegador; el separado se cierra por CDP porque quit() solo se desconecta"""
+        if not self.driver:
+            return
+        if NAVEGADOR_SEPARADO:
+            try:
+                self.driver.execute_cdp_cmd('Browser.close', {})
+            except Exception:
+                pass
+            if os.path.exists(self._ruta_navegador_separado()):
+                os.remove(self._ruta_navegador_separado())
+        try:
+            self.driver.quit()
+        finally:
+            self.driver = None
+    
     def _inicializar_chromium(self, navegador_info):
         """Inicialización RÁPIDA y OPTIMIZADA de navegadores Chromium"""
         try:
@@ -288,7 +689,7 @@ class ServicioWhatsApp:
             options.add_argument('--disable-dev-shm-usage')
             options.add_argument('--disable-blink-features=AutomationControlled')
             options.add_argument('--disable-gpu')
-            options.add_argument('--window-size=1200,900')
+            self._opciones_ligeras(options)
             
             # OPTIMIZACIONES DE VELOCIDAD PARA CHROMIUM
             options.add_argument('--disable-extensions')
@@ -311,6 +712,9 @@ class ServicioWhatsApp:
             options.add_experimental_option("excludeSwitches", ["enable-automation", "enable-logging"])
             options.add_experimental_option('useAutomationExtension', False)
             
+            if NAVEGADOR_SEPARADO:
+                return self._lanzar_navegador_separado(navegador_info, options)
+            
             try:
                 self.driver = webdriver.Chrome(options=options)
                 logger.info(" Navegador iniciado")
@@ -323,7 +727,7 @@ class ServicioWhatsApp:
                 else:
                     raise e
             
-            self.driver.maximize_window()
+            self._preparar_ventana()
             return True
         
         except Exception as e:
@@ -345,7 +749,7 @@ class ServicioWhatsApp:
             options.add_argument('--disable-dev-shm-usage')
             options.add_argument('--disable-blink-features=AutomationControlled')
             options.add_argument('--disable-gpu')
-            options.add_argument('--window-size=1200,900')
+            self._opciones_ligeras(options)
             
             # ⚡ OPTIMIZACIONES DE VELOCIDAD PARA EDGE
             options.add_argument('--disable-extensions')
@@ -368,6 +772,9 @@ class ServicioWhatsApp:
             options.add_experimental_option("excludeSwitches", ["enable-automation", "enable-logging"])
             options.add_experimental_option('useAutomationExtension', False)
             
+            if NAVEGADOR_SEPARADO:
+                return self._lanzar_navegador_separado(navegador_info, options)
+            
             try:
                 self.driver = webdriver.Edge(options=options)
                 logger.info(" Navegador iniciado")
@@ -380,7 +787,7 @@ class ServicioWhatsApp:
                 else:
                     raise e
             
-            self.driver.maximize_window()
+            self._preparar_ventana()
             return True
         
         except Exception as e:
@@ -413,7 +820,7 @@ class ServicioWhatsApp:
                 self.inicializar_driver()
             
             logger.info(" Abriendo WhatsApp Web...")
-            self.driver.get('https://web.whatsapp.com')
+            self.driver.get(URL_WHATSAPP_WEB)
             time.sleep(2)
             return True
         
@@ -477,7 +884,7 @@ class ServicioWhatsApp:
             
             try:
                 url_actual = self.driver.current_url
-                if 'web.whatsapp.com' not in url_actual:
+                if HOST_WHATSAPP_WEB not in url_actual:
                     logger.debug("No está en WhatsApp Web")
                     return False
             except Exception as e:
@@ -521,114 +928,328 @@ class ServicioWhatsApp:
     
     def _verificar_texto_escrito_instantaneo(self, input_box):
         """
-        VERIFICACIÓN INSTANTÁNEA - 0.1 segundos máximo
-        - Verifica SI HAY TEXTO y continúa inmediatamente
+        Espera a que la caja muestre el texto tecleado (como máximo self.esperas['escritura'])
+        y continúa; si no se detecta a tiempo, asume que quedó escrito
         """
-        try:
-            time.sleep(0.05)
-            
+        def hay_texto(driver):
             try:
-                texto_actual = input_box.text or ""
-                if len(texto_actual.strip()) > 0:
-                    logger.info(f"TEXTO DETECTADO ({len(texto_actual)} chars) - CONTINUANDO")
-                    return True
-            except:
-                pass
-            
-            try:
-                texto_js = self.driver.execute_script(
-                    "return arguments[0].innerText || '';", input_box
-                )
-                if texto_js and len(texto_js.strip()) > 0:
-                    logger.info("TEXTO OK - CONTINUANDO")
-                    return True
-            except:
-                pass
-            
+                texto = input_box.text or driver.execute_script("return arguments[0].innerText || '';", input_box)
+                return bool((texto or '').strip())
+            except Exception:
+                return False
+        
+        if self._esperar(hay_texto, 'escritura'):
+            logger.info("TEXTO OK - CONTINUANDO")
+        else:
             logger.info("ASUMIENDO TEXTO OK - CONTINUANDO")
-            return True
-            
+        return True
+    
+    @staticmethod
+    def _texto_coincide(escrito, esperado):
+        """Compara ignorando espacios y saltos de línea (el editor los representa a su manera)"""
+        return ''.join((escrito or '').split()) == ''.join((esperado or '').split())
+    
+    def _teclear_mensaje(self, input_box, mensaje):
+        """Escritura tecla por tecla: una línea por send_keys y SHIFT+ENTER entre líneas"""
+        try:
+            input_box.clear()
         except:
-            return True
+            pass
+        try:
+            self.driver.execute_script(JS_VACIAR_CAJA, input_box)
+        except Exception:
+            pass
+        
+        lineas = mensaje.split('\n')
+        for i, linea in enumerate(lineas):
+            input_box.send_keys(linea)
+            if i < len(lineas) - 1:
+                input_box.send_keys(Keys.SHIFT + Keys.ENTER)
+        
+        return self._verificar_texto_escrito_instantaneo(input_box)
     
-    def _esperar_carga_archivo_instantanea(self, tipo_archivo, timeout_max=8):
+    def _escribir_mensaje(self, input_box, mensaje):
         """
-        DETECCIÓN INSTANTÁNEA - Envía AL MOMENTO que detecta preview
-        - Timeout reducido a 8s (antes 20s)
-        - Verifica cada 0.2s (ultra rápido)
-        - Envía INMEDIATAMENTE al ver la imagen/preview
+        Escribe el mensaje en la caja de texto. En modo 'pegar' lo inserta de una
+        vez (tiempo constante sin importar el largo) y verifica que el texto
+        compuesto coincida; si no, vuelve a teclearlo.
         """
-        tiempo_inicio = time.time()
-        
-        logger.info(f"Buscando preview de {tipo_archivo}...")
-        
-        time.sleep(0.2)
+        if ESCRITURA_MENSAJE != 'teclear':
+            for script in (JS_PEGAR_TEXTO, JS_INSERTAR_TEXTO):
+                try:
+                    escrito = self.driver.execute_script(script, input_box, mensaje)
+                    if self._texto_coincide(escrito, mensaje):
+                        return True
+                except Exception as e:
+                    logger.debug(f" Error insertando texto: {e}")
+            logger.debug(" El texto insertado no coincide; se escribe tecla por tecla")
         
-        checks = 0
-        max_checks = 20
+        return self._teclear_mensaje(input_box, mensaje)
+    
+    def _esperar_vista_previa(self, tipo_archivo):
+        """
+        Espera la vista previa del adjunto (paso 'vista_previa'). En videos, además,
+        que el reproductor tenga duración o lleve un momento visible. False si no aparece.
+        """
+        visible_desde = []
         
-        while (time.time() - tiempo_inicio) < timeout_max and checks < max_checks:
+        def vista_previa_lista(driver):
             try:
-                preview = self.driver.find_element(
-                    By.XPATH,
-                    '//div[contains(@class, "media-viewer")]|//div[@data-testid="media-viewer"]'
+                vistas = driver.find_elements(
+                    By.XPATH, '//div[contains(@class, "media-viewer")]|//div[@data-testid="media-viewer"]'
                 )
+                if not any(v.is_displayed() for v in vistas):
+                    return False
+                if tipo_archivo != 'video':
+                    return True
                 
-                if preview and preview.is_displayed():
-                    tiempo_carga = round(time.time() - tiempo_inicio, 2)
-                    
-                    if tipo_archivo in ['imagen', 'documento']:
-                        logger.info(f"{tipo_archivo.upper()} detectado en {tiempo_carga}s - ENVIANDO YA")
-                        time.sleep(0.2)
-                        return True
-                    
-                    if tipo_archivo == 'video':
-                        try:
-                            video_element = self.driver.find_element(By.TAG_NAME, 'video')
-                            if video_element:
-                                try:
-                                    duration = self.driver.execute_script(
-                                        "return arguments[0].duration;", video_element
-                                    )
-                                    if duration and duration > 0:
-                                        logger.info(f"VIDEO cargado en {tiempo_carga}s - ENVIANDO")
-                                        time.sleep(0.3)
-                                        return True
-                                except:
-                                    pass
-                                
-                                if tiempo_carga > 1.5:
-                                    logger.info(f"VIDEO detectado - ENVIANDO ({tiempo_carga}s)")
-                                    return True
-                        except:
-                            if tiempo_carga > 1.0:
-                                logger.info(f"Preview de video visible - ENVIANDO ({tiempo_carga}s)")
-                                return True
-            except:
-                pass
+                if not visible_desde:
+                    visible_desde.append(time.time())
+                videos = driver.find_elements(By.TAG_NAME, 'video')
+                if videos and driver.execute_script("return arguments[0].duration;", videos[0]):
+                    return True
+            except StaleElementReferenceException:
+                return False
+            return time.time() - visible_desde[0] > 1.5
+        
+        logger.info(f"Buscando preview de {tipo_archivo}...")
+        return bool(self._esperar(vista_previa_lista, 'vista_previa'))
+    
+    def _esperar(self, condicion, paso):
+        """Espera hasta que condicion(driver) sea verdadera o se agote la espera del paso"""
+        try:
+            return WebDriverWait(self.driver, self.esperas[paso], poll_frequency=0.1).until(condicion)
+        except TimeoutException:
+            logger.debug(f" Espera agotada en '{paso}' ({self.esperas[paso]}s)")
+            return None
+    
+    def _estado_salientes(self):
+        """(cantidad de burbujas salientes, estado de la última) en el chat abierto"""
+        try:
+            cantidad, estado = self.driver.execute_script(JS_ESTADO_SALIENTES)
+            return cantidad, estado
+        except Exception:
+            return 0, None
+    
+    def _esperar_chat_abierto(self, en_pagina=False):
+        """Espera a que el chat muestre su caja de texto o el aviso de número inválido"""
+        def chat_listo(driver):
+            if en_pagina:
+                if driver.execute_script(JS_CHAT_NUEVO_LISTO):
+                    return 'chat'
+            elif driver.find_elements(By.XPATH, XPATH_CAJA_TEXTO_CHAT):
+                return 'chat'
+            if driver.find_elements(By.XPATH, XPATH_NUMERO_INVALIDO):
+                return 'invalido'
+            return False
+        
+        return self._esperar(chat_listo, 'chat_en_pagina' if en_pagina else 'chat')
+    
+    def detectar_limitacion(self):
+        """WhatsApp muestra un aviso de límite de envíos (se consulta tras un fallo)"""
+        try:
+            return any(e.is_displayed() for e in self.driver.find_elements(By.XPATH, XPATH_AVISO_LIMITE))
+        except Exception:
+            return False
+    
+    def _esperar_app_o_qr(self):
+        """'app' cuando aparece la lista de chats, 'qr' si pide escanear; None si no carga"""
+        def listo(driver):
+            if driver.find_elements(By.CSS_SELECTOR, 'div#pane-side'):
+                return 'app'
+            if driver.find_elements(By.CSS_SELECTOR, 'canvas[aria-label*="qr"], div[data-ref]'):
+                return 'qr'
+            return False
+        
+        return self._esperar(listo, 'chat')
+    
+    def _app_cargada(self):
+        """WhatsApp Web ya está cargado y con la lista de chats visible"""
+        try:
+            return (HOST_WHATSAPP_WEB in self.driver.current_url
+                    and bool(self.driver.find_elements(By.CSS_SELECTOR, 'div#pane-side')))
+        except Exception:
+            return False
+    
+    def _cerrar_dialogos(self):
+        """Cierra un aviso abierto (p. ej. número inválido del envío anterior)"""
+        try:
+            if self.driver.find_elements(By.XPATH, '//div[@role="dialog" or @data-animate-modal-popup="true"]'):
+                self.driver.find_element(By.TAG_NAME, 'body').send_keys(Keys.ESCAPE)
+        except Exception:
+            pass
+    
+    def _abrir_chat(self, telefono_limpio):
+        """
+        Abre el chat del número. Con la app ya cargada lo abre dentro de la página
+        (sin recargar WhatsApp Web); si falla, o la sesión ya falló varias veces
+        seguidas, navega a la URL /send?phone=. Retorna 'chat', 'invalido' o None.
+        """
+        if self.navegacion_en_pagina and self._app_cargada():
+            self._cerrar_dialogos()
+            try:
+                self.driver.execute_script(JS_ABRIR_CHAT_EN_PAGINA, telefono_limpio)
+                estado = self._esperar_chat_abierto(en_pagina=True)
+            except Exception as e:
+                logger.debug(f" Error abriendo chat en la página: {e}")
+                estado = None
+            
+            if estado:
+                self._fallos_navegacion = 0
+                return estado
+            
+            self._fallos_navegacion += 1
+            if self._fallos_navegacion >= FALLOS_NAVEGACION_MAXIMOS:
+                logger.warning(" La navegación en página falla seguido; se usará la URL en esta sesión")
+                self.navegacion_en_pagina = False
+            logger.debug(" Chat no abierto en la página; recargando con la URL")
+        
+        self.driver.get(f'{URL_WHATSAPP_WEB}/send?phone={telefono_limpio}')
+        return self._esperar_chat_abierto()
+    
+    def _esperar_confirmacion_envio(self, salientes_antes):
+        """
+        Espera la nueva burbuja saliente con el tilde de enviado. Si al agotarse la
+        espera la burbuja existe pero sigue con el reloj (pendiente), WhatsApp la
+        reenvía por su cuenta y se da por enviada.
+        """
+        def enviado(driver):
+            cantidad, estado = self._estado_salientes()
+            return cantidad > salientes_antes and estado in ('enviado', 'desconocido')
+        
+        if self._esperar(enviado, 'confirmacion'):
+            return True
+        
+        cantidad, estado = self._estado_salientes()
+        if cantidad > salientes_antes:
+            logger.warning(f" Mensaje aún {estado or 'sin estado'} al agotar la espera de confirmación")
+            return True
+        return False
+    
+    def _registrar_adjunto(self, archivo_absoluto, telefono_limpio):
+        """Recuerda el mensaje recién enviado con el archivo para reenviarlo después"""
+        try:
+            mensaje_id = self.driver.execute_script(JS_ID_ULTIMA_SALIENTE)
+        except Exception:
+            mensaje_id = None
+        if mensaje_id:
+            self._adjuntos_subidos[archivo_absoluto] = {'telefono': telefono_limpio, 'mensaje_id': mensaje_id}
+    
+    def _clic(self, elemento):
+        try:
+            elemento.click()
+        except Exception:
+            self.driver.execute_script("arguments[0].click();", elemento)
+    
+    def _es_destinatario(self, elemento, telefono_limpio):
+        """El resultado de búsqueda del diálogo de reenvío muestra el número del destinatario"""
+        try:
+            digitos = self.driver.execute_script(JS_DIGITOS_RESULTADO, elemento)
+        except Exception:
+            return False
+        return any(telefono_limpio in d for d in digitos or ())
+    
+    def _reenviar_adjunto(self, origen, telefono_limpio):
+        """
+        Reenvía el mensaje con el archivo ya subido al chat del destinatario: abre el
+        chat de origen, menú del mensaje → Reenviar → buscar el número → enviar.
+        El destinatario debe tener chat (se le envía antes el texto).
+        
+        Retorna 'reenviado', 'sin_confirmar' si se pulsó enviar pero el diálogo no se
+        cerró (puede haber llegado: no se vuelve a subir), o None si no se llegó a enviar.
+        """
+        espera = self.esperas['reenvio']
+        enviado = False
+        try:
+            if self._abrir_chat(origen['telefono']) != 'chat':
+                return None
             
-            checks += 1
-            time.sleep(0.2)
+            burbuja = self._esperar(
+                EC.presence_of_element_located((By.CSS_SELECTOR, f'#main [data-id="{origen["mensaje_id"]}"]')),
+                'reenvio'
+            )
+            if not burbuja:
+                return None
+            
+            self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", burbuja)
+            ActionChains(self.driver).move_to_element(burbuja).perform()
+            
+            for grupo in ('menu_mensaje', 'opcion_reenviar', 'boton_reenviar'):
+                elemento = registro_selectores.buscar(self.driver, grupo, espera)
+                if not elemento:
+                    return None
+                self._clic(elemento)
+            
+            busqueda = registro_selectores.buscar(self.driver, 'buscar_reenvio', espera)
+            if not busqueda:
+                return None
+            busqueda.send_keys(telefono_limpio)
+            
+            # Antes de filtrar, el diálogo lista los chats recientes: solo vale el resultado
+            # que muestra el número del destinatario (un contacto guardado con nombre no se
+            # reconoce y se sube el archivo)
+            resultado = registro_selectores.buscar(
+                self.driver, 'resultado_reenvio', espera,
+                filtro=lambda elemento: self._es_destinatario(elemento, telefono_limpio)
+            )
+            if not resultado:
+                logger.debug(f" El diálogo de reenvío no mostró +{telefono_limpio}")
+                return None
+            self._clic(resultado)
+            
+            enviar = registro_selectores.buscar(self.driver, 'enviar_reenvio', espera)
+            if not enviar:
+                return None
+            enviado = True
+            self._clic(enviar)
+            
+            # El diálogo se cierra al enviar el reenvío
+            cerrado = self._esperar(
+                lambda driver: not driver.find_elements(By.XPATH, '//div[@role="dialog"]'),
+                'reenvio'
+            )
+            return 'reenviado' if cerrado else 'sin_confirmar'
         
-        tiempo_total = round(time.time() - tiempo_inicio, 2)
-        logger.info(f"Enviando después de {tiempo_total}s")
-        return True
+        except Exception as e:
+            logger.debug(f" Error reenviando adjunto: {e}")
+            return 'sin_confirmar' if enviado else None
+        
+        finally:
+            self._cerrar_dialogos()
     
-    def enviar_mensaje(self, telefono, mensaje, archivo_path=None, tipo_archivo=None):
+    def enviar_mensaje(self, telefono, mensaje, archivo_path=None, tipo_archivo=None, reenviar_adjunto=False):
         """
          VERSIÓN ULTRA OPTIMIZADA v5 - FLUJO MÁS RÁPIDO:
-        1. Ir al chat (2s)
-        2. ESCRIBIR mensaje (0.3s)
-        3. VERIFICACIÓN INSTANTÁNEA (0.2s) - ¡SIN COMPARACIÓN!
+        1. Abrir el chat dentro de la app (o con la URL) y esperar la caja de texto
+        2. ESCRIBIR mensaje (pegado de una vez; tecleado si el texto no coincide)
+        3. VERIFICACIÓN del texto compuesto
         4. PASAR DIRECTO a adjuntar archivo
         5. ESPERA MÍNIMA para detección (máx 20s)
         6. ENVIAR EN CUANTO ESTÉ LISTO
+        7. Confirmar la burbuja saliente con el tilde de enviado
         
-        Total: ~3-5s para foto/doc, ~8-23s para video
+        Sin esperas fijas: cada paso espera su condición con un máximo en self.esperas
+        y su duración queda en self.tiempos_ultimo_envio.
         """
         if not self.is_connected or not self.driver:
             return False, "WhatsApp no está conectado"
         
+        # Duración de cada paso, disponible en self.tiempos_ultimo_envio
+        tiempos = {}
+        inicio_envio = time.perf_counter()
+        marca = [inicio_envio]
+        subiendo = False  # Bloqueo de recursos suspendido durante la subida (modo ligero)
+        
+        # Venció la espera de una subida anterior sin confirmar: los medios vuelven a bloquearse
+        if self._medios_libres_hasta and time.time() >= self._medios_libres_hasta:
+            self._medios_libres_hasta = 0
+            self._bloquear_recursos(True)
+        
+        def medir(paso):
+            ahora = time.perf_counter()
+            tiempos[paso] = round(ahora - marca[0], 3)
+            marca[0] = ahora
+        
         try:
             telefono_limpio = ''.join(filter(str.isdigit, telefono))
             
@@ -640,12 +1261,12 @@ class ServicioWhatsApp:
             
             logger.info(f" Enviando a: +{telefono_limpio}")
             
-            url = f'https://web.whatsapp.com/send?phone={telefono_limpio}'
-            self.driver.get(url)
-            time.sleep(2)
+            estado_chat = self._abrir_chat(telefono_limpio)
+            medir('chat')
+            if estado_chat == 'invalido':
+                return False, "El número no está registrado en WhatsApp"
             
-            wait_largo = WebDriverWait(self.driver, 60)
-            wait_corto = WebDriverWait(self.driver, 20)
+            salientes_antes = self._estado_salientes()[0]
             
             mensaje_escrito_exitosamente = False
             input_box = None
@@ -653,39 +1274,15 @@ class ServicioWhatsApp:
             if mensaje and mensaje.strip():
                 logger.info(" Escribiendo mensaje...")
                 
-                input_selectors = [
-                    '//footer//div[@contenteditable="true"][@data-tab="10"]',
-                    '//div[@id="main"]//footer//div[@contenteditable="true"][@role="textbox"]',
-                    '//div[@id="main"]//div[@contenteditable="true"][@data-tab="10"]',
-                    '//footer//div[contains(@class, "copyable-text")][@contenteditable="true"]',
-                ]
-                
-                for selector in input_selectors:
-                    try:
-                        elementos = self.driver.find_elements(By.XPATH, selector)
-                        for elemento in elementos:
-                            if elemento.is_displayed() and elemento.is_enabled():
-                                parent_context = self.driver.execute_script(
-                                    "return arguments[0].closest('footer') ? 'footer' : 'other';",
-                                    elemento
-                                )
-                                if parent_context == 'footer':
-                                    input_box = elemento
-                                    break
-                        if input_box:
-                            break
-                    except:
-                        continue
-                
+                input_box = registro_selectores.buscar(
+                    self.driver, 'caja_texto', self.esperas['elemento'],
+                    filtro=lambda elemento: self.driver.execute_script(
+                        "return !!arguments[0].closest('footer');", elemento
+                    )
+                )
                 if not input_box:
-                    try:
-                        input_box = wait_corto.until(
-                            EC.presence_of_element_located(
-                                (By.XPATH, '//div[@contenteditable="true"][@data-tab="10"]')
-                            )
-                        )
-                    except:
-                        return False, "No se encontró el cuadro de texto"
+                    return False, "No se encontró el cuadro de texto"
+                medir('caja_texto')
                 
                 if input_box:
                     try:
@@ -693,26 +1290,44 @@ class ServicioWhatsApp:
                     except:
                         self.driver.execute_script("arguments[0].click();", input_box)
                     
-                    time.sleep(0.1)  # Espera mínima
-                    
-                    try:
-                        input_box.clear()
-                    except:
-                        pass
-                    
-                    # Escribir el mensaje completo
-                    lineas = mensaje.split('\n')
-                    for i, linea in enumerate(lineas):
-                        input_box.send_keys(linea)
-                        if i < len(lineas) - 1:
-                            input_box.send_keys(Keys.SHIFT + Keys.ENTER)
-                    
-                    #  VERIFICACIÓN INSTANTÁNEA - sin comparar texto
-                    mensaje_escrito_exitosamente = self._verificar_texto_escrito_instantaneo(input_box)
+                    mensaje_escrito_exitosamente = self._escribir_mensaje(input_box, mensaje)
+                    medir('escritura')
                 
                 if not mensaje_escrito_exitosamente and not archivo_path:
                     return False, "No se pudo escribir el mensaje"
             
+            #  Archivo ya subido en esta sesión (solo si la campaña lo pide): texto aparte y
+            #  reenvío del mensaje con el archivo, que WhatsApp marca como "Reenviado"
+            origen = None
+            if archivo_path and reenviar_adjunto:
+                origen = self._adjuntos_subidos.get(os.path.abspath(archivo_path))
+            if origen and origen['telefono'] != telefono_limpio:
+                if mensaje_escrito_exitosamente and input_box:
+                    input_box.send_keys(Keys.ENTER)
+                    if not self._esperar_confirmacion_envio(salientes_antes):
+                        return False, "WhatsApp no mostró el mensaje enviado"
+                    mensaje_escrito_exitosamente = False
+                    input_box = None
+                    medir('envio_texto')
+                
+                reenvio = self._reenviar_adjunto(origen, telefono_limpio)
+                if reenvio == 'reenviado':
+                    medir('reenvio')
+                    logger.info(f" Mensaje + Archivo (reenviado) enviados a +{telefono_limpio}")
+                    return True, "Mensaje con archivo reenviado"
+                if reenvio == 'sin_confirmar':
+                    # Se pulsó enviar: subirlo otra vez podría entregar el archivo dos veces
+                    medir('reenvio')
+                    logger.warning(f" Reenvío a +{telefono_limpio} sin confirmar; no se vuelve a subir")
+                    return False, "Texto enviado; reenvío del archivo sin confirmar (no se repite)"
+                
+                logger.info(" No se pudo reenviar el archivo; se sube de nuevo")
+                self._adjuntos_subidos.pop(os.path.abspath(archivo_path), None)
+                if self._abrir_chat(telefono_limpio) != 'chat':
+                    return False, "Texto enviado, pero no se pudo volver al chat para adjuntar"
+                salientes_antes = self._estado_salientes()[0]
+                medir('reenvio')
+            
             #  Si hay archivo, pasar INMEDIATAMENTE a adjuntarlo
             if archivo_path and os.path.exists(archivo_path):
                 logger.info(f" Adjuntando: {os.path.basename(archivo_path)}")
@@ -724,6 +1339,11 @@ class ServicioWhatsApp:
                 tamano_mb = os.path.getsize(archivo_absoluto) / (1024 * 1024)
                 logger.info(f" Tamaño: {tamano_mb:.2f} MB")
                 
+                # Adjunto de campaña ya validado y convertido al crearla
+                preparado = obtener_preparado(archivo_absoluto)
+                if preparado:
+                    tipo_archivo = preparado['tipo']
+                
                 if not tipo_archivo:
                     extension = os.path.splitext(archivo_path)[1].lower()
                     if extension in ['.mp4', '.avi', '.mov', '.mkv', '.webm', '.3gp']:
@@ -737,41 +1357,21 @@ class ServicioWhatsApp:
                         logger.info(" Tipo detectado: DOCUMENTO")
                 
                 extension = os.path.splitext(archivo_path)[1].lower()
-                if tipo_archivo == 'video':
+                # Los adjuntos preparados ya se validaron al crear la campaña
+                if not preparado and tipo_archivo == 'video':
                     formatos_permitidos = ['.mp4', '.3gp', '.mov']
                     if extension not in formatos_permitidos:
                         return False, f"Formato {extension} no soportado. Usa: .mp4, .3gp o .mov"
                     if tamano_mb > 16:
                         return False, f"Video muy grande ({tamano_mb:.2f}MB). Máximo 16MB para WhatsApp"
-                elif tipo_archivo == 'imagen':
+                elif not preparado and tipo_archivo == 'imagen':
                     formatos_permitidos = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
                     if extension not in formatos_permitidos:
                         return False, f"Formato {extension} no soportado. Usa: .jpg, .png, .gif, .webp"
                     if tamano_mb > 16:
                         return False, f"Imagen muy grande ({tamano_mb:.2f}MB). Máximo 16MB"
                 
-                time.sleep(0.3)  # Espera mínima
-                
-                selectores_adjuntar = [
-                    '//div[@title="Adjuntar"]',
-                    '//div[@aria-label="Adjuntar"]',
-                    '//span[@data-icon="plus"]/..',
-                    '//span[@data-icon="attach-menu-plus"]/..',
-                    '//span[@data-icon="clip"]/..',
-                    '//button[@aria-label="Adjuntar"]',
-                ]
-                
-                boton_adjuntar = None
-                for selector in selectores_adjuntar:
-                    try:
-                        boton_adjuntar = wait_corto.until(
-                            EC.element_to_be_clickable((By.XPATH, selector))
-                        )
-                        logger.debug(f" Botón adjuntar encontrado: {selector}")
-                        break
-                    except:
-                        continue
-                
+                boton_adjuntar = registro_selectores.buscar(self.driver, 'adjuntar', self.esperas['elemento'])
                 if not boton_adjuntar:
                     return False, "No se encontró el botón de adjuntar"
                 
@@ -781,7 +1381,11 @@ class ServicioWhatsApp:
                     self.driver.execute_script("arguments[0].click();", boton_adjuntar)
                 
                 logger.info(" Menú de adjuntar abierto")
-                time.sleep(1.5)
+                self._esperar(
+                    EC.presence_of_element_located((By.XPATH, '//input[@type="file"]')),
+                    'menu_adjuntar'
+                )
+                medir('adjuntar')
                 
                 file_input = None
                 
@@ -821,9 +1425,10 @@ class ServicioWhatsApp:
                 
                 try:
                     logger.info(f" Enviando archivo: {os.path.basename(archivo_absoluto)}")
+                    self._bloquear_recursos(False)
+                    subiendo = True
                     file_input.send_keys(archivo_absoluto)
                     logger.info(f" Archivo cargado en el input")
-                    time.sleep(1)
                     
                     posibles_errores = [
                         '//*[contains(text(), "no compatible")]',
@@ -848,9 +1453,11 @@ class ServicioWhatsApp:
                     return False, f"Error al cargar archivo: {str(e)}"
                 
                 logger.info(f" Esperando carga del {tipo_archivo}...")
-                time.sleep(0.3)
                 
-                carga_exitosa = self._esperar_carga_archivo_instantanea(tipo_archivo, timeout_max=8)
+                if not self._esperar_vista_previa(tipo_archivo):
+                    logger.warning(" No apareció la vista previa del archivo")
+                    return False, "WhatsApp no mostró la vista previa del archivo"
+                medir('vista_previa')
                 
                 try:
                     error_elemento = self.driver.find_element(
@@ -865,45 +1472,24 @@ class ServicioWhatsApp:
                 
                 logger.info("Buscando botón enviar...")
                 
-                selectores_enviar = [
-                    '//span[@data-icon="send"]',
-                    '//span[@data-icon="send"]/parent::button',
-                    '//button[@aria-label="Enviar"]',
-                    '//div[@aria-label="Enviar"]',
-                ]
-                
-                boton_enviar = None
-                intentos = 0
-                max_intentos = 10
-                
-                while intentos < max_intentos and not boton_enviar:
-                    for selector in selectores_enviar:
-                        try:
-                            elementos = self.driver.find_elements(By.XPATH, selector)
-                            for elem in elementos:
-                                if elem.is_displayed() and elem.is_enabled():
-                                    boton_enviar = elem
-                                    break
-                            if boton_enviar:
-                                break
-                        except:
-                            continue
-                    
-                    if not boton_enviar:
-                        intentos += 1
-                        time.sleep(0.2)
-                
+                boton_enviar = registro_selectores.buscar(self.driver, 'enviar', self.esperas['boton_enviar'])
                 if not boton_enviar:
                     logger.warning(" No se encontró botón de enviar")
                     return False, "Archivo adjuntado pero no se pudo enviar automáticamente"
+                medir('boton_enviar')
                 
                 try:
                     boton_enviar.click()
                 except:
                     self.driver.execute_script("arguments[0].click();", boton_enviar)
+                medir('envio')
                 
-                time.sleep(1.5)
+                if not self._esperar_confirmacion_envio(salientes_antes):
+                    return False, "WhatsApp no mostró el mensaje enviado"
+                medir('confirmacion')
                 
+                if reenviar_adjunto:
+                    self._registrar_adjunto(archivo_absoluto, telefono_limpio)
                 logger.info(f" Mensaje + Archivo enviados a +{telefono_limpio}")
                 return True, "Mensaje con archivo enviado"
             
@@ -912,7 +1498,12 @@ class ServicioWhatsApp:
                 
                 if input_box:
                     input_box.send_keys(Keys.ENTER)
-                    time.sleep(2)
+                    medir('envio')
+                    
+                    if not self._esperar_confirmacion_envio(salientes_antes):
+                        return False, "WhatsApp no mostró el mensaje enviado"
+                    medir('confirmacion')
+                    
                     logger.info(f" Mensaje enviado a +{telefono_limpio}")
                     return True, "Mensaje enviado"
                 else:
@@ -926,61 +1517,134 @@ class ServicioWhatsApp:
             import traceback
             traceback.print_exc()
             return False, f"Error: {str(e)}"
+        
+        finally:
+            if subiendo:
+                # Con el reloj todavía puesto la subida puede seguir: no se cortan los medios
+                if self._estado_salientes()[1] != 'enviado':
+                    self._medios_libres_hasta = time.time() + SUBIDA_PENDIENTE_MAXIMA
+                self._bloquear_recursos(True)
+            tiempos['total'] = round(time.perf_counter() - inicio_envio, 3)
+            self.tiempos_ultimo_envio = tiempos
+            logger.debug(f" Tiempos del envío: {tiempos}")
+    
+    def enviar_entrada(self, bandeja, entrada, mensaje, archivo_path=None, tipo_archivo=None,
+                       reenviar_adjunto=False):
+        """
+        Envía el mensaje al destinatario reclamado de una bandeja y registra el
+        resultado en ella. Retorna (exito, error).
+        """
+        contacto_id = entrada['contacto_id']
+        telefono = entrada['telefono']
+        nombre = entrada['nombre']
+        
+        if not telefono:
+            logger.warning(f" Sin teléfono: {nombre}")
+            bandeja.marcar_fallido(contacto_id, 'Sin teléfono')
+            return False, f"{nombre}: Sin teléfono"
+        
+        self.tiempos_ultimo_envio = {}
+        try:
+            exito, msg = self.enviar_mensaje(
+                telefono,
+                mensaje,
+                archivo_path=archivo_path,
+                tipo_archivo=tipo_archivo,
+                reenviar_adjunto=reenviar_adjunto
+            )
+        except Exception as e:
+            logger.error(f" Error con {nombre}: {e}")
+            exito, msg = False, str(e)
+        
+        metricas_envio.registrar(bandeja.campana_id, self.tiempos_ultimo_envio, exito)
+        
+        if exito:
+            bandeja.marcar_enviado(contacto_id)
+            return True, None
+        
+        bandeja.marcar_fallido(contacto_id, msg)
+        return False, f"{nombre} ({telefono}): {msg}"
     
-    def enviar_mensajes_masivos(self, contactos, mensaje, intervalo=5, callback=None, archivo_path=None, tipo_archivo=None):
-        """ Envío masivo OPTIMIZADO con soporte de archivos"""
+    def enviar_mensajes_masivos(self, contactos, mensaje, intervalo=5, callback=None, archivo_path=None, tipo_archivo=None,
+                                bandeja=None, control=None, mensajes_por_hora=None, reenviar_adjunto=False):
+        """
+         Envío masivo OPTIMIZADO con soporte de archivos.
+        Si se pasa una bandeja (BandejaSalida) se consumen sus destinatarios pendientes
+        y cada resultado queda registrado en disco; contactos se ignora en ese caso.
+        Con un control (ControlEnvio) el envío se puede pausar o detener entre
+        destinatarios y durante la espera; los pendientes quedan en la bandeja.
+        El espaciado entre mensajes lo fija un RitmoEnvio (intervalo o mensajes_por_hora).
+        Con reenviar_adjunto el archivo se sube una vez y se reenvía a los demás.
+        """
+        from models.bandeja_salida import BandejaSalida
+        
+        if bandeja is None:
+            # Bandeja solo en memoria: mismo recorrido, sin persistencia
+            bandeja = BandejaSalida.abrir_o_crear(None, contactos, directorio=None)
+        
+        resumen = bandeja.resumen()
         resultados = {
-            'enviados': 0,
-            'fallidos': 0,
-            'errores': []
+            'enviados': resumen['enviado'],
+            'fallidos': resumen['fallido'],
+            'errores': [],
+            'detenido': False
         }
         
-        total = len(contactos)
+        total = resumen['total']
+        procesados = resultados['enviados'] + resultados['fallidos']
         
-        for i, contacto in enumerate(contactos):
-            try:
-                telefono = contacto.get('telefono') or contacto.get('Telefono')
-                nombre = contacto.get('nombre') or contacto.get('Nombre', 'Contacto')
-                
-                if not telefono:
-                    logger.warning(f" Sin teléfono: {nombre}")
-                    resultados['fallidos'] += 1
-                    continue
-                
-                logger.info(f" [{i+1}/{total}] {nombre} ({telefono})...")
-                
-                exito, msg = self.enviar_mensaje(
-                    telefono,
-                    mensaje,
-                    archivo_path=archivo_path,
-                    tipo_archivo=tipo_archivo
-                )
-                
-                if exito:
-                    resultados['enviados'] += 1
-                    logger.info(f" {i+1}/{total} - {nombre}")
-                else:
-                    resultados['fallidos'] += 1
-                    resultados['errores'].append(f"{nombre} ({telefono}): {msg}")
-                    logger.error(f" {i+1}/{total} - {nombre}: {msg}")
-                
-                if callback:
-                    callback({
-                        'actual': i + 1,
-                        'total': total,
-                        'enviados': resultados['enviados'],
-                        'fallidos': resultados['fallidos']
-                    })
-                
-                if i < total - 1:
-                    logger.debug(f" Esperando {intervalo}s...")
-                    time.sleep(intervalo)
+        if procesados:
+            logger.info(f" Reanudando envío: {procesados}/{total} ya procesados")
+        
+        ritmo = RitmoEnvio(intervalo, mensajes_por_hora)
+        
+        while True:
+            if control and not control.esperar_si_pausado():
+                resultados['detenido'] = True
+                break
             
-            except Exception as e:
-                logger.error(f" Error con {nombre}: {e}")
+            entrada = bandeja.reclamar_siguiente()
+            if entrada is None:
+                break
+            
+            logger.info(f" [{procesados+1}/{total}] {entrada['nombre']} ({entrada['telefono']})...")
+            
+            inicio = time.time()
+            exito, error = self.enviar_entrada(
+                bandeja, entrada, mensaje, archivo_path, tipo_archivo, reenviar_adjunto
+            )
+            siguiente_envio = ritmo.siguiente(inicio, exito, not exito and self.detectar_limitacion())
+            
+            procesados += 1
+            if exito:
+                resultados['enviados'] += 1
+                logger.info(f" {procesados}/{total} - {entrada['nombre']}")
+            else:
                 resultados['fallidos'] += 1
-                resultados['errores'].append(f"{nombre}: {str(e)}")
+                resultados['errores'].append(error)
+                logger.error(f" {procesados}/{total} - {error}")
+            
+            if callback:
+                callback({
+                    'actual': procesados,
+                    'total': total,
+                    'enviados': resultados['enviados'],
+                    'fallidos': resultados['fallidos'],
+                    'mensajes_por_hora': ritmo.efectivo_por_hora()
+                })
+            
+            if bandeja.hay_pendientes():
+                # El espaciado cuenta desde el inicio del envío: lo que tardó ya se descontó
+                espera = max(siguiente_envio - time.time(), 0)
+                logger.debug(f" Esperando {espera:.1f}s...")
+                if control:
+                    control.esperar(espera)
+                else:
+                    time.sleep(espera)
         
+        bandeja.cerrar()
+        if resultados['detenido']:
+            logger.info(f" Envío detenido con {bandeja.resumen()['pendiente']} destinatarios pendientes")
         logger.info(f"\n {resultados['enviados']} enviados, {resultados['fallidos']} fallidos")
         return resultados
     
@@ -1052,20 +1716,71 @@ class ServicioWhatsApp:
             logger.debug(f"Error cargando cookies: {e}")
             return False
     
+    def ruta_perfil(self, numero):
+        """Perfil de navegador propio de cada número: data/browser_profile/<numero>"""
+        return os.path.join(self.perfiles_dir, ''.join(c for c in str(numero) if c.isdigit()) or 'sin_numero')
+    
+    def _migrar_perfil_antiguo(self, destino):
+        """
+        Antes el perfil de la sesión principal estaba directamente en data/browser_profile.
+        En la primera conexión se mueve a la carpeta del número para no perder el inicio de sesión.
+        """
+        if os.path.exists(destino) or not os.path.isdir(self.perfiles_dir):
+            return
+        antiguos = [
+            nombre for nombre in os.listdir(self.perfiles_dir)
+            if not nombre.isdigit() and nombre != 'sin_numero'
+        ]
+        if not antiguos:
+            return
+        
+        logger.info(f"Moviendo el perfil anterior del navegador a {destino}")
+        os.makedirs(destino)
+        for nombre in antiguos:
+            try:
+                shutil.move(os.path.join(self.perfiles_dir, nombre), os.path.join(destino, nombre))
+            except OSError as e:
+                logger.warning(f"No se pudo mover {nombre} del perfil anterior: {e}")
+    
     def conectar(self, numero_telefono: str):
         """ Conexión ULTRA RÁPIDA"""
+        with self._lock_conexion:
+            return self._conectar(numero_telefono)
+    
+    def _conectar(self, numero_telefono):
         try:
             self.numero_conectado = numero_telefono
             self.numero_actual = numero_telefono
+            self.user_data_dir = self.ruta_perfil(numero_telefono)
+            self._adjuntos_subidos = {}
+            
+            if self is servicio_whatsapp:
+                self._migrar_perfil_antiguo(self.user_data_dir)
             
             logger.info(f"Conectando WhatsApp para {numero_telefono}")
             
-            if not self.inicializar_driver():
+            # Navegador separado que sigue abierto (p. ej. tras reiniciar la app): se reutiliza
+            reanudado = self.reanudar_navegador(numero_telefono) if NAVEGADOR_SEPARADO else None
+            if reanudado == 'sesion':
+                return True, f"Sesión reanudada en {self.browser_name}"
+            
+            if reanudado is None and not self.inicializar_driver():
                 return False, "Error inicializando navegador"
             
             if not self.abrir_whatsapp_web():
                 return False, "Error abriendo WhatsApp Web"
             
+            # Sin ventana no se puede escanear el QR: si la sesión lo pide, se reabre con ventana
+            if self.sin_ventana and self._esperar_app_o_qr() != 'app':
+                logger.info("La sesión pide el código QR; se abre el navegador con ventana")
+                self._cerrar_navegador()
+                self._forzar_ventana = True
+                try:
+                    if not self.inicializar_driver() or not self.abrir_whatsapp_web():
+                        return False, "Error abriendo WhatsApp Web"
+                finally:
+                    self._forzar_ventana = False
+            
             if self._cargar_cookies(numero_telefono):
                 logger.info("Restaurando sesión...")
                 time.sleep(2)
@@ -1097,18 +1812,23 @@ class ServicioWhatsApp:
         try:
             logger.info("Cerrando sesión COMPLETAMENTE...")
             
+            # El trabajador del planificador es dueño del navegador: se espera su envío en curso
+            from utils.planificador_envios import planificador_envios
+            if not planificador_envios.retirar_sesion(self):
+                logger.warning("El envío en curso no terminó a tiempo; se cierra el navegador igual")
+            
             if self.driver:
                 try:
                     logger.info("Cerrando navegador...")
-                    self.driver.quit()
-                    self.driver = None
+                    self._cerrar_navegador()
                     time.sleep(1)
                     logger.info(" Navegador cerrado")
                 except Exception as e:
                     logger.debug(f"Error cerrando navegador: {e}")
                     self.driver = None
             
-            if os.path.exists(self.user_data_dir):
+            # Solo el perfil de este número: la carpeta base guarda los de las demás sesiones
+            if self.user_data_dir != self.perfiles_dir and os.path.exists(self.user_data_dir):
                 try:
                     logger.info("ELIMINANDO perfil completo del navegador...")
                     shutil.rmtree(self.user_data_dir)